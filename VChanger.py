@@ -1,80 +1,3321 @@
+import time
+_STARTUP_T0 = time.perf_counter()
 import customtkinter as ctk
 import threading
 import numpy as np
-import sounddevice as sd
 import wave
 import json
-import time
 import os
+import struct
+import mmap
+import collections
+import gc
+import ctypes
+import ctypes.util
+import sys
+import argparse
 import math
-from tkinter import filedialog, Canvas, PhotoImage
-from PIL import Image, ImageTk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib
-matplotlib.use("TkAgg")
+import bisect
+import tempfile
+import tracemalloc
+from tkinter import filedialog, Canvas, TclError
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+try:
+    import sounddevice as sd
+except (ImportError, OSError) as e:  # No PortAudio, only the virtual backend can run
+    sd = None
+    SOUNDDEVICE_ERROR = e
+else:
+    SOUNDDEVICE_ERROR = None
+_IMPORTS_DONE = time.perf_counter()
+
+# Set appearance mode and color theme
+ctk.set_appearance_mode("dark")
+ctk.set_default_color_theme("dark-blue")
+
+# Define colors
+COLORS = {
+    "primary": "#3a7ebf",
+    "secondary": "#2a5a8a",
+    "accent": "#ff5722",
+    "background": "#1a1a1a",
+    "card": "#2d2d2d",
+    "text": "#ffffff",
+    "text_secondary": "#aaaaaa",
+    "success": "#4caf50",
+    "warning": "#ff9800",
+    "error": "#f44336",
+    "recording": "#f44336",
+}
+
+
+def format_duration(seconds):
+    """Format seconds as m:ss.s (or h:mm:ss.s for long takes)"""
+    minutes, seconds = divmod(max(0.0, seconds), 60)
+    hours, minutes = divmod(int(minutes), 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:04.1f}"
+    return f"{minutes}:{seconds:04.1f}"
+
+
+class StartupProfiler:
+    """Collects startup milestones so slow launches show up in a report"""
+
+    def __init__(self, t0):
+        self.t0 = t0
+        self.marks = []
+        self.enabled = False
+
+    def mark(self, label, at=None):
+        """Record a milestone, measured from the start of module import"""
+        at = time.perf_counter() if at is None else at
+        self.marks.append((label, at - self.t0))
+
+    def report(self):
+        """Format the collected milestones as a table"""
+        lines = ["Startup timing (ms since import):"]
+        previous = 0.0
+        for label, elapsed in self.marks:
+            lines.append(f"  {label:<24} {elapsed * 1000:8.1f}  (+{(elapsed - previous) * 1000:.1f})")
+            previous = elapsed
+        return "\n".join(lines)
+
+    def as_dict(self):
+        return {label: round(elapsed * 1000, 2) for label, elapsed in self.marks}
+
+
+STARTUP = StartupProfiler(_STARTUP_T0)
+STARTUP.mark("imports", _IMPORTS_DONE)
+
+
+class _NullSpan:
+    """Span returned while the timeline is disabled"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Span:
+    __slots__ = ("timeline", "name", "start")
+
+    def __init__(self, timeline, name):
+        self.timeline = timeline
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.timeline.events.append((self.name, threading.get_ident(), self.start, time.perf_counter_ns()))
+        return False
+
+
+class Timeline:
+    """Bounded in-memory record of spans, exportable as a Chrome trace
+
+    Spans from the audio callback, GUI redraws and device polling land in a
+    deque (appends are atomic, so no lock is needed from the audio thread).
+    While disabled span() hands back a shared no-op context manager.
+    Open the exported JSON in chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    CAPACITY = 200000
+
+    def __init__(self, capacity=CAPACITY):
+        self.enabled = False
+        self.events = collections.deque(maxlen=capacity)
+        self._null = _NullSpan()
+
+    def span(self, name):
+        """Context manager timing the enclosed block as one span"""
+        if not self.enabled:
+            return self._null
+        return _Span(self, name)
+
+    def clear(self):
+        self.events.clear()
+
+    def export(self, path):
+        """Write the buffered spans as Chrome trace-event JSON, returning the count"""
+        events = list(self.events)
+        pid = os.getpid()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        names[threading.main_thread().ident] = "Tk main"
+
+        trace_events = []
+        for tid in sorted({event[1] for event in events}):
+            trace_events.append({
+                "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                "args": {"name": names.get(tid, f"audio callback {tid}")},
+            })
+        for name, tid, start, end in events:
+            trace_events.append({
+                "name": name, "ph": "X", "pid": pid, "tid": tid,
+                "ts": start / 1000.0, "dur": (end - start) / 1000.0,
+            })
+
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        return len(events)
+
+
+TIMELINE = Timeline()
+
+
+class Counter:
+    """Monotonic counter, optionally split by one label
+
+    Every metric has a single writing thread (the audio callback or the Tk
+    main loop), so updates are plain attribute increments with no lock. A
+    scrape from another thread may see a value one update stale, never a
+    torn one. Label values are fixed up front so the audio thread never
+    grows a dict.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, label=None, values=()):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self.values = {value: 0 for value in values} if label else None
+        self.value = 0
+
+    def inc(self, amount=1, label_value=None):
+        if label_value is None:
+            self.value += amount
+        else:
+            self.values[label_value] += amount
+
+    def samples(self):
+        if self.label is None:
+            return [(self.name, {}, self.value)]
+        return [(self.name, {self.label: value}, count) for value, count in self.values.items()]
+
+
+class Gauge:
+    """Point-in-time value, either set directly or read from a function at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, function=None):
+        self.name = name
+        self.help = help_text
+        self.function = function
+        self.value = 0.0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        value = self.function() if self.function is not None else self.value
+        return [(self.name, {}, value)]
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and two increments"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, bounds):
+        self.name = name
+        self.help = help_text
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        counts = list(self.counts)
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + ["+Inf"], counts):
+            cumulative += count
+            samples.append((self.name + "_bucket", {"le": str(bound)}, cumulative))
+        samples.append((self.name + "_sum", {}, self.sum))
+        samples.append((self.name + "_count", {}, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics, rendered as Prometheus text or a JSON-friendly snapshot"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label=None, values=()):
+        return self.register(Counter(name, help_text, label, values))
+
+    def gauge(self, name, help_text, function=None):
+        return self.register(Gauge(name, help_text, function))
+
+    def histogram(self, name, help_text, bounds):
+        return self.register(Histogram(name, help_text, bounds))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                if labels:
+                    name += "{" + ",".join(f'{key}="{val}"' for key, val in labels.items()) + "}"
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Flat {sample name: value} dict, labels folded into the key"""
+        snapshot = {}
+        for metric in self.metrics:
+            for name, labels, value in metric.samples():
+                if labels:
+                    name += "{" + ",".join(f"{key}={val}" for key, val in labels.items()) + "}"
+                snapshot[name] = value
+        return snapshot
+
+
+class MetricsServer:
+    """Serves /metrics on localhost from a daemon thread"""
+
+    def __init__(self, registry, port):
+        self.registry = registry
+        self.port = port
+        self.server = None
+
+    def start(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+
+    def stop(self):
+        server, self.server = self.server, None
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+
+class MetricsLog:
+    """Appends a metrics snapshot per interval to a size-rotated JSON-lines file"""
+
+    def __init__(self, registry, path, interval=10.0, max_bytes=5 * 1024 * 1024, backups=3):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="metrics-log", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+        self.write()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        """Append one snapshot line, rotating the file first if it is full"""
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                self.rotate()
+            line = json.dumps({"time": time.time(), "metrics": self.registry.snapshot()})
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+        except OSError as e:
+            print(f"Error writing metrics log: {e}")
+
+    def rotate(self):
+        """path -> path.1 -> ... -> path.<backups>, dropping the oldest"""
+        for index in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+METRICS = MetricsRegistry()
+
+
+class EventBus:
+    """Bounded, coalescing hand-off of events from worker threads to the Tk loop
+
+    Each event type has one slot holding the arguments of its newest post and
+    a post count, so the bus never holds more than one pending event per type
+    no matter how often a producer posts. post() is two plain stores and
+    never blocks; the Tk thread calls drain() from a single timer and runs
+    each handler at most once per drain with the newest arguments, so a
+    storm of identical errors is handled as one event.
+
+    Each event type is expected to have a single producing thread (the
+    arguments are stored before the count is bumped, so the consumer never
+    sees a count without its arguments).
+    """
+
+    def __init__(self, handlers):
+        self.handlers = dict(handlers)
+        self.latest = dict.fromkeys(self.handlers, ())
+        self.posted = dict.fromkeys(self.handlers, 0)
+        self.drained = dict.fromkeys(self.handlers, 0)
+        self.coalesced = 0
+
+    def post(self, event, *args):
+        """Publish an event from any thread; unknown event types raise KeyError"""
+        self.latest[event] = args
+        self.posted[event] += 1
+
+    def pending(self):
+        """Number of event types waiting to be handled"""
+        return sum(self.posted[event] != self.drained[event] for event in self.handlers)
+
+    def drain(self):
+        """Run handlers for everything posted since the last drain (Tk thread only)"""
+        for event, handler in self.handlers.items():
+            posted = self.posted[event]
+            count = posted - self.drained[event]
+            if count:
+                self.drained[event] = posted
+                self.coalesced += count - 1
+                try:
+                    handler(*self.latest[event])
+                except Exception as e:
+                    print(f"Error handling {event} event: {e}")
+
+
+_matplotlib_classes = None
+
+
+def load_matplotlib():
+    """Import matplotlib on first use, selecting the Tk backend before anything else"""
+    global _matplotlib_classes
+    if _matplotlib_classes is None:
+        started = time.perf_counter()
+        import matplotlib
+        matplotlib.use("TkAgg")
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        class TracedCanvas(FigureCanvasTkAgg):
+            """Tk figure canvas whose redraws show up on the timeline"""
+
+            def draw(self):
+                with TIMELINE.span("visualizer.draw"):
+                    super().draw()
+
+        _matplotlib_classes = (Figure, TracedCanvas)
+        STARTUP.mark(f"matplotlib (+{(time.perf_counter() - started) * 1000:.0f} ms)")
+    return _matplotlib_classes
+
+
+# State management for thread safety
+class StateManager:
+    """Thread-safe state manager for voice changer"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._running = False
+        self._recording = False
+        self.audio_thread = None
+    
+    @property
+    def running(self):
+        with self.lock:
+            return self._running
+    
+    @running.setter
+    def running(self, value):
+        with self.lock:
+            self._running = value
+    
+    @property
+    def recording(self):
+        with self.lock:
+            return self._recording
+    
+    @recording.setter
+    def recording(self, value):
+        with self.lock:
+            self._recording = value
+            
+    def set_audio_thread(self, thread):
+        with self.lock:
+            self.audio_thread = thread
+    
+    def get_audio_thread(self):
+        with self.lock:
+            return self.audio_thread
+
+
+QUALITY_TIERS = (
+    {"name": "Low", "vocoder_bands": 16, "pitch_stride": 4, "reverb_seconds": 0.5},
+    {"name": "Medium", "vocoder_bands": 24, "pitch_stride": 2, "reverb_seconds": 1.5},
+    {"name": "High", "vocoder_bands": 32, "pitch_stride": 1, "reverb_seconds": None},
+)
+
+
+class QualityGovernor:
+    """Chooses a QUALITY_TIERS index from measured callback load
+
+    Load is the time spent in a callback over the time the callback covers,
+    so 1.0 means the deadline was just met, smoothed with a SMOOTHING
+    seconds time constant so isolated spikes don't count. A smoothed load
+    over DOWN_LOAD (or an xrun while the load is over UP_LOAD, so it could
+    be ours) steps down a tier, at most once per DOWN_HOLD seconds so the
+    new tier gets measured before dropping further. Stepping back up takes
+    UP_HOLD seconds with the smoothed load below UP_LOAD. The hold
+    timers run on stream seconds but load is wall-clock, so decisions are
+    not reproducible; traces record the tier in effect for each block and
+    replay_trace applies those switches instead of running the governor.
+    """
+
+    DOWN_LOAD = 0.75
+    DOWN_HOLD = 1.0
+    UP_LOAD = 0.4
+    UP_HOLD = 15.0
+    SMOOTHING = 0.5
+
+    def __init__(self, tier=1):
+        self.tier = tier
+        self.load = 0.0
+        self.reset()
+
+    def reset(self):
+        """Restart the hold timers, keeping the current tier"""
+        self.clock = 0.0
+        self.changed_at = 0.0
+        self.calm_since = 0.0
+
+    def measure(self, load, seconds):
+        """Fold the load of a callback covering seconds into the smoothed load"""
+        self.load += (1.0 - math.exp(-seconds / self.SMOOTHING)) * (load - self.load)
+
+    def observe(self, seconds, xrun=False):
+        """Account one measured callback, returning the new tier if it changed, else None"""
+        self.clock += seconds
+        load = self.load
+        if load > self.DOWN_LOAD or (xrun and load > self.UP_LOAD):
+            self.calm_since = self.clock
+            if self.tier > 0 and self.clock - self.changed_at >= self.DOWN_HOLD:
+                self.tier -= 1
+                self.changed_at = self.clock
+                return self.tier
+            return None
+        if load > self.UP_LOAD:
+            self.calm_since = self.clock
+        elif (self.tier < len(QUALITY_TIERS) - 1 and self.clock - self.calm_since >= self.UP_HOLD
+              and self.clock - self.changed_at >= self.UP_HOLD):
+            self.tier += 1
+            self.changed_at = self.calm_since = self.clock
+            return self.tier
+        return None
+
+
+class AudioEngine:
+    """Real-time processing chain driven by the audio callback
+
+    The engine owns everything the PortAudio thread touches. Parameters are
+    published by the GUI as a whole new dict (see set_param) so the callback
+    reads one consistent snapshot per block without taking a lock. Anything
+    the GUI has to react to is handed to post(event, *args) instead of
+    touching Tk from the audio thread.
+    """
+
+    CALLBACK_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1)
+
+    # Every stage processes exactly `hop` frames whatever the device delivers,
+    # HOP or the blocksize if that is smaller (see hop_for)
+    HOP = 256
+
+    def __init__(self, state_manager, post=None, registry=None):
+        self.state_manager = state_manager
+        self.post = post or (lambda event, *args: None)
+        self.params = {
+            "pitch": 1.0,
+            "volume": 1.0,
+            "monitor": True,
+            "correction_mode": "Off",
+            "correction_key": "C",
+            "correction_scale": "Major",
+            "correction_note": 57,
+            "effect": "Normal",
+            "vocoder_bands": 24,
+            "reverb_mix": 0.0,
+            "limiter": True,
+            "limiter_lookahead_ms": 2.0,
+            "adaptive_quality": False,
+            "noise_suppression": False,
+            "noise_reduction_db": 12.0,
+            "skip_silence": False,
+            "preroll_ms": 300.0,
+        }
+        self.samplerate = 44100
+        self.blocksize = 1024
+        self.wav_file = None
+        self.trace_recorder = None
+        self.realtime = None
+        self.callback_done = None
+        self.xruns = 0
+        self.pitch_detector = PitchDetector()
+        self.pitch_corrector = PitchCorrector()
+        self.detected_pitch = 0.0
+        self.vocoder = ChannelVocoder()
+        self.reverb = ConvolutionReverb()
+        self.limiter = LookaheadLimiter()
+        self.history = WaveformHistory()
+        self.replay = ReplayBuffer()
+        self.vad = VoiceActivityDetector()
+        self.denoiser = NoiseSuppressor()
+        self.denoising = False  # Whether the last hop went through the denoiser
+        self.preroll = ReplayBuffer(self.params["preroll_ms"] / 1000)  # Silence held back while skipping
+        self.silence_skipped = 0  # Bytes of silence left out of the current recording
+        self.sinks = ()
+        self.first_audio = None
+        self.visualize = True  # Post blocks for the meters (off while the window is hidden)
+        self.preview_capture = None  # Buffer being filled with raw input for the preset preview
+        self.preview_filled = 0
+        self.input_fifo = None
+        self.output_fifo = None
+        self.fifo_latency = 0
+        self.governor = QualityGovernor()
+        self.quality_tier = None  # None: stages follow the manual settings
+        self.stage_settings = {"quality_tier": None, "reverb_ir": None}  # Replaced, never mutated; recorded in traces
+        self.pitch_stride = 1
+        self.hop = self.HOP
+        self.hops = 0
+
+        # Written only from the audio thread
+        registry = registry if registry is not None else MetricsRegistry()
+        self.callback_seconds = registry.histogram(
+            "vchanger_callback_seconds", "Time spent in the audio callback", self.CALLBACK_BUCKETS)
+        self.xrun_counter = registry.counter(
+            "vchanger_xruns_total", "Callbacks reporting each PortAudio underflow/overflow flag",
+            label="flag", values=[name for name, bit in STATUS_FLAG_BITS if bit & XRUN_BITS])
+        self.ring_overflows = registry.counter(
+            "vchanger_ring_overflows_total", "Hops an output sink's ring was too full to take in full")
+        self.recording_bytes = registry.counter(
+            "vchanger_recording_bytes_total", "PCM bytes written to recordings")
+        self.silence_skipped_bytes = registry.counter(
+            "vchanger_recording_silence_skipped_bytes_total", "PCM bytes of silence left out of recordings")
+        self.visualize_posted = registry.counter(
+            "vchanger_visualize_posted_total", "Blocks handed to the GUI for visualization")
+        self.pitch_gauge = registry.gauge("vchanger_detected_pitch_hz", "Last detected input pitch (0 if unvoiced)")
+
+    def set_param(self, name, value):
+        """Publish a new parameter value (copy-on-write, safe from any thread)"""
+        params = dict(self.params)
+        params[name] = value
+        self.params = params
+        if name == "vocoder_bands":
+            self.set_vocoder_bands(value)
+
+    def set_vocoder_bands(self, bands):
+        """Swap in a vocoder with a new band count, designed on the calling thread
+
+        Ignored while a quality tier picks the band count.
+        """
+        if self.quality_tier is None and bands != self.vocoder.bands:
+            vocoder = ChannelVocoder(bands=bands)
+            vocoder.prepare(self.samplerate)
+            vocoder.take_over(self.vocoder)
+            self.vocoder = vocoder
+
+    def prepare(self, samplerate, blocksize):
+        """Reset processing state before a stream (or replay) starts"""
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.hop = self.hop_for(blocksize)
+        self.xruns = 0
+        self.first_audio = None
+        self.governor.reset()
+        self.hops = 0
+        self.pitch_detector.prepare(samplerate)
+        self.pitch_corrector.reset()
+        self.detected_pitch = 0.0
+        self.vocoder.bands = self._tier_setting("vocoder_bands", self.params["vocoder_bands"])
+        self.vocoder.prepare(samplerate)
+        self.reverb.max_seconds = self._tier_setting("reverb_seconds", None)
+        self.reverb.prepare(samplerate, self.hop)
+        self.limiter.lookahead_ms = self.params["limiter_lookahead_ms"]
+        self.limiter.prepare(samplerate)
+        if samplerate != self.history.samplerate:
+            self.history.prepare(samplerate)
+        if samplerate != self.replay.samplerate:
+            self.replay.prepare(samplerate)
+        self.vad.prepare(samplerate)
+        self.denoiser.prepare(samplerate, self.hop)
+        if samplerate != self.preroll.samplerate:
+            self.preroll.prepare(samplerate)
+
+        # Hop FIFOs, the output side primed with just enough silence to never run dry
+        capacity = 4 * (blocksize + self.hop)
+        self.input_fifo = RingBuffer(capacity)
+        self.output_fifo = RingBuffer(capacity)
+        self.fifo_latency = self.fifo_prefill(blocksize)
+        self.output_fifo.write(np.zeros(self.fifo_latency, dtype=np.float32))
+
+    @classmethod
+    def hop_for(cls, blocksize):
+        """Hop size for a device blocksize (0 for variable)
+
+        Small buffers get a hop of their own size, so no callback has to
+        process more audio than it covers and the FIFOs add no latency.
+        """
+        return min(cls.HOP, blocksize) if blocksize else cls.HOP
+
+    @classmethod
+    def fifo_prefill(cls, blocksize):
+        """Output FIFO priming for a fixed device blocksize
+
+        After n callbacks n * blocksize frames were requested but only whole
+        hops have been processed; the shortfall peaks at hop - gcd(blocksize,
+        hop) frames (zero when the blocksize is a multiple of the hop).
+        """
+        hop = cls.hop_for(blocksize)
+        return hop - math.gcd(blocksize, hop)
+
+    def added_latency(self, samplerate=None, blocksize=None):
+        """Latency added by processing stages, in samples, keyed by stage
+
+        The hop FIFOs are reported for blocksize if given, otherwise as
+        measured on the running stream (which grows if a variable frame
+        count ever ran the output FIFO dry).
+        """
+        samplerate = samplerate or self.samplerate
+        params = self.params
+        latency = {}
+        fifo = self.fifo_latency if blocksize is None else self.fifo_prefill(blocksize)
+        if fifo:
+            latency["hop fifo"] = fifo
+        if params["noise_suppression"]:
+            latency["noise suppression"] = self.denoiser.latency
+        if params["limiter"]:
+            latency["limiter"] = max(1, int(round(params["limiter_lookahead_ms"] * samplerate / 1000.0)))
+        return latency
+
+    def tail_samples(self):
+        """Output still to come once the input stops: the added latency plus the reverb tail"""
+        tail = sum(self.added_latency().values())
+        convolver = self.reverb.convolver
+        if self.params["reverb_mix"] > 0.0 and convolver is not None:
+            tail += convolver.partitions * convolver.block
+        return tail
+
+    def load_impulse_response(self, path):
+        """Load a reverb IR, swapping in a convolver built for the current format"""
+        reverb = ConvolutionReverb()
+        reverb.load(path)
+        reverb.max_seconds = self._tier_setting("reverb_seconds", None)
+        reverb.prepare(self.samplerate, self.hop)
+        reverb.take_over(self.reverb)
+        self.reverb = reverb
+        self.stage_settings = dict(self.stage_settings, reverb_ir=reverb.path)
+
+    def _tier_setting(self, name, manual):
+        return manual if self.quality_tier is None else QUALITY_TIERS[self.quality_tier][name]
+
+    def apply_quality_tier(self, tier):
+        """Rebuild stages for a quality tier (None for the manual settings)
+
+        Called off the audio thread; new stage objects are built first and
+        swapped in by reference so the callback never designs filters or
+        partitions an IR itself. They take over from the stages they replace
+        (the vocoder crossfades, the reverb keeps its tail), so a switch
+        neither clicks nor cuts the tail off.
+        """
+        if tier is not None:
+            self.quality_tier = tier
+        vocoder = ChannelVocoder(bands=QUALITY_TIERS[tier]["vocoder_bands"] if tier is not None
+                                 else self.params["vocoder_bands"])
+        vocoder.prepare(self.samplerate)
+        reverb = ConvolutionReverb()
+        reverb.ir, reverb.ir_rate = self.reverb.ir, self.reverb.ir_rate
+        reverb.name, reverb.path = self.reverb.name, self.reverb.path
+        reverb.max_seconds = QUALITY_TIERS[tier]["reverb_seconds"] if tier is not None else None
+        reverb.prepare(self.samplerate, self.hop)
+        vocoder.take_over(self.vocoder)
+        reverb.take_over(self.reverb)
+        self.vocoder = vocoder
+        self.reverb = reverb
+        self.pitch_stride = QUALITY_TIERS[tier]["pitch_stride"] if tier is not None else 1
+        self.quality_tier = tier
+        self.stage_settings = dict(self.stage_settings, quality_tier=tier)
+
+    def audio_callback(self, indata, outdata, frames, time_info, status):
+        """Process audio data in real-time with improved reliability"""
+        started = time.perf_counter()
+        realtime = self.realtime
+        if realtime is not None and not realtime.thread_configured:
+            self.post("realtime_report", realtime.configure_callback_thread())
+
+        # priming_output only marks the first blocks of a stream, it isn't an xrun
+        bits = status_to_bits(status)
+        if bits & XRUN_BITS:
+            self.xruns += 1
+            for name, bit in STATUS_FLAG_BITS:
+                if bits & bit & XRUN_BITS:
+                    self.xrun_counter.inc(label_value=name)
+
+        params = self.params
+        stages = self.stage_settings
+        with TIMELINE.span("audio_callback"):
+            self._run_callback(indata, outdata, frames, status, params)
+
+        recorder = self.trace_recorder
+        if recorder is not None:
+            recorder.record(indata, outdata, frames, time_info, status, params, stages)
+        elapsed = time.perf_counter() - started
+        self.callback_seconds.observe(elapsed)
+
+        # Let the governor trade quality for headroom
+        if frames:
+            seconds = frames / self.samplerate
+            self.governor.measure(elapsed / seconds, seconds)
+            if params["adaptive_quality"]:
+                tier = self.governor.observe(seconds, bool(bits & XRUN_BITS))
+                if tier is not None:
+                    self.post("quality_tier", tier)
+
+        # Wake the audio loop, the gap until the next block is a safe point
+        if self.callback_done is not None:
+            self.callback_done.set()
+
+    def _run_callback(self, indata, outdata, frames, status, params):
+        if status:
+            print(f'Audio callback status: {status}')
+            # Handle xrun errors gracefully
+            if isinstance(status, CallbackAbort):
+                self.post("stream_abort")
+                outdata[:] = np.zeros_like(indata)
+                return
+            
+        # Get the running state in a thread-safe way
+        is_running = self.state_manager.running
+        if not is_running:
+            outdata[:] = np.zeros_like(indata)
+            return
+
+        try:
+            audio = indata[:, 0].copy()  # Make a copy to prevent buffer issues
+            
+            # Clip input to prevent overflow
+            audio = np.clip(audio, -1.0, 1.0)
+            
+            # Keep the waveform history complete even if the GUI falls behind
+            self.history.push(audio)
+            if self.preview_capture is not None:
+                self._fill_preview(audio)
+
+            # Update visualizations on main thread, unless the window is hidden
+            if self.visualize:
+                self.visualize_posted.inc()
+                self.post("visualize", audio)
+
+            # Process whole hops as they become available
+            self.input_fifo.write(audio)
+            while self.input_fifo.available() >= self.hop:
+                hop = np.empty(self.hop, dtype=np.float32)
+                self.input_fifo.read(hop)
+                self.output_fifo.write(self._process_hop(hop, params))
+
+            # Hand the device what has been processed so far
+            out = outdata[:, 0]
+            ready = self.output_fifo.read(out)
+            if ready < frames:
+                # Variable frame counts can outrun the priming, pad once and keep the extra latency
+                out[ready:] = 0.0
+                self.fifo_latency += frames - ready
+            if not params["monitor"]:
+                outdata[:] = 0.0
+
+        except Exception as e:
+            print(f"Callback error: {e}")
+            outdata[:] = np.zeros_like(indata)
+            # Schedule UI update and cleanup on main thread
+            self.post("callback_error", str(e))
+
+    def capture_preview(self, seconds):
+        """Start collecting the next few seconds of raw input, posted as "preview_captured" when full"""
+        self.preview_filled = 0
+        self.preview_capture = np.zeros(int(seconds * self.samplerate), dtype=np.float32)
+
+    def _fill_preview(self, audio):
+        capture = self.preview_capture
+        count = min(len(audio), len(capture) - self.preview_filled)
+        capture[self.preview_filled:self.preview_filled + count] = audio[:count]
+        self.preview_filled += count
+        if self.preview_filled == len(capture):
+            self.preview_capture = None
+            self.post("preview_captured", capture)
+
+    def _process_hop(self, audio, params):
+        """Run one fixed-size hop through the chain and hand it to sinks and the recorder"""
+        # Track the input pitch and fold any correction into the shift
+        self.hops += 1
+        self.vad.update(audio)
+        if params["noise_suppression"]:
+            if not self.denoising:
+                # Don't play out the hop left over from when the stage was last on
+                self.denoiser.reset()
+                self.denoising = True
+            # Learn the noise while nobody is talking, and clean up before pitch tracking and shifting
+            self.denoiser.reduction_db = params["noise_reduction_db"]
+            with TIMELINE.span("noise_suppression"):
+                audio = self.denoiser.process(audio, learn=not self.vad.active)
+        else:
+            self.denoising = False
+        with TIMELINE.span("pitch_detect"):
+            self.pitch_detector.push(audio)
+            # Analyse at the same rate whatever the hop size
+            if self.hops % (self.pitch_stride * max(1, self.HOP // self.hop)) == 0:
+                self.detected_pitch = self.pitch_detector.analyse()
+        self.pitch_gauge.set(self.detected_pitch)
+        pitch = params["pitch"] * self.pitch_corrector.ratio(
+            self.detected_pitch, params["pitch"], params, self.hop / self.samplerate)
+
+        # Process audio
+        with TIMELINE.span("_process_audio"):
+            shifted_audio = self._process_audio(audio, pitch, params)
+        output_audio = shifted_audio * params["volume"]
+        if params["limiter"]:
+            if params["limiter_lookahead_ms"] != self.limiter.lookahead_ms:
+                self.limiter.lookahead_ms = params["limiter_lookahead_ms"]
+                self.limiter.prepare(self.samplerate)
+            with TIMELINE.span("limiter"):
+                output_audio = self.limiter.process(output_audio)
+        output_audio = np.clip(output_audio, -1.0, 1.0)
+
+        # Fan the same processed hop out to any additional outputs
+        for sink in self.sinks:
+            if not sink.push(output_audio):
+                self.ring_overflows.inc()
+
+        # Keep the last few seconds around for instant replay
+        self.replay.push(output_audio)
+
+        if self.first_audio is None:
+            self.first_audio = time.perf_counter()
+            self.post("first_audio")
+
+        # Handle recording
+        with TIMELINE.span("_handle_recording"):
+            self._handle_recording(output_audio, params)
+        return output_audio
+
+    def _process_audio(self, audio, pitch, params):
+        """Process audio with pitch shifting, the preset's effect stage and reverb"""
+        audio = self._shift_pitch(audio, pitch)
+
+        if params["effect"] == "Robot":
+            with TIMELINE.span("vocoder"):
+                audio = self.vocoder.process(audio)
+
+        if params["reverb_mix"] > 0.0:
+            with TIMELINE.span("reverb"):
+                audio = self.reverb.process(audio, params["reverb_mix"])
+        return audio
+
+    def _shift_pitch(self, audio, pitch):
+        """Shift pitch by resampling the block"""
+        if pitch != 1.0:
+            indices = np.linspace(0, len(audio)-1, int(len(audio)/pitch))
+            shifted_audio = np.interp(indices, np.arange(len(audio)), audio)
+            
+            # Apply smoothing to reduce artifacts
+            if len(shifted_audio) < len(audio):
+                shifted_audio = np.pad(shifted_audio, (0, len(audio) - len(shifted_audio)), mode='linear_ramp')
+            elif len(shifted_audio) > len(audio):
+                shifted_audio = shifted_audio[:len(audio)]
+            return shifted_audio
+        return audio
+
+    def begin_recording(self, wav_file, samplerate):
+        """Hand a freshly opened WAV file to the audio thread"""
+        preroll = ReplayBuffer(self.params["preroll_ms"] / 1000)
+        preroll.prepare(samplerate)
+        self.preroll = preroll
+        self.silence_skipped = 0
+        self.wav_file = wav_file
+
+    def _handle_recording(self, audio, params):
+        """Handle recording of processed audio"""
+        # Check recording state in thread-safe way
+        is_recording = self.state_manager.recording
+        wav_file = self.wav_file
+        if is_recording and wav_file:
+            try:
+                if params["skip_silence"] and not self.vad.active:
+                    # Hold silence back in the pre-roll, whatever falls out of it is skipped
+                    preroll = self.preroll
+                    held = min(preroll.written, len(preroll.data))
+                    preroll.push(audio)
+                    skipped = 2 * (held + len(audio) - min(preroll.written, len(preroll.data)))
+                    self.silence_skipped += skipped
+                    self.silence_skipped_bytes.inc(skipped)
+                    return
+                if self.preroll.written:
+                    # Speech onset, lead in with the silence just before it
+                    data_to_write = self.preroll.snapshot().tobytes()
+                    self.preroll.clear()
+                    wav_file.writeframes(data_to_write)
+                    self.recording_bytes.inc(len(data_to_write))
+                data_to_write = (audio * 32767).astype(np.int16).tobytes()
+                wav_file.writeframes(data_to_write)
+                self.recording_bytes.inc(len(data_to_write))
+            except Exception as e:
+                print(f"Recording error: {e}")
+                self.post("recording_error", str(e))  # Safely stop recording on error
+
+
+NOTE_NAMES = ["C", "C#", "D", "D#", "E", "F", "F#", "G", "G#", "A", "A#", "B"]
+
+SCALES = {
+    "Chromatic": (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11),
+    "Major": (0, 2, 4, 5, 7, 9, 11),
+    "Minor": (0, 2, 3, 5, 7, 8, 10),
+    "Pentatonic": (0, 2, 4, 7, 9),
+}
+
+
+def freq_to_midi(freq):
+    return 69.0 + 12.0 * math.log2(freq / 440.0)
+
+
+def midi_to_freq(midi):
+    return 440.0 * 2.0 ** ((midi - 69.0) / 12.0)
+
+
+def note_to_midi(name):
+    """Parse a note name such as "A#3" into a MIDI number"""
+    pitch_class, octave = name[:-1], int(name[-1])
+    return NOTE_NAMES.index(pitch_class) + (octave + 1) * 12
+
+
+def note_name(midi):
+    """Name of the nearest note, e.g. 57 -> A3"""
+    midi = int(round(midi))
+    return f"{NOTE_NAMES[midi % 12]}{midi // 12 - 1}"
+
+
+class VoiceActivityDetector:
+    """Energy and zero-crossing voice activity detector with hangover
+
+    Each block is reduced to two vectorized features, its energy in dB and
+    its zero-crossing rate. The noise floor follows the quietest blocks,
+    dropping at once and rising by floor_rise_db per second, so a steady
+    background is learned within seconds and syllable gaps keep pulling it
+    back down during speech. A block is speech when it clears the floor by
+    margin_db, or by half that with the high crossing rate of a fricative
+    (quiet but noisy). active stays set for hangover_ms after the last
+    speech block so word endings and short pauses are kept.
+    """
+
+    def __init__(self, margin_db=9.0, hangover_ms=300.0, floor_rise_db=1.5, min_floor_db=-70.0,
+                 fricative_crossings=3000.0):
+        self.margin_db = margin_db
+        self.hangover_ms = hangover_ms
+        self.floor_rise_db = floor_rise_db
+        self.min_floor_db = min_floor_db
+        self.fricative_crossings = fricative_crossings
+        self.prepare(44100)
+
+    def prepare(self, samplerate):
+        """Forget the noise floor and hangover"""
+        self.samplerate = samplerate
+        self.floor_db = None
+        self.hold = 0
+        self.speech = False
+        self.active = False
+
+    def update(self, audio):
+        """Classify one block, returning whether voice is active (hangover included)"""
+        energy_db = 10.0 * math.log10(float(np.dot(audio, audio)) / len(audio) + 1e-12)
+        crossings = np.count_nonzero(np.signbit(audio[1:]) != np.signbit(audio[:-1]))
+        crossing_rate = crossings * self.samplerate / len(audio)
+
+        if self.floor_db is None:
+            self.floor_db = energy_db
+        rise = self.floor_rise_db * len(audio) / self.samplerate
+        self.floor_db = max(self.min_floor_db, min(energy_db, self.floor_db + rise))
+
+        above = energy_db - self.floor_db
+        self.speech = above > self.margin_db or (
+            above > 0.5 * self.margin_db and crossing_rate > self.fricative_crossings)
+        if self.speech:
+            self.hold = int(self.hangover_ms * self.samplerate / 1000)
+        else:
+            self.hold = max(0, self.hold - len(audio))
+        self.active = self.speech or self.hold > 0
+        return self.active
+
+
+class PitchDetector:
+    """YIN pitch tracker with an FFT-based difference function
+
+    Keeps a history of the last 2 * tau_max samples, so every block is
+    analysed over a window long enough for the lowest pitch regardless of the
+    device block size. The difference function comes from one cross-correlation
+    via rfft plus cumulative energy sums, so the cost per block is a couple of
+    FFTs instead of O(W * tau_max).
+    """
+
+    def __init__(self, fmin=70.0, fmax=1000.0, threshold=0.15, silence_rms=0.01):
+        self.fmin = fmin
+        self.fmax = fmax
+        self.threshold = threshold
+        self.silence_rms = silence_rms
+        self.prepare(44100)
+
+    def prepare(self, samplerate):
+        """Allocate the analysis buffers for a sample rate"""
+        self.samplerate = samplerate
+        self.tau_min = max(2, int(samplerate / self.fmax))
+        self.tau_max = int(math.ceil(samplerate / self.fmin))
+        self.window = self.tau_max
+        self.history = np.zeros(self.window + self.tau_max, dtype=np.float64)
+        self.nfft = 1 << int(math.ceil(math.log2(len(self.history) + self.window)))
+        self.taus = np.arange(self.tau_max + 1, dtype=np.float64)
+        self.pitch = 0.0
+        self.confidence = 0.0
+
+    def process(self, audio):
+        """Push a block and return the detected pitch in Hz (0.0 when unvoiced)"""
+        self.push(audio)
+        return self.analyse()
+
+    def push(self, audio):
+        """Append a block to the analysis history without analysing it"""
+        n = len(audio)
+        history = self.history
+        if n >= len(history):
+            history[:] = audio[-len(history):]
+        else:
+            history[:-n] = history[n:]
+            history[-n:] = audio
+
+    def analyse(self):
+        """Detect the pitch over the current history"""
+        history = self.history
+        window = self.window
+        frame = history
+        energy = np.dot(frame[:window], frame[:window])
+        if energy < self.silence_rms ** 2 * window:
+            self.pitch, self.confidence = 0.0, 0.0
+            return self.pitch
+
+        # d(tau) = E(0) + E(tau) - 2 r(tau)
+        spectrum = np.fft.rfft(frame, self.nfft)
+        spectrum *= np.conj(np.fft.rfft(frame[:window], self.nfft))
+        r = np.fft.irfft(spectrum, self.nfft)[:self.tau_max + 1]
+        squares = np.concatenate(([0.0], np.cumsum(frame * frame)))
+        shifted_energy = squares[window:window + self.tau_max + 1] - squares[:self.tau_max + 1]
+        diff = energy + shifted_energy - 2.0 * r
+
+        # Cumulative mean normalized difference
+        cmnd = np.empty_like(diff)
+        cmnd[0] = 1.0
+        running = np.cumsum(diff[1:])
+        cmnd[1:] = diff[1:] * self.taus[1:] / np.maximum(running, 1e-12)
+
+        candidates = np.flatnonzero(cmnd[self.tau_min:] < self.threshold)
+        if len(candidates) == 0:
+            self.pitch, self.confidence = 0.0, 0.0
+            return self.pitch
+
+        # Walk down to the local minimum after the first dip below threshold
+        tau = self.tau_min + candidates[0]
+        rising = np.flatnonzero(np.diff(cmnd[tau:]) >= 0)
+        if len(rising):
+            tau += rising[0]
+
+        # Parabolic interpolation around the minimum
+        shift = 0.0
+        if 0 < tau < self.tau_max:
+            a, b, c = cmnd[tau - 1], cmnd[tau], cmnd[tau + 1]
+            denominator = a - 2.0 * b + c
+            if denominator > 0:
+                shift = 0.5 * (a - c) / denominator
+
+        self.confidence = float(1.0 - cmnd[tau])
+        self.pitch = float(self.samplerate / (tau + shift))
+        return self.pitch
+
+
+class PitchCorrector:
+    """Turns the detected pitch into an extra pitch-shift ratio
+
+    "Scale" snaps the output pitch to the nearest note of a key/scale, "Note"
+    pulls it to one fixed note. The correction glides in the semitone domain
+    and relaxes back to no correction while the input is unvoiced.
+    """
+
+    MODES = ["Off", "Scale", "Note"]
+
+    def __init__(self, glide=0.05):
+        self.glide = glide
+        self.semitones = 0.0
+
+    def reset(self):
+        self.semitones = 0.0
+
+    def target_midi(self, midi, params):
+        """The note the output pitch (in MIDI numbers) should be moved to"""
+        if params.get("correction_mode") == "Note":
+            return float(params.get("correction_note", 57))
+        key = NOTE_NAMES.index(params.get("correction_key", "C"))
+        degrees = SCALES.get(params.get("correction_scale", "Major"), SCALES["Chromatic"])
+        nearest = int(round(midi))
+        candidates = [m for m in range(nearest - 6, nearest + 7) if (m - key) % 12 in degrees]
+        return float(min(candidates, key=lambda m: abs(m - midi)))
+
+    def ratio(self, detected, pitch, params, block_seconds):
+        """Correction ratio to multiply into the pitch-shift ratio"""
+        if params.get("correction_mode", "Off") == "Off":
+            self.semitones = 0.0
+            return 1.0
+
+        target = 0.0
+        if detected > 0.0:
+            midi = freq_to_midi(detected * pitch)
+            target = self.target_midi(midi, params) - midi
+
+        alpha = 1.0 - math.exp(-block_seconds / self.glide)
+        self.semitones += (target - self.semitones) * alpha
+        return 2.0 ** (self.semitones / 12.0)
+
+
+class BatchedFilterbank:
+    """A bank of IIR filters (given as SOS cascades) run as one batched operation
+
+    Each band's cascade is converted to a state-space model once. For a chunk of
+    C samples the whole bank is then exact block arithmetic: outputs are
+    T @ x + O @ state (T is the lower-triangular Toeplitz matrix of the impulse
+    response) and the new state is A^C @ state + G @ x. All bands go through the
+    same matmuls, so the cost is independent of Python per-band loops. Longer
+    inputs are split into chunks, shorter ones use leading slices of the same
+    matrices.
+    """
+
+    def __init__(self, sos_bands, chunk=64):
+        from scipy import signal
+
+        self.chunk = chunk
+        models = [self._cascade_ss(signal, sos) for sos in sos_bands]
+        bands = len(models)
+        order = models[0][0].shape[0]
+
+        self.T = np.zeros((bands, chunk, chunk))
+        self.O = np.empty((bands, chunk, order))
+        self.AB = np.empty((bands, chunk, order))     # A^k B
+        self.A_pow = np.empty((bands, chunk + 1, order, order))
+        for band, (A, B, C, D) in enumerate(models):
+            power = np.eye(order)
+            impulse = np.empty(chunk)
+            impulse[0] = D[0, 0]
+            for k in range(chunk + 1):
+                self.A_pow[band, k] = power
+                if k < chunk:
+                    self.O[band, k] = (C @ power)[0]
+                    self.AB[band, k] = (power @ B)[:, 0]
+                    if k + 1 < chunk:
+                        impulse[k + 1] = (C @ power @ B)[0, 0]
+                power = A @ power
+            for k in range(chunk):
+                self.T[band, k:, k] = impulse[:chunk - k]
+        self.state = np.zeros((bands, order))
+
+    @staticmethod
+    def _cascade_ss(signal, sos):
+        """State-space model of an SOS cascade, built section by section
+
+        Going through one high-order transfer function loses precision for
+        narrow low bands, chaining per-section models keeps it.
+        """
+        A, B, C, D = signal.tf2ss(sos[0, :3], sos[0, 3:])
+        for section in sos[1:]:
+            A2, B2, C2, D2 = signal.tf2ss(section[:3], section[3:])
+            A = np.block([[A, np.zeros((A.shape[0], A2.shape[1]))], [B2 @ C, A2]])
+            B = np.vstack([B, B2 @ D])
+            C = np.hstack([D2 @ C, C2])
+            D = D2 @ D
+        return A, B, C, D
+
+    def reset(self):
+        self.state[:] = 0.0
+
+    def process(self, x):
+        """Filter one input signal through every band, returning (bands, len(x))"""
+        n = len(x)
+        out = np.empty((self.state.shape[0], n))
+        for start in range(0, n, self.chunk):
+            chunk = x[start:start + self.chunk]
+            r = len(chunk)
+            out[:, start:start + r] = (self.T[:, :r, :r] @ chunk
+                                       + np.einsum("bks,bs->bk", self.O[:, :r], self.state))
+            # G_r[:, k] = A^(r-1-k) B
+            self.state = (np.einsum("bst,bt->bs", self.A_pow[:, r], self.state)
+                          + np.einsum("bks,k->bs", self.AB[:, r - 1::-1], chunk))
+        return out
+
+
+class ChannelVocoder:
+    """Channel vocoder for the "Robot" preset
+
+    The voice (modulator) is split into log-spaced bands whose envelopes
+    drive the same bands of a buzzy carrier oscillator. Analysis and synthesis
+    each run as one BatchedFilterbank, envelopes are one-pole followers over
+    all bands at once, and all filter/oscillator state carries across blocks.
+    A vocoder swapped in for another (see take_over) crossfades from it over
+    CROSSFADE_SECONDS, as their band layouts can't share state.
+    """
+
+    QUALITY_BANDS = (16, 24, 32)
+    CROSSFADE_SECONDS = 0.03
+
+    def __init__(self, bands=24, carrier_hz=100.0, envelope_hz=40.0, chunk=64,
+                 fmin=100.0, fmax=7000.0, noise=0.05):
+        self.bands = bands
+        self.carrier_hz = carrier_hz
+        self.envelope_hz = envelope_hz
+        self.chunk = chunk
+        self.fmin = fmin
+        self.fmax = fmax
+        self.noise = noise
+        self.samplerate = None
+        self.outgoing = None
+        self.started = False
+
+    def prepare(self, samplerate):
+        """Design the filterbanks for a sample rate and clear all state"""
+        from scipy import signal
+
+        self.samplerate = samplerate
+        fmax = min(self.fmax, 0.45 * samplerate)
+        edges = np.geomspace(self.fmin, fmax, self.bands + 1)
+        sos_bands = [signal.butter(2, (low, high), btype="bandpass", output="sos", fs=samplerate)
+                     for low, high in zip(edges[:-1], edges[1:])]
+        self.analysis = BatchedFilterbank(sos_bands, self.chunk)
+        self.synthesis = BatchedFilterbank(sos_bands, self.chunk)
+
+        # Envelope follower: y[n] = (1 - a) |x[n]| + a y[n-1]
+        a = math.exp(-2 * math.pi * self.envelope_hz / samplerate)
+        self.env_b = np.array([1.0 - a])
+        self.env_a = np.array([1.0, -a])
+        self.env_state = np.zeros((self.bands, 1))
+
+        self.phase = 0.0
+        self.rng = np.random.default_rng(0)
+        # Band outputs are narrow, compensate so overall level matches the input
+        self.gain = 2.0 * math.sqrt(self.bands)
+        self.outgoing = None
+        self.faded = 0
+        self.started = False
+
+    def take_over(self, previous):
+        """Crossfade from the vocoder this one replaces once it starts processing"""
+        self.outgoing = previous if previous.started else previous.outgoing
+
+    def process(self, audio):
+        """Vocode one block of the voice, returning the robot voice"""
+        from scipy import signal
+
+        n = len(audio)
+        outgoing = self.outgoing
+        if outgoing is not None and not self.started:
+            self.phase = outgoing.phase  # Keep the carrier continuous
+        self.started = True
+        bands = self.analysis.process(audio)
+        envelopes, self.env_state = signal.lfilter(self.env_b, self.env_a, np.abs(bands),
+                                                   axis=1, zi=self.env_state)
+
+        # Naive sawtooth plus a little noise so fricatives still come through
+        increment = self.carrier_hz / self.samplerate
+        phases = (self.phase + increment * np.arange(1, n + 1)) % 1.0
+        self.phase = phases[-1]
+        carrier = 2.0 * phases - 1.0 + self.noise * self.rng.standard_normal(n)
+
+        excited = self.synthesis.process(carrier)
+        voiced = self.gain * np.einsum("bn,bn->n", envelopes, excited)
+        if outgoing is not None:
+            fade = max(1, int(self.CROSSFADE_SECONDS * self.samplerate))
+            ramp = np.minimum((self.faded + np.arange(1, n + 1)) / fade, 1.0)
+            voiced = ramp * voiced + (1.0 - ramp) * outgoing.process(audio)
+            self.faded += n
+            if self.faded >= fade:
+                self.outgoing = None
+        return voiced
+
+
+def read_wav_mono(path):
+    """Read a PCM WAV file as float64 mono, returning (audio, samplerate)"""
+    with wave.open(path, "rb") as wav_file:
+        channels = wav_file.getnchannels()
+        width = wav_file.getsampwidth()
+        samplerate = wav_file.getframerate()
+        raw = wav_file.readframes(wav_file.getnframes())
+
+    if width == 1:
+        audio = (np.frombuffer(raw, dtype=np.uint8).astype(np.float64) - 128.0) / 128.0
+    elif width == 2:
+        audio = np.frombuffer(raw, dtype="<i2") / 32768.0
+    elif width == 3:
+        bytes_ = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = bytes_[:, 0] | (bytes_[:, 1] << 8) | (bytes_[:, 2] << 16)
+        audio = np.where(values >= 1 << 23, values - (1 << 24), values) / float(1 << 23)
+    elif width == 4:
+        audio = np.frombuffer(raw, dtype="<i4") / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported sample width: {width * 8} bits")
+    return audio.reshape(-1, channels).mean(axis=1), samplerate
+
+
+def resample_linear(audio, from_rate, to_rate):
+    """Resample by linear interpolation (good enough for impulse responses)"""
+    if from_rate == to_rate:
+        return np.asarray(audio, dtype=np.float64)
+    length = int(round(len(audio) * to_rate / from_rate))
+    positions = np.arange(length) * (from_rate / to_rate)
+    return np.interp(positions, np.arange(len(audio)), audio)
+
+
+class PartitionedConvolver:
+    """Uniformly partitioned FFT convolution with one block of latency
+
+    The impulse response is cut into block-sized partitions whose spectra are
+    computed once. Each incoming block's spectrum enters a frequency-domain
+    delay line, and one multiply-accumulate against the cached partition
+    spectra produces the next output block (overlap-save). The delay line is
+    stored twice over, so the newest-to-oldest window is always one contiguous
+    slice and no reordering is needed per block.
+    """
+
+    def __init__(self, ir, block):
+        self.block = block
+        self.fft_size = 2 * block
+        partitions = max(1, int(math.ceil(len(ir) / block)))
+        padded = np.zeros(partitions * block)
+        padded[:len(ir)] = ir
+        spectra = np.fft.rfft(padded.reshape(partitions, block), self.fft_size, axis=1)
+        # Reversed so spectra[j] pairs with delay line row w + 1 + j (oldest first)
+        self.spectra = np.ascontiguousarray(spectra[::-1])
+        self.partitions = partitions
+        self.delay_line = np.zeros((2 * partitions, block + 1), dtype=np.complex128)
+        self.write = 0
+        self.input = np.zeros(self.fft_size)
+
+    def reset(self):
+        self.delay_line[:] = 0.0
+        self.input[:] = 0.0
+        self.write = 0
+
+    def process(self, block):
+        """Convolve one block (exactly self.block samples)"""
+        n = self.block
+        self.input[:n] = self.input[n:]
+        self.input[n:] = block
+
+        spectrum = np.fft.rfft(self.input)
+        w = self.write
+        self.delay_line[w] = spectrum
+        self.delay_line[w + self.partitions] = spectrum
+        window = self.delay_line[w + 1:w + 1 + self.partitions]
+        self.write = (w + 1) % self.partitions
+
+        accumulated = np.einsum("pk,pk->k", self.spectra, window)
+        return np.fft.irfft(accumulated, self.fft_size)[n:]
+
+    def carry_from(self, other):
+        """Take over the input history of a convolver with the same block size
+
+        Called before the first block; the newest partitions that fit are
+        copied, so the tail of what other already heard keeps ringing.
+        """
+        count = min(self.partitions, other.partitions)
+        end = other.write + other.partitions
+        newest = other.delay_line[end - count:end]
+        self.delay_line[self.partitions - count:self.partitions] = newest
+        self.delay_line[2 * self.partitions - count:] = newest
+        self.write = 0
+        self.input[:] = other.input
+
+
+class ConvolutionReverb:
+    """Room/space effect convolving the voice with a loaded impulse response"""
+
+    def __init__(self):
+        self.ir = None
+        self.ir_rate = None
+        self.name = None
+        self.path = None
+        self.samplerate = 44100
+        self.convolver = None
+        self.max_seconds = None
+        self.predecessor = None
+        self.started = False
+
+    def load(self, path):
+        """Load an impulse response WAV (call prepare() afterwards)"""
+        ir, ir_rate = read_wav_mono(path)
+        # Normalize to unit energy so the wet level doesn't depend on the IR
+        norm = np.sqrt(np.sum(ir * ir))
+        if norm == 0:
+            raise ValueError("Impulse response is silent")
+        self.ir, self.ir_rate = ir / norm, ir_rate
+        self.name = os.path.basename(path)
+        self.path = os.path.abspath(path)
+
+    def prepare(self, samplerate, blocksize):
+        """Build the partitioned convolver for the stream format"""
+        self.samplerate = samplerate
+        self.predecessor = None
+        self.started = False
+        if self.ir is None:
+            self.convolver = None
+            return
+        ir = resample_linear(self.ir, self.ir_rate, samplerate)
+        if self.max_seconds is not None:
+            # Lower quality tiers keep only the start of the tail
+            ir = ir[:max(1, int(self.max_seconds * samplerate))]
+        self.convolver = PartitionedConvolver(ir, blocksize)
+
+    def take_over(self, previous):
+        """Continue the tail of the reverb this one replaces once it starts processing"""
+        self.predecessor = previous if previous.started else previous.predecessor
+
+    def process(self, audio, mix):
+        convolver = self.convolver
+        if convolver is None:
+            return audio
+        if len(audio) != convolver.block:
+            # Partition size follows the stream block size
+            self.prepare(self.samplerate, len(audio))
+            convolver = self.convolver
+        predecessor = self.predecessor
+        if predecessor is not None:
+            self.predecessor = None
+            if predecessor.convolver is not None and predecessor.convolver.block == convolver.block:
+                convolver.carry_from(predecessor.convolver)
+        self.started = True
+        wet = convolver.process(audio)
+        return (1.0 - mix) * audio + mix * wet
+
+
+def sliding_max(values, window):
+    """out[i] = max(values[i:i + window]) for every full window (van Herk/Gil-Werman)
+
+    Running maxima forward and backward inside window-sized segments make each
+    output one comparison, about three comparisons per sample regardless of the
+    window length, and every step is a vectorized accumulate.
+    """
+    count = len(values) - window + 1
+    segments = -(-len(values) // window)
+    padded = np.full(segments * window, -np.inf)
+    padded[:len(values)] = values
+    blocks = padded.reshape(segments, window)
+    forward = np.maximum.accumulate(blocks, axis=1).ravel()
+    backward = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return np.maximum(backward[:count], forward[window - 1:window - 1 + count])
+
+
+class LookaheadLimiter:
+    """Brickwall peak limiter with a short look-ahead delay
+
+    Per block: the peak over the look-ahead window comes from sliding_max over
+    the carried history, a release hold is applied as a cumulative maximum in
+    the log domain (env[n] = max(peak[n], r * env[n-1]) without a sample loop),
+    and the gain is averaged over the look-ahead so it has fully ramped down by
+    the time the peak leaves the delay line. The delayed signal times that gain
+    never exceeds the ceiling.
+    """
+
+    def __init__(self, lookahead_ms=2.0, release_ms=80.0, ceiling=0.944):
+        self.lookahead_ms = lookahead_ms
+        self.release_ms = release_ms
+        self.ceiling = ceiling
+        self.prepare(44100)
+
+    def prepare(self, samplerate):
+        """Allocate the delay line and gain state for a sample rate"""
+        self.samplerate = samplerate
+        self.lookahead = max(1, int(round(self.lookahead_ms * samplerate / 1000.0)))
+        self.log_release = -1.0 / (self.release_ms * samplerate / 1000.0)
+        window = self.lookahead + 1
+        self.peak_history = np.zeros(window - 1)
+        self.delay = np.zeros(self.lookahead)
+        self.gain_history = np.ones(window - 1)
+        self.log_envelope = np.log(self.ceiling)
+        self.gain_reduction = 1.0
+
+    @property
+    def latency(self):
+        """Added latency in samples"""
+        return self.lookahead
+
+    def process(self, audio):
+        """Limit one block, returning it delayed by self.latency samples"""
+        n = len(audio)
+        window = self.lookahead + 1
+
+        # Peak of |x| over the look-ahead window ending at each sample
+        magnitude = np.concatenate((self.peak_history, np.abs(audio)))
+        peak = sliding_max(magnitude, window)
+        self.peak_history = magnitude[-(window - 1):]
+
+        # Release hold: log env[n] = max over k <= n of (log peak[k] + (n - k) log r)
+        steps = np.arange(1, n + 1) * self.log_release
+        held = np.maximum.accumulate(np.log(np.maximum(peak, 1e-9)) - steps)
+        log_envelope = np.maximum(held, self.log_envelope) + steps
+        self.log_envelope = log_envelope[-1]
+
+        target = np.minimum(1.0, self.ceiling * np.exp(-log_envelope))
+
+        # Moving average over the look-ahead so the gain ramps before the peak arrives
+        gains = np.concatenate((self.gain_history, target))
+        sums = np.cumsum(np.concatenate(([0.0], gains)))
+        gain = (sums[window:] - sums[:-window]) / window
+        self.gain_history = gains[-(window - 1):]
+        self.gain_reduction = float(gain.min())
+
+        delayed = np.concatenate((self.delay, audio))
+        self.delay = delayed[-self.lookahead:]
+        return delayed[:n] * gain
+
+
+class NoiseSuppressor:
+    """Wiener-style spectral noise suppressor with a learned noise profile
+
+    Frames of two hops are windowed with a cached periodic sqrt-Hann, which
+    reconstructs exactly under 50% overlap-add with the same window on
+    synthesis. While learn is set (the voice activity detector hears
+    silence) each frame's power spectrum is averaged into the noise profile.
+    Every frame gets a per-bin gain from a decision-directed a priori SNR,
+    floored at -reduction_db, which keeps the musical noise of plain
+    subtraction down. The window, frame, per-bin arrays and scratch space
+    are allocated in prepare() and updated in place; only the FFT outputs
+    are new per hop (numpy's FFTs can't write into a given buffer before
+    numpy 2.0), and the returned block is a view of the inverse FFT. Adds
+    one hop of latency.
+    """
+
+    def __init__(self, reduction_db=12.0, learn_seconds=0.5, smoothing=0.98):
+        self.reduction_db = reduction_db
+        self.learn_seconds = learn_seconds
+        self.smoothing = smoothing
+        self.prepare(44100, 256)
+
+    def prepare(self, samplerate, hop):
+        """Cache the window and allocate the spectra, forgetting the noise profile"""
+        self.samplerate = samplerate
+        self.hop = hop
+        size = 2 * hop
+        self.window = np.sqrt(0.5 - 0.5 * np.cos(2 * np.pi * np.arange(size) / size))
+        self.frame = np.zeros(size)
+        self.windowed = np.zeros(size)
+        self.overlap = np.zeros(hop)
+        bins = hop + 1
+        self.power = np.zeros(bins)
+        self.noise = np.zeros(bins)
+        self.prior = np.zeros(bins)
+        self.gain = np.ones(bins)
+        self.previous = np.zeros(bins)  # Clean power estimate of the previous frame
+        self.floor = np.zeros(bins)
+        self.posterior = np.zeros(bins)
+        self.scratch = np.zeros(bins)
+        self.learned = 0.0  # Seconds of silence averaged into the profile
+        # Noise average: time constant learn_seconds at one update per hop
+        self.noise_decay = math.exp(-hop / (self.learn_seconds * samplerate))
+
+    @property
+    def latency(self):
+        """Added latency in samples"""
+        return self.hop
+
+    def reset(self):
+        """Forget the signal history, keeping the learned noise profile"""
+        self.frame[:] = 0.0
+        self.overlap[:] = 0.0
+        self.previous[:] = 0.0
+
+    def process(self, audio, learn=False):
+        """Suppress noise in one hop, returning it delayed by self.latency samples"""
+        hop = self.hop
+        self.frame[:hop] = self.frame[hop:]
+        self.frame[hop:] = audio
+        np.multiply(self.frame, self.window, out=self.windowed)
+        spectrum = np.fft.rfft(self.windowed)
+        scratch = self.scratch
+        np.multiply(spectrum.real, spectrum.real, out=self.power)
+        np.multiply(spectrum.imag, spectrum.imag, out=scratch)
+        self.power += scratch
+
+        if learn:
+            # Start from the first silent frame, then a running average
+            decay = self.noise_decay if self.learned else 0.0
+            self.noise *= decay
+            np.multiply(self.power, 1.0 - decay, out=scratch)
+            self.noise += scratch
+            self.learned += hop / self.samplerate
+
+        if self.learned:
+            noise = np.add(self.noise, 1e-12, out=self.floor)
+            # Decision-directed a priori SNR, then the Wiener gain
+            np.divide(self.previous, noise, out=self.prior)
+            self.prior *= self.smoothing
+            posterior = np.divide(self.power, noise, out=self.posterior)
+            posterior -= 1.0
+            np.maximum(posterior, 0.0, out=posterior)
+            posterior *= 1.0 - self.smoothing
+            self.prior += posterior
+            np.add(self.prior, 1.0, out=scratch)
+            np.divide(self.prior, scratch, out=self.gain)
+            np.maximum(self.gain, 10.0 ** (-self.reduction_db / 20.0), out=self.gain)
+            np.multiply(self.gain, self.gain, out=self.previous)
+            self.previous *= self.power
+            spectrum *= self.gain
+
+        synthesized = np.fft.irfft(spectrum, 2 * hop)
+        synthesized *= self.window
+        output = synthesized[:hop]
+        output += self.overlap
+        self.overlap[:] = synthesized[hop:]
+        return output
+
+
+class WaveformHistory:
+    """Min/max decimation pyramid over the last `seconds` of audio
+
+    Level 0 stores the min and max of every `base` samples, and each level
+    above halves the resolution of the one below. Every level is a ring
+    buffer. A pushed block only touches the buckets it completes (O(block /
+    base) work summed over all levels), and view() reads from the level whose
+    bucket size best matches the requested samples per pixel. A redraw costs
+    O(pixels) whatever the history length or sample rate.
+    """
+
+    SECONDS = 30.0
+    BASE = 16
+    MIN_LEVEL_BUCKETS = 256
+
+    def __init__(self, seconds=SECONDS, base=BASE):
+        self.seconds = seconds
+        self.base = base
+        self.prepare(44100)
+
+    def prepare(self, samplerate):
+        """Allocate the pyramid for a sample rate, clearing the history"""
+        self.samplerate = samplerate
+        self.bucket_sizes = []
+        self.mins = []
+        self.maxs = []
+        self.counts = []
+        bucket = self.base
+        while True:
+            capacity = int(math.ceil(self.seconds * samplerate / bucket))
+            self.bucket_sizes.append(bucket)
+            self.mins.append(np.zeros(capacity, dtype=np.float32))
+            self.maxs.append(np.zeros(capacity, dtype=np.float32))
+            self.counts.append(0)
+            if capacity // 2 < self.MIN_LEVEL_BUCKETS:
+                break
+            bucket *= 2
+        self.pending = np.zeros(self.base, dtype=np.float32)
+        self.pending_count = 0
+
+    def push(self, audio):
+        """Add a block of samples (called from the audio thread)"""
+        if self.pending_count:
+            audio = np.concatenate((self.pending[:self.pending_count], audio))
+        full = len(audio) // self.base
+        leftover = len(audio) - full * self.base
+        self.pending[:leftover] = audio[full * self.base:]
+        self.pending_count = leftover
+        if full == 0:
+            return
+
+        buckets = audio[:full * self.base].reshape(full, self.base)
+        self._write(0, buckets.min(axis=1), buckets.max(axis=1))
+
+        # Fold completed pairs into the coarser levels
+        for level in range(1, len(self.counts)):
+            below = self.counts[level - 1] // 2
+            start = self.counts[level]
+            if below <= start:
+                break
+            capacity = len(self.mins[level - 1])
+            indices = np.arange(2 * start, 2 * below) % capacity
+            pairs_min = self.mins[level - 1][indices].reshape(-1, 2).min(axis=1)
+            pairs_max = self.maxs[level - 1][indices].reshape(-1, 2).max(axis=1)
+            self._write(level, pairs_min, pairs_max)
+
+    def _write(self, level, mins, maxs):
+        capacity = len(self.mins[level])
+        indices = np.arange(self.counts[level], self.counts[level] + len(mins)) % capacity
+        self.mins[level][indices] = mins
+        self.maxs[level][indices] = maxs
+        self.counts[level] += len(mins)
+
+    def level_for(self, seconds, pixels):
+        """Coarsest level that still has at least one bucket per pixel"""
+        samples_per_pixel = seconds * self.samplerate / max(1, pixels)
+        level = 0
+        while level + 1 < len(self.bucket_sizes) and self.bucket_sizes[level + 1] <= samples_per_pixel:
+            level += 1
+        return level
+
+    def view(self, seconds, pixels):
+        """(mins, maxs, filled) for the last `seconds`, oldest first
+
+        There is one (min, max) pair per pixel column, or fewer when zoomed in
+        past the level-0 resolution. filled is the fraction of the span they
+        cover, below 1.0 only while the history is still filling.
+        """
+        seconds = min(seconds, self.seconds)
+        level = self.level_for(seconds, pixels)
+        capacity = len(self.mins[level])
+        count = self.counts[level]
+        wanted = int(math.ceil(seconds * self.samplerate / self.bucket_sizes[level]))
+        available = min(wanted, count, capacity)
+        if available == 0:
+            return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32), 0.0
+
+        indices = np.arange(count - available, count) % capacity
+        mins = self.mins[level][indices]
+        maxs = self.maxs[level][indices]
+
+        # At most two buckets per pixel remain, reduce them onto pixel columns
+        columns = min(pixels, available)
+        starts = (np.arange(columns) * available) // columns
+        return np.minimum.reduceat(mins, starts), np.maximum.reduceat(maxs, starts), available / wanted
+
+
+class RingBuffer:
+    """Single-producer/single-consumer float32 ring buffer
+
+    The producer only advances write_count and the consumer only advances
+    read_count, so neither side needs a lock. Writes that don't fit are
+    dropped (and counted) rather than blocking the audio thread.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.write_count = 0
+        self.read_count = 0
+        self.overflows = 0
+
+    def available(self):
+        return self.write_count - self.read_count
+
+    def write(self, samples):
+        """Append samples, dropping what doesn't fit, and return how many were written"""
+        free = self.capacity - (self.write_count - self.read_count)
+        n = min(len(samples), free)
+        if n < len(samples):
+            self.overflows += 1
+        start = self.write_count % self.capacity
+        first = min(n, self.capacity - start)
+        self.data[start:start + first] = samples[:first]
+        self.data[:n - first] = samples[first:n]
+        self.write_count += n
+        return n
+
+    def read(self, out):
+        """Fill out with the oldest samples, returning how many were available"""
+        n = min(len(out), self.write_count - self.read_count)
+        start = self.read_count % self.capacity
+        first = min(n, self.capacity - start)
+        out[:first] = self.data[start:start + first]
+        out[first:n] = self.data[:n - first]
+        self.read_count += n
+        return n
+
+
+class ReplayBuffer:
+    """Always-on ring of the last `seconds` of processed output, stored as int16
+
+    prepare() allocates the whole ring up front at 2 bytes per sample, so
+    memory is fixed at seconds * samplerate * 2 bytes: 5.8 MB for the default
+    30 s at 96 kHz, 11.5 MB for 60 s. push() scales one hop to int16 and
+    copies it in at most two slices, so its cost depends only on the hop (a
+    few microseconds for 256 frames at 96 kHz), never on the replay length.
+    """
+
+    SECONDS = 30.0
+
+    def __init__(self, seconds=SECONDS):
+        self.seconds = seconds
+        self.samplerate = None
+        self.data = np.zeros(0, dtype=np.int16)
+        self.written = 0
+        self.reserved = 0  # Bumped before a push copies, written after
+
+    def prepare(self, samplerate):
+        """Allocate the ring for a sample rate, clearing it"""
+        self.samplerate = samplerate
+        self.data = np.zeros(int(self.seconds * samplerate), dtype=np.int16)
+        self.clear()
+
+    def clear(self):
+        """Forget the buffered samples (audio thread only)"""
+        self.written = self.reserved = 0
+
+    def push(self, audio):
+        """Append processed samples in [-1, 1] (audio thread only)"""
+        capacity = len(self.data)
+        samples = (audio[-capacity:] * 32767).astype(np.int16)
+        n = len(samples)
+        start = (self.written + len(audio) - n) % capacity
+        first = min(n, capacity - start)
+        self.reserved = self.written + len(audio)
+        self.data[start:start + first] = samples[:first]
+        self.data[:n - first] = samples[first:]
+        self.written += len(audio)
+
+    def snapshot(self):
+        """The buffered samples, oldest first, as a copy safe to take from any thread
+
+        Pushes racing the copy can only overwrite the oldest samples. A push
+        bumps `reserved` before it copies, so every sample a push may have
+        touched by the time the copy is done is known and dropped from the
+        front of the result.
+        """
+        written = self.written
+        data = self.data
+        if written < len(data):
+            samples = data[:written].copy()
+        else:
+            start = written % len(data)
+            samples = np.concatenate((data[start:], data[:start]))
+        # Samples older than reserved - capacity may have been overwritten
+        clobbered = self.reserved - len(data) - (written - len(samples))
+        return samples[max(0, clobbered):]
+
+    @property
+    def duration(self):
+        return min(self.written, len(self.data)) / self.samplerate if self.samplerate else 0.0
+
+
+class OutputSink:
+    """An additional output device fed from the single processing pass
+
+    The audio callback only pushes the processed block into this sink's ring.
+    The sink's own PortAudio stream pulls from the ring at the device's native
+    rate, resampling linearly with a tiny drift correction that holds the ring
+    near its target fill. A sink that is slow, misconfigured or unplugged only
+    ever underflows or drops into its own ring.
+    """
+
+    DRIFT_LIMIT = 0.002
+
+    def __init__(self, device_name, gain=1.0, enabled=True, backend=None):
+        self.device_name = device_name
+        self.gain = gain
+        self.enabled = enabled
+        self.backend = backend or SoundDeviceBackend()
+        self.stream = None
+        self.ring = None
+        self.active = False
+        self.error = None
+        self.underflows = 0
+
+    def start(self, device_index, source_rate, blocksize):
+        """Open the sink's stream (call from the main or audio loop thread)"""
+        self.stop()
+        info = self.backend.query_devices(device_index)
+        self.rate = int(info["default_samplerate"])
+        self.base_ratio = source_rate / self.rate
+        self.target_fill = 2 * blocksize
+        self.ring = RingBuffer(max(8 * blocksize, int(source_rate * 0.5)))
+        self.stage = np.zeros(4096, dtype=np.float32)
+        self.staged = 0
+        self.phase = 0.0
+        self.primed = False
+        self.error = None
+        try:
+            self.stream = self.backend.output_stream(device=device_index,
+                                                     samplerate=self.rate,
+                                                     channels=1,
+                                                     dtype='float32',
+                                                     latency='low',
+                                                     callback=self._callback,
+                                                     finished_callback=self._finished)
+            self.stream.start()
+            self.active = True
+        except Exception as e:
+            self.error = str(e)
+            self.stream = None
+            print(f"Output sink '{self.device_name}' failed to start: {e}")
+
+    def stop(self):
+        self.active = False
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception as e:
+                print(f"Error closing output sink '{self.device_name}': {e}")
+
+    def push(self, audio):
+        """Queue a processed block (audio thread, never blocks), False if the ring dropped any of it"""
+        if self.active:
+            return self.ring.write(audio) == len(audio)
+        return True
+
+    def _finished(self):
+        self.active = False
+
+    def _callback(self, outdata, frames, time, status):
+        try:
+            ring = self.ring
+            fill = ring.available()
+            if not self.primed:
+                if fill < self.target_fill:
+                    outdata.fill(0)
+                    return
+                self.primed = True
+
+            # Nudge the ratio to hold the fill level against clock drift
+            drift = (fill - self.target_fill) / (self.target_fill * 500.0)
+            ratio = self.base_ratio * (1.0 + max(-self.DRIFT_LIMIT, min(self.DRIFT_LIMIT, drift)))
+
+            positions = self.phase + ratio * np.arange(frames)
+            needed = int(positions[-1]) + 2
+            if needed > len(self.stage):
+                grown = np.zeros(2 * needed, dtype=np.float32)
+                grown[:self.staged] = self.stage[:self.staged]
+                self.stage = grown
+            if needed > self.staged:
+                got = ring.read(self.stage[self.staged:needed])
+                if got < needed - self.staged:
+                    self.underflows += 1
+                    self.stage[self.staged + got:needed] = 0.0
+                self.staged = needed
+
+            out = np.interp(positions, np.arange(needed), self.stage[:needed])
+            consumed = int(self.phase + ratio * frames)
+            self.phase = self.phase + ratio * frames - consumed
+            remaining = self.staged - consumed
+            self.stage[:remaining] = self.stage[consumed:self.staged]
+            self.staged = remaining
+
+            if self.enabled:
+                outdata[:, 0] = out * self.gain
+            else:
+                outdata.fill(0)
+        except Exception as e:
+            self.error = str(e)
+            outdata.fill(0)
+
+
+class WavMap:
+    """Read-only memory map of a WAV file's sample data
+
+    Only the RIFF header is parsed, samples are a numpy view onto the map, so
+    opening an hour-long take costs nothing and pages are read on demand.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._parse()
+        except Exception:
+            self.mm.close()
+            raise
+
+    def _parse(self):
+        mm = self.mm
+        if len(mm) < 12 or mm[:4] != b"RIFF" or mm[8:12] != b"WAVE":
+            raise ValueError(f"{os.path.basename(self.path)} is not a WAV file")
+
+        fmt = None
+        offset = 12
+        while offset + 8 <= len(mm):
+            chunk_id = mm[offset:offset + 4]
+            size, = struct.unpack_from("<I", mm, offset + 4)
+            body = offset + 8
+            if chunk_id == b"fmt ":
+                fmt = struct.unpack_from("<HHIIHH", mm, body)
+                if fmt[0] == 0xFFFE:  # WAVE_FORMAT_EXTENSIBLE, real tag starts the subformat GUID
+                    fmt = (struct.unpack_from("<H", mm, body + 24)[0],) + fmt[1:]
+            elif chunk_id == b"data":
+                if fmt is None:
+                    raise ValueError("WAV data chunk before fmt chunk")
+                data_size = min(size, len(mm) - body)
+                break
+            offset = body + size + (size & 1)
+        else:
+            raise ValueError("WAV file has no data chunk")
+
+        tag, self.channels, self.samplerate, _, self.block_align, bits = fmt
+        dtypes = {(1, 8): np.uint8, (1, 16): np.dtype("<i2"), (1, 32): np.dtype("<i4"), (3, 32): np.dtype("<f4")}
+        if (tag, bits) not in dtypes:
+            raise ValueError(f"Unsupported WAV format (tag {tag}, {bits} bits)")
+        self.format_tag = tag
+        self.sampwidth = bits // 8
+        self.dtype = dtypes[(tag, bits)]
+        self.data_offset = body
+        self.frames = data_size // self.block_align
+        self.samples = np.frombuffer(mm, dtype=self.dtype, count=self.frames * self.channels,
+                                     offset=body).reshape(self.frames, self.channels)
+
+    @property
+    def duration(self):
+        return self.frames / self.samplerate
+
+    def read(self, start, stop):
+        """Frames [start, stop) as float32 mono"""
+        chunk = self.samples[start:stop]
+        if self.dtype == np.uint8:
+            audio = (chunk.astype(np.float32) - 128.0) / 128.0
+        elif self.format_tag == 3:
+            audio = chunk.astype(np.float32)
+        else:
+            audio = chunk.astype(np.float32) / float(1 << (8 * self.sampwidth - 1))
+        return audio.mean(axis=1) if self.channels > 1 else audio[:, 0]
+
+    def export(self, path, start, stop, chunk_frames=1 << 18):
+        """Write frames [start, stop) to a new WAV file, one chunk at a time"""
+        with wave.open(path, "wb") as out:
+            out.setnchannels(self.channels)
+            out.setframerate(self.samplerate)
+            out.setsampwidth(self.sampwidth if self.format_tag == 1 else 2)
+            for position in range(start, stop, chunk_frames):
+                end = min(stop, position + chunk_frames)
+                if self.format_tag == 1:
+                    # Same PCM format, copy the bytes straight out of the map
+                    out.writeframes(self.mm[self.data_offset + position * self.block_align:
+                                            self.data_offset + end * self.block_align])
+                else:
+                    floats = np.clip(self.samples[position:end], -1.0, 1.0)
+                    out.writeframes((floats * 32767).astype("<i2").tobytes())
+
+    def close(self):
+        self.samples = None
+        try:
+            self.mm.close()
+        except BufferError:
+            pass  # A view is still alive somewhere, the map closes with it
+
+
+class PeakOverview:
+    """Cached min/max overview of a WAV file, built lazily in a background thread
+
+    The overview is stored beside the file as <name>.peaks.npz together with
+    the WAV's size and modification time, and reused while they match.
+    """
+
+    BUCKET = 1024
+    CHUNK_BUCKETS = 256
+
+    def __init__(self, wav_map):
+        self.wav_map = wav_map
+        self.cache_path = wav_map.path + ".peaks.npz"
+        buckets = -(-wav_map.frames // self.BUCKET)
+        self.mins = np.zeros(buckets, dtype=np.float32)
+        self.maxs = np.zeros(buckets, dtype=np.float32)
+        self.done = 0
+        self.cancelled = False
+        self.thread = None
+
+    @property
+    def complete(self):
+        return self.done >= len(self.mins)
+
+    def _signature(self):
+        stat = os.stat(self.wav_map.path)
+        return np.array([stat.st_size, stat.st_mtime_ns, self.BUCKET], dtype=np.int64)
+
+    def start(self):
+        """Load the cached overview, or start building it in the background"""
+        try:
+            with np.load(self.cache_path) as cached:
+                if (np.array_equal(cached["signature"], self._signature())
+                        and len(cached["mins"]) == len(self.mins)):
+                    self.mins[:] = cached["mins"]
+                    self.maxs[:] = cached["maxs"]
+                    self.done = len(self.mins)
+                    return
+        except (OSError, KeyError, ValueError):
+            pass
+        self.thread = threading.Thread(target=self._build, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def join(self):
+        """Wait for the build thread (returns at its next chunk once cancelled)"""
+        if self.thread is not None:
+            self.thread.join()
+
+    def _build(self):
+        step = self.BUCKET * self.CHUNK_BUCKETS
+        frames = self.wav_map.frames
+        for start in range(0, frames, step):
+            if self.cancelled:
+                return
+            audio = self.wav_map.read(start, min(frames, start + step))
+            buckets = -(-len(audio) // self.BUCKET)
+            padded = np.full(buckets * self.BUCKET, audio[-1], dtype=np.float32)
+            padded[:len(audio)] = audio
+            padded = padded.reshape(buckets, self.BUCKET)
+            first = start // self.BUCKET
+            self.mins[first:first + buckets] = padded.min(axis=1)
+            self.maxs[first:first + buckets] = padded.max(axis=1)
+            self.done = first + buckets
+        try:
+            np.savez(self.cache_path, signature=self._signature(), mins=self.mins, maxs=self.maxs)
+        except OSError as e:
+            print(f"Could not save peak overview: {e}")
+
+    def columns(self, pixels):
+        """(mins, maxs, total_columns): per-column peaks for the part built so far"""
+        empty = np.zeros(0, dtype=np.float32)
+        total = len(self.mins)
+        columns = min(pixels, total)
+        if columns == 0:
+            return empty, empty, 0
+        starts = (np.arange(columns) * total) // columns
+        built = starts[starts < self.done]
+        if len(built) == 0:
+            return empty, empty, columns
+        done = self.done
+        return (np.minimum.reduceat(self.mins[:done], built),
+                np.maximum.reduceat(self.maxs[:done], built),
+                columns)
+
+
+class WavPlayer:
+    """Plays a WavMap through an output device straight from the memory map"""
+
+    def __init__(self, wav_map, backend=None):
+        self.wav_map = wav_map
+        self.backend = backend or SoundDeviceBackend()
+        self.position = 0
+        self.stop_at = wav_map.frames
+        self.stream = None
+
+    @property
+    def playing(self):
+        return self.stream is not None and self.stream.active
+
+    def play(self, device_index, start=None, stop=None):
+        """Start playback from start (default: current position) up to stop"""
+        self.stop()
+        if start is not None:
+            self.position = start
+        self.stop_at = self.wav_map.frames if stop is None else stop
+        if self.position >= self.stop_at:
+            self.position = 0 if stop is None else start or 0
+        self.stream = self.backend.output_stream(device=device_index,
+                                                 samplerate=self.wav_map.samplerate,
+                                                 channels=1,
+                                                 dtype='float32',
+                                                 callback=self._callback)
+        self.stream.start()
+
+    def seek(self, frame):
+        self.position = max(0, min(self.wav_map.frames, int(frame)))
+
+    def stop(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            stream.close()
+
+    def _callback(self, outdata, frames, time, status):
+        start = self.position
+        stop = min(self.stop_at, start + frames)
+        count = max(0, stop - start)
+        outdata[:count, 0] = self.wav_map.read(start, stop)
+        outdata[count:] = 0
+        self.position = stop
+        if stop >= self.stop_at:
+            raise CallbackStop
+
+
+class FileSource:
+    """Plays a WavMap as if it were the microphone
+
+    block(frames) returns the next (frames, 1) float32 input block, read in
+    chunks straight from the map and linearly resampled from the file rate
+    to the stream rate. Without looping the source pads with silence once
+    the file ends and sets finished.
+    """
+
+    def __init__(self, wav_map, samplerate, loop=True):
+        self.wav_map = wav_map
+        self.ratio = wav_map.samplerate / samplerate
+        self.loop = loop
+        self.position = 0.0
+        self.finished = wav_map.frames == 0
+
+    def _read_wrapped(self, start, stop):
+        """Frames [start, stop), continuing from the top of the file when looping"""
+        frames = self.wav_map.frames
+        if stop <= frames:
+            return self.wav_map.read(start, stop)
+        head = self.wav_map.read(start, frames)
+        if not self.loop:
+            return np.concatenate((head, np.zeros(stop - frames, dtype=np.float32)))
+        pieces = [head]
+        remaining = stop - frames
+        while remaining > 0:
+            pieces.append(self.wav_map.read(0, min(remaining, frames)))
+            remaining -= len(pieces[-1])
+        return np.concatenate(pieces)
+
+    def block(self, frames):
+        block = np.zeros((frames, 1), dtype=np.float32)
+        if self.finished:
+            return block
+        positions = self.position + self.ratio * np.arange(frames)
+        start = int(positions[0])
+        chunk = self._read_wrapped(start, int(positions[-1]) + 2)
+        local = positions - start
+        index = local.astype(np.int64)
+        frac = (local - index).astype(np.float32)
+        block[:, 0] = chunk[index] * (1.0 - frac) + chunk[index + 1] * frac
+
+        self.position += self.ratio * frames
+        total = self.wav_map.frames
+        if self.position >= total:
+            if self.loop:
+                self.position %= total
+            else:
+                self.finished = True
+        return block
+
+
+class ClipPlayer:
+    """Loops one of several equally long clips, switching without losing the position
+
+    select() swaps the clip under the playhead, so presets can be A/B
+    compared on the same syllable.
+    """
+
+    def __init__(self, clips, samplerate, backend=None):
+        self.clips = clips
+        self.samplerate = samplerate
+        self.backend = backend or SoundDeviceBackend()
+        self.current = 0
+        self.position = 0
+        self.stream = None
+
+    @property
+    def playing(self):
+        return self.stream is not None and self.stream.active
+
+    def play(self, device_index, index):
+        self.current = index
+        if self.playing:
+            return
+        self.stop()
+        self.stream = self.backend.output_stream(device=device_index,
+                                                 samplerate=self.samplerate,
+                                                 channels=1,
+                                                 dtype='float32',
+                                                 callback=self._callback)
+        self.stream.start()
+
+    def select(self, index):
+        self.current = index
+
+    def stop(self):
+        stream, self.stream = self.stream, None
+        if stream is not None:
+            stream.close()
+
+    def _callback(self, outdata, frames, time, status):
+        clip = self.clips[self.current]
+        indices = (self.position + np.arange(frames)) % len(clip)
+        outdata[:, 0] = clip[indices]
+        self.position = (self.position + frames) % len(clip)
+
+
+PREVIEW_SECONDS = 3.0
+
+PRESETS = {
+    "Normal": 1.0,
+    "Alien": 1.6,
+    "Robot": 0.9,
+    "Deep": 0.6,
+    "Chipmunk": 1.8,
+}
+
+
+def batched_pitch_shift(blocks, pitches):
+    """AudioEngine._shift_pitch for every block and every pitch in one gather
+
+    blocks is (hops, n). Each output sample of the per-block resampler
+    (interpolated, then truncated or padded with a linear ramp to zero) is a
+    weighted pair of input samples of the same block, so the pairs and
+    weights are built once per pitch and applied to all blocks together.
+    Returns (len(pitches), hops, n).
+    """
+    n = blocks.shape[1]
+    lo = np.zeros((len(pitches), n), dtype=np.int64)
+    hi = np.zeros((len(pitches), n), dtype=np.int64)
+    w_lo = np.zeros((len(pitches), n))
+    w_hi = np.zeros((len(pitches), n))
+    for row, pitch in enumerate(pitches):
+        if pitch == 1.0:
+            lo[row] = hi[row] = np.arange(n)
+            w_lo[row] = 1.0
+            continue
+        positions = np.linspace(0, n - 1, int(n / pitch))[:n]
+        count = len(positions)
+        base = positions.astype(np.int64)
+        frac = positions - base
+        lo[row, :count] = base
+        hi[row, :count] = np.minimum(base + 1, n - 1)
+        w_lo[row, :count] = 1.0 - frac
+        w_hi[row, :count] = frac
+        if count < n:
+            # np.pad(mode='linear_ramp') from the last value down to zero
+            ramp = 1.0 - np.arange(1, n - count + 1) / (n - count)
+            lo[row, count:] = lo[row, count - 1]
+            hi[row, count:] = hi[row, count - 1]
+            w_lo[row, count:] = w_lo[row, count - 1] * ramp
+            w_hi[row, count:] = w_hi[row, count - 1] * ramp
+    shifted = blocks[:, lo] * w_lo + blocks[:, hi] * w_hi
+    return shifted.transpose(1, 0, 2)
+
+
+def render_presets(clip, samplerate, params, reverb=None, hop=None):
+    """Render a clip through every preset at once, returning (names, (presets, frames) array)
+
+    Presets are stacked along the first axis: the pitch shift is one batched
+    gather, reverb one FFT convolution over all rows and volume/clipping
+    plain broadcasting. Only the stateful stages run per row, the vocoder for
+    Robot and the limiter. Pitch correction is left out, previews compare the
+    presets themselves.
+    """
+    from scipy import signal
+
+    hop = hop or AudioEngine.HOP
+    names = list(PRESETS)
+    frames = len(clip) // hop * hop
+    blocks = np.asarray(clip[:frames], dtype=np.float64).reshape(-1, hop)
+    rendered = batched_pitch_shift(blocks, [PRESETS[name] for name in names]).reshape(len(names), frames)
+
+    robot = names.index("Robot")
+    vocoder = ChannelVocoder(bands=params["vocoder_bands"])
+    vocoder.prepare(samplerate)
+    rendered[robot] = vocoder.process(rendered[robot])
+
+    if params["reverb_mix"] > 0.0 and reverb is not None and reverb.ir is not None:
+        ir = resample_linear(reverb.ir, reverb.ir_rate, samplerate)
+        wet = signal.fftconvolve(rendered, ir[np.newaxis, :], axes=1)[:, :frames]
+        rendered = (1.0 - params["reverb_mix"]) * rendered + params["reverb_mix"] * wet
+
+    rendered *= params["volume"]
+    if params["limiter"]:
+        for row in range(len(names)):
+            limiter = LookaheadLimiter(lookahead_ms=params["limiter_lookahead_ms"])
+            limiter.prepare(samplerate)
+            rendered[row] = limiter.process(rendered[row])
+    return names, np.clip(rendered, -1.0, 1.0).astype(np.float32)
+
+
+class RealtimeMode:
+    """Opt-in real-time measures for streaming on Linux
+
+    While a stream runs the cyclic GC is frozen and disabled, with young
+    generation collections done at safe points right after a callback
+    returns. The PortAudio callback thread is moved to SCHED_FIFO (or a
+    higher nice level) when the rtprio limit allows it, and memory pages can
+    optionally be locked. Every measure records whether it took effect so the
+    user can see what their system permits.
+    """
+
+    FIFO_PRIORITY = 70
+    SAFE_POINT_INTERVAL = 1.0  # seconds between controlled collections
+
+    def __init__(self, lock_memory=False):
+        self.lock_memory = lock_memory
+        self.thread_configured = False
+        self.memory_locked = False
+        self.results = {}
+        self.last_collection = 0.0
+
+    def enter_stream(self):
+        """Apply process-wide measures before the stream opens"""
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+        self.results["gc"] = "frozen and disabled while streaming"
+
+        if self.lock_memory:
+            self.results["mlock"] = self._lock_memory()
+        return self.results
+
+    def configure_callback_thread(self):
+        """Raise the priority of the calling (PortAudio) thread"""
+        self.thread_configured = True
+        if not sys.platform.startswith("linux"):
+            self.results["priority"] = "not supported on this platform"
+            return dict(self.results)
+
+        try:
+            rtprio_limit = resource.getrlimit(resource.RLIMIT_RTPRIO)[0]
+            if rtprio_limit == resource.RLIM_INFINITY:
+                priority = self.FIFO_PRIORITY
+            else:
+                priority = min(self.FIFO_PRIORITY, rtprio_limit)
+            if priority > 0:
+                os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+                self.results["priority"] = f"SCHED_FIFO {priority}"
+                return dict(self.results)
+        except OSError:
+            pass
+
+        # Fall back to a better nice value for this thread only
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), -10)
+            self.results["priority"] = "nice -10"
+        except OSError as e:
+            self.results["priority"] = f"unchanged ({e.strerror}; raise rtprio in limits.conf)"
+        return dict(self.results)
+
+    def safe_point(self):
+        """Collect the young generation if one is due (call between callbacks)"""
+        now = time.perf_counter()
+        if now - self.last_collection >= self.SAFE_POINT_INTERVAL:
+            self.last_collection = now
+            gc.collect(0)
+
+    def exit_stream(self):
+        """Undo the process-wide measures"""
+        gc.enable()
+        gc.unfreeze()
+        if self.memory_locked:
+            self._libc().munlockall()
+            self.memory_locked = False
+
+    def _lock_memory(self):
+        if not sys.platform.startswith("linux"):
+            return "not supported on this platform"
+        # MCL_FUTURE with a small RLIMIT_MEMLOCK makes later allocations fail,
+        # so only lock future pages when the limit is unlimited
+        flags = MCL_CURRENT
+        if resource.getrlimit(resource.RLIMIT_MEMLOCK)[0] == resource.RLIM_INFINITY:
+            flags |= MCL_FUTURE
+        libc = self._libc()
+        if libc.mlockall(flags) != 0:
+            errno = ctypes.get_errno()
+            return f"failed ({os.strerror(errno)}; raise memlock in limits.conf)"
+        self.memory_locked = True
+        return "current and future pages locked" if flags & MCL_FUTURE else "current pages locked"
+
+    @staticmethod
+    def _libc():
+        return ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+
+# PortAudio status flag bits, as stored in traces
+STATUS_FLAG_BITS = (
+    ("input_underflow", 0x1),
+    ("input_overflow", 0x2),
+    ("output_underflow", 0x4),
+    ("output_overflow", 0x8),
+    ("priming_output", 0x10),
+)
+
+
+XRUN_BITS = 0x1 | 0x2 | 0x4 | 0x8
+
+
+class CallbackFlags:
+    """Callback status of virtual streams and replays, read like sounddevice.CallbackFlags"""
+
+    __slots__ = ("bits",)
+
+    def __init__(self, bits=0):
+        self.bits = bits
+
+    def __getattr__(self, name):
+        bit = dict(STATUS_FLAG_BITS).get(name)
+        if bit is None:
+            raise AttributeError(name)
+        return bool(self.bits & bit)
+
+    def __bool__(self):
+        return bool(self.bits)
+
+    def __str__(self):
+        return ", ".join(name for name, bit in STATUS_FLAG_BITS if self.bits & bit) or "no flags"
+
+
+# Raised from stream callbacks; sounddevice's own when PortAudio streams may be running them
+if sd is not None:
+    CallbackStop, CallbackAbort = sd.CallbackStop, sd.CallbackAbort
+else:
+    class CallbackStop(Exception):
+        """Raise from a stream callback to finish the stream"""
+
+    class CallbackAbort(Exception):
+        """Raise from a stream callback to abort the stream"""
+
+
+def status_to_bits(status):
+    """Pack sounddevice.CallbackFlags (or CallbackFlags) into PortAudio flag bits"""
+    if isinstance(status, CallbackFlags):
+        return status.bits
+    bits = 0
+    if status:
+        for name, bit in STATUS_FLAG_BITS:
+            if getattr(status, name, False):
+                bits |= bit
+    return bits
+
+
+class CallbackTime:
+    """Stand-in for the PortAudio time struct passed to callbacks"""
+
+    __slots__ = ("inputBufferAdcTime", "currentTime", "outputBufferDacTime")
+
+    def __init__(self, adc=0.0, current=0.0, dac=0.0):
+        self.inputBufferAdcTime = adc
+        self.currentTime = current
+        self.outputBufferDacTime = dac
+
+
+class TraceRecorder:
+    """Captures every callback into a compact binary trace file
+
+    Layout: TRACE_MAGIC, a header (samplerate, blocksize, channels), then one
+    record per callback: frames, status bits, the three PortAudio timestamps,
+    a wall-clock timestamp, the parameter snapshot as JSON merged with the
+    engine's stage settings, the quality tier and the reverb IR path (only
+    when either changed since the previous block, otherwise empty), the
+    float32 input block and the float32 output block produced live, which
+    serves as the golden output on replay. Records are serialized on the audio thread but
+    written to disk by a background thread.
+    """
+
+    MAX_PENDING = 4096
+
+    def __init__(self, path, samplerate, blocksize, channels=1):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(TRACE_MAGIC)
+        self.file.write(TRACE_HEADER.pack(samplerate, blocksize, channels))
+        self.pending = collections.deque()
+        self.dropped = 0
+        self.blocks = 0
+        self.last_params = None
+        self.last_stages = None
+        self.closed = threading.Event()
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
 
-# Set appearance mode and color theme
-ctk.set_appearance_mode("dark")
-ctk.set_default_color_theme("dark-blue")
+    def record(self, indata, outdata, frames, time_info, status, params, stages=None):
+        """Serialize one callback (called from the audio thread)"""
+        if len(self.pending) >= self.MAX_PENDING:
+            self.dropped += 1
+            return
 
-# Define colors
-COLORS = {
-    "primary": "#3a7ebf",
-    "secondary": "#2a5a8a",
-    "accent": "#ff5722",
-    "background": "#1a1a1a",
-    "card": "#2d2d2d",
-    "text": "#ffffff",
-    "text_secondary": "#aaaaaa",
-    "success": "#4caf50",
-    "warning": "#ff9800",
-    "error": "#f44336",
-    "recording": "#f44336",
-}
+        if params is self.last_params and stages is self.last_stages:
+            params_blob = b""
+        else:
+            params_blob = json.dumps(dict(params, **stages) if stages else params).encode("utf-8")
+            self.last_params, self.last_stages = params, stages
 
-# Create assets directory if it doesn't exist
-if not os.path.exists("assets"):
-    os.makedirs("assets")
+        adc = getattr(time_info, "inputBufferAdcTime", 0.0)
+        current = getattr(time_info, "currentTime", 0.0)
+        dac = getattr(time_info, "outputBufferDacTime", 0.0)
+        header = TRACE_RECORD.pack(frames, status_to_bits(status), adc, current, dac,
+                                   time.perf_counter(), len(params_blob))
+        self.pending.append(b"".join((
+            header,
+            params_blob,
+            np.ascontiguousarray(indata, dtype=np.float32).tobytes(),
+            np.ascontiguousarray(outdata, dtype=np.float32).tobytes(),
+        )))
+        self.blocks += 1
 
+    def _write_loop(self):
+        while True:
+            closing = self.closed.wait(0.05)
+            while self.pending:
+                self.file.write(self.pending.popleft())
+            if closing:
+                break
+        self.file.close()
+
+    def close(self):
+        """Flush pending records and close the file"""
+        self.closed.set()
+        self.writer.join()
+        if self.dropped:
+            print(f"Trace capture dropped {self.dropped} blocks (writer fell behind)")
+
+
+TRACE_MAGIC = b"VCTRACE1"
+TRACE_HEADER = struct.Struct("<III")
+TRACE_RECORD = struct.Struct("<IIddddI")
+
+
+def read_trace(path):
+    """Read a trace file, returning (samplerate, blocksize, channels, records)
+
+    Each record is a dict with frames, status bits, time, wall, params,
+    input and output arrays.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:len(TRACE_MAGIC)] != TRACE_MAGIC:
+        raise ValueError(f"{path} is not a VChanger trace")
+    offset = len(TRACE_MAGIC)
+    samplerate, blocksize, channels = TRACE_HEADER.unpack_from(data, offset)
+    offset += TRACE_HEADER.size
+
+    records = []
+    params = None
+    while offset < len(data):
+        frames, bits, adc, current, dac, wall, params_len = TRACE_RECORD.unpack_from(data, offset)
+        offset += TRACE_RECORD.size
+        if params_len:
+            params = json.loads(data[offset:offset + params_len].decode("utf-8"))
+            offset += params_len
+        count = frames * channels
+        block = np.frombuffer(data, dtype=np.float32, count=count * 2, offset=offset)
+        offset += count * 2 * 4
+        records.append({
+            "frames": frames,
+            "status": bits,
+            "time": CallbackTime(adc, current, dac),
+            "wall": wall,
+            "params": params,
+            "input": block[:count].reshape(frames, channels),
+            "output": block[count:].reshape(frames, channels),
+        })
+    return samplerate, blocksize, channels, records
+
+
+def replay_trace(path, tolerance=1e-6, golden_path=None):
+    """Feed a captured trace through AudioEngine.audio_callback without a device
+
+    Output is compared to the golden output stored in the trace, or in
+    golden_path if given (any trace file, e.g. one written by a previous
+    replay with write_golden). The governor is not consulted: quality tier
+    switches recorded in the trace are applied at the block they took
+    effect, as are reverb IRs, which are loaded again from their recorded
+    path. Returns a summary dict.
+    """
+    samplerate, blocksize, channels, records = read_trace(path)
+    golden = records
+    if golden_path:
+        golden = read_trace(golden_path)[3]
+        if len(golden) != len(records):
+            raise ValueError("Golden trace has a different number of blocks")
+
+    state = StateManager()
+    state.running = True
+    engine = AudioEngine(state)
+    engine.prepare(samplerate, blocksize)
+
+    mismatched = 0
+    max_error = 0.0
+    outputs = []
+    started = time.perf_counter()
+    for record, expected in zip(records, golden):
+        params = dict(engine.params, **record["params"])  # Traces from older versions lack newer params
+        tier = params.pop("quality_tier", None)
+        ir_path = params.pop("reverb_ir", None)
+        params["adaptive_quality"] = False
+        engine.params = params
+        if ir_path is not None and ir_path != engine.reverb.path:
+            engine.load_impulse_response(ir_path)
+        if tier != engine.quality_tier:
+            engine.apply_quality_tier(tier)
+        engine.set_vocoder_bands(engine.params["vocoder_bands"])
+        outdata = np.zeros((record["frames"], channels), dtype=np.float32)
+        engine.audio_callback(record["input"], outdata, record["frames"],
+                              record["time"], CallbackFlags(record["status"]))
+        outputs.append(outdata)
+
+        error = float(np.max(np.abs(outdata - expected["output"]))) if record["frames"] else 0.0
+        max_error = max(max_error, error)
+        if error > tolerance:
+            mismatched += 1
+    elapsed = time.perf_counter() - started
+
+    audio_seconds = sum(record["frames"] for record in records) / samplerate
+    return {
+        "blocks": len(records),
+        "mismatched": mismatched,
+        "max_error": max_error,
+        "audio_seconds": audio_seconds,
+        "elapsed": elapsed,
+        "realtime_factor": audio_seconds / elapsed if elapsed > 0 else float("inf"),
+        "outputs": outputs,
+        "records": records,
+        "samplerate": samplerate,
+        "blocksize": blocksize,
+        "channels": channels,
+    }
+
+
+def write_golden(result, path):
+    """Write a replay result as a new trace, its outputs becoming the golden output"""
+    recorder = TraceRecorder(path, result["samplerate"], result["blocksize"], result["channels"])
+    for record, output in zip(result["records"], result["outputs"]):
+        recorder.record(record["input"], output, record["frames"], record["time"],
+                        CallbackFlags(record["status"]), record["params"])
+    recorder.close()
+
+
+CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".vchanger")
+SESSION_PATH = os.path.join(CONFIG_DIR, "session.json")
+
+
+def device_fingerprint(device, hostapis):
+    """Describe a device by what stays stable across launches (not its index)"""
+    return {
+        "name": device["name"],
+        "hostapi": hostapis[device["hostapi"]]["name"],
+        "inputs": device["max_input_channels"],
+        "outputs": device["max_output_channels"],
+    }
+
+
+def match_fingerprint(fingerprint, devices, hostapis, is_input):
+    """Index of the device that best matches a saved fingerprint, or None
+
+    The name has to match; host API and channel counts break ties between
+    devices that share a name.
+    """
+    if not fingerprint:
+        return None
+    best, best_score = None, -1
+    for index, device in enumerate(devices):
+        channels = device["max_input_channels"] if is_input else device["max_output_channels"]
+        if device["name"] != fingerprint.get("name") or channels <= 0:
+            continue
+        candidate = device_fingerprint(device, hostapis)
+        score = sum(candidate[key] == fingerprint.get(key) for key in ("hostapi", "inputs", "outputs"))
+        if score > best_score:
+            best, best_score = index, score
+    return best
+
+
+def load_session(path=SESSION_PATH):
+    """Read the saved session, an empty dict if there is none or it is unreadable"""
+    try:
+        with open(path, "r") as f:
+            session = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return session if isinstance(session, dict) else {}
+
+
+def save_session(session, path=SESSION_PATH):
+    """Write the session atomically so a crash never leaves half a file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump(session, f, indent=2)
+    os.replace(temp_path, path)
+
+
+CAPABILITIES_PATH = os.path.join(CONFIG_DIR, "devices.json")
+SAMPLE_RATES = (32000, 44100, 48000, 88200, 96000)
+BUFFER_SIZES = (64, 128, 256, 512, 1024, 2048)
+
+
+def fingerprint_key(fingerprint):
+    return "{name}|{hostapi}|{inputs}|{outputs}".format(**fingerprint)
+
+
+def probe_device(index, device, is_input, backend):
+    """Sample rates and channel counts PortAudio accepts for one side of a device"""
+    check = backend.check_input_settings if is_input else backend.check_output_settings
+    max_channels = device["max_input_channels"] if is_input else device["max_output_channels"]
+    rates, channels = [], []
+    for rate in SAMPLE_RATES:
+        try:
+            check(device=index, samplerate=rate, channels=1, dtype='float32')
+            rates.append(rate)
+        except Exception:
+            pass
+    for count in (1, 2):
+        if count <= max_channels:
+            try:
+                check(device=index, samplerate=device["default_samplerate"], channels=count, dtype='float32')
+                channels.append(count)
+            except Exception:
+                pass
+    side = "input" if is_input else "output"
+    return {
+        "rates": rates,
+        "channels": channels,
+        "low_latency": device[f"default_low_{side}_latency"],
+        "high_latency": device[f"default_high_{side}_latency"],
+    }
+
+
+class DeviceCapabilities:
+    """Probed device capabilities, cached on disk by device fingerprint
+
+    Probing opens nothing but can still take a while per device on some
+    host APIs, so it runs on a background thread and only for devices the
+    cache hasn't seen; later launches read the cache instead.
+    """
+
+    def __init__(self, path=CAPABILITIES_PATH, backend=None):
+        self.path = path
+        self.backend = backend or SoundDeviceBackend()
+        self.devices = {}
+        self.thread = None
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                devices = json.load(f)
+            if isinstance(devices, dict):
+                self.devices = devices
+        except (OSError, ValueError):
+            self.devices = {}
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self.devices, f, indent=2)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Error saving device capabilities: {e}")
+
+    def lookup(self, fingerprint):
+        return self.devices.get(fingerprint_key(fingerprint))
+
+    def probe_missing(self, devices, hostapis, on_done):
+        """Probe uncached devices in the background, calling on_done() if anything was added"""
+        if self.thread is not None and self.thread.is_alive():
+            return
+        missing = [(index, device) for index, device in enumerate(devices)
+                   if fingerprint_key(device_fingerprint(device, hostapis)) not in self.devices]
+        if not missing:
+            return
+
+        def run():
+            for index, device in missing:
+                entry = {}
+                if device["max_input_channels"] > 0:
+                    entry["input"] = probe_device(index, device, True, self.backend)
+                if device["max_output_channels"] > 0:
+                    entry["output"] = probe_device(index, device, False, self.backend)
+                self.devices[fingerprint_key(device_fingerprint(device, hostapis))] = entry
+            self.save()
+            on_done()
+
+        self.thread = threading.Thread(target=run, name="device-probe", daemon=True)
+        self.thread.start()
+
+    def stream_rates(self, input_fingerprint, output_fingerprint):
+        """Sample rates both devices accept (every rate while either is unprobed)"""
+        rates = set(SAMPLE_RATES)
+        for fingerprint, side in ((input_fingerprint, "input"), (output_fingerprint, "output")):
+            entry = self.lookup(fingerprint) if fingerprint else None
+            if entry and side in entry:
+                rates &= set(entry[side]["rates"])
+        return sorted(rates)
+
+    def supports_mono(self, fingerprint, side):
+        """False only if a probe showed the device rejects a mono stream"""
+        entry = self.lookup(fingerprint) if fingerprint else None
+        return not entry or side not in entry or 1 in entry[side]["channels"]
+
+    def device_latency(self, input_fingerprint, output_fingerprint, kind):
+        """Input plus output default latency in seconds ("low" or "high"), None if unprobed"""
+        total = 0.0
+        for fingerprint, side in ((input_fingerprint, "input"), (output_fingerprint, "output")):
+            entry = self.lookup(fingerprint) if fingerprint else None
+            if not entry or side not in entry:
+                return None
+            total += entry[side][f"{kind}_latency"]
+        return total
+
+
+class SoundDeviceBackend:
+    """The host's audio devices through PortAudio (sounddevice)
+
+    Everything the app needs from an audio backend: device and host API
+    queries, settings checks, duplex and output-only streams, one-shot
+    recording and the module-level sleep/stop. PortAudio isn't thread-safe
+    for device queries, settings checks and opening streams, so those are
+    serialized on one lock shared by every instance (the device probe runs
+    on its own thread while the app may be opening a stream).
+    """
+
+    virtual = False
+    lock = threading.RLock()
 
-# State management for thread safety
-class StateManager:
-    """Thread-safe state manager for voice changer"""
-    
     def __init__(self):
-        self.lock = threading.Lock()
-        self._running = False
-        self._recording = False
-        self.audio_thread = None
-    
-    @property
-    def running(self):
+        if sd is None:
+            raise RuntimeError(f"sounddevice is unavailable ({SOUNDDEVICE_ERROR}), "
+                               "only --audio-backend null/virtual/file:PATH can run")
+
+    def query_devices(self, device=None):
         with self.lock:
-            return self._running
-    
-    @running.setter
-    def running(self, value):
+            return sd.query_devices(device)
+
+    def query_hostapis(self):
         with self.lock:
-            self._running = value
-    
-    @property
-    def recording(self):
+            return sd.query_hostapis()
+
+    def check_input_settings(self, **kwargs):
         with self.lock:
-            return self._recording
-    
-    @recording.setter
-    def recording(self, value):
+            sd.check_input_settings(**kwargs)
+
+    def check_output_settings(self, **kwargs):
         with self.lock:
-            self._recording = value
-            
-    def set_audio_thread(self, thread):
+            sd.check_output_settings(**kwargs)
+
+    def stream(self, **kwargs):
         with self.lock:
-            self.audio_thread = thread
-    
-    def get_audio_thread(self):
+            return sd.Stream(**kwargs)
+
+    def output_stream(self, **kwargs):
         with self.lock:
-            return self.audio_thread
+            return sd.OutputStream(**kwargs)
+
+    def rec(self, frames, **kwargs):
+        with self.lock:
+            return sd.rec(frames, **kwargs)
+
+    def wait(self):
+        sd.wait()
+
+    def sleep(self, msec):
+        sd.sleep(msec)
+
+    def stop(self):
+        with self.lock:
+            sd.stop()
+
+
+class VirtualStream:
+    """A stream run by a VirtualClockBackend, with the parts of the sounddevice stream API the app uses
+
+    Stream time counts frames, so time_info and every decision based on it
+    are the same on every run. start() runs the callbacks on a thread paced
+    by the backend's speed; with speed None nothing runs until advance()
+    is called, which drives the callbacks on the caller's thread.
+    """
+
+    def __init__(self, backend, devices, callback, duplex, samplerate=None, blocksize=0, channels=1,
+                 finished_callback=None, **kwargs):
+        self.backend = backend
+        self.device_names = [backend.devices[index]["name"] for index in devices if index is not None]
+        self.callback = callback
+        self.duplex = duplex
+        self.samplerate = samplerate or backend.devices[devices[-1]]["default_samplerate"]
+        self.blocksize = blocksize or AudioEngine.HOP
+        self.channels = channels
+        self.finished_callback = finished_callback
+        counts = backend.frames if backend.frames is not None else self.blocksize
+        self.frame_counts = tuple(counts) if isinstance(counts, (tuple, list)) else (counts,)
+        self.frames = 0
+        self.callbacks = 0
+        self.active = False
+        self.closed = False
+        self.thread = None
+
+    @property
+    def time(self):
+        """Stream time in seconds"""
+        return self.frames / self.samplerate
+
+    def start(self):
+        if self.closed:
+            raise RuntimeError("Stream is closed")
+        if self.active:
+            return
+        self.active = True
+        if self.backend.speed is not None:
+            self.thread = threading.Thread(target=self._run, name="virtual-stream", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        started = time.perf_counter()
+        while self.active:
+            self.advance()
+            if self.backend.speed:
+                ahead = self.time / self.backend.speed - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+    def advance(self, count=1):
+        """Run count callbacks now, returning False once the stream has stopped"""
+        for _ in range(count):
+            if not self.active:
+                return False
+            frames = self.frame_counts[self.callbacks % len(self.frame_counts)]
+            status = self.backend.next_status()
+            outdata = np.zeros((frames, self.channels), dtype=np.float32)
+            period = frames / self.samplerate
+            time_info = CallbackTime(self.time - period, self.time, self.time + period)
+            try:
+                if self.duplex:
+                    indata = self.backend.read_input(frames, self.channels, self.samplerate)
+                    self.callback(indata, outdata, frames, time_info, status)
+                else:
+                    self.callback(outdata, frames, time_info, status)
+            except (CallbackStop, CallbackAbort):
+                self._finish()
+            except Exception:
+                self._finish()
+                raise
+            self.frames += frames
+            self.callbacks += 1
+            if self.backend.sink is not None:
+                self.backend.sink(outdata)
+        return self.active
+
+    def _finish(self):
+        if self.active:
+            self.active = False
+            if self.finished_callback is not None:
+                self.finished_callback()
+
+    def stop(self):
+        thread, self.thread = self.thread, None
+        was_active, self.active = self.active, False
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        if was_active and self.finished_callback is not None:
+            self.finished_callback()
+
+    abort = stop
+
+    def close(self):
+        self.stop()
+        self.closed = True
+        self.backend.forget(self)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class VirtualClockBackend:
+    """Audio backend with simulated devices and a deterministic virtual clock
+
+    Streams call back with the frame counts in `frames` (an int, or a
+    sequence cycled to mimic hosts with variable buffer sizes; by default
+    the stream's blocksize), read input from source(frames, samplerate)
+    (silence if None) and hand each output block to sink if set. speed
+    paces stream threads against the wall clock (1.0 is real time, 0 as
+    fast as possible, None leaves driving to VirtualStream.advance()).
+
+    inject() queues status flags for the next callbacks, a PortAudio flag
+    name from STATUS_FLAG_BITS or "abort", and plug()/unplug() change the
+    device list as a hot-plug would, stopping streams on a removed device.
+    """
+
+    virtual = True
+
+    def __init__(self, frames=None, speed=1.0, source=None, sink=None, samplerates=SAMPLE_RATES):
+        self.frames = frames
+        self.speed = speed
+        self.source = source
+        self.sink = sink
+        self.samplerates = samplerates
+        self.devices = [self.make_device("Virtual Microphone", inputs=1),
+                        self.make_device("Virtual Speakers", outputs=2)]
+        self.injected = collections.deque()
+        self.streams = []
+
+    @staticmethod
+    def make_device(name, inputs=0, outputs=0, samplerate=48000.0, latency=0.01):
+        """A device entry shaped like sounddevice's"""
+        return {
+            "name": name,
+            "hostapi": 0,
+            "max_input_channels": inputs,
+            "max_output_channels": outputs,
+            "default_samplerate": samplerate,
+            "default_low_input_latency": latency if inputs else 0.0,
+            "default_high_input_latency": 4 * latency if inputs else 0.0,
+            "default_low_output_latency": latency if outputs else 0.0,
+            "default_high_output_latency": 4 * latency if outputs else 0.0,
+        }
+
+    def query_devices(self, device=None):
+        if device is None:
+            return [dict(entry) for entry in self.devices]
+        if not 0 <= device < len(self.devices):
+            raise ValueError(f"Error querying device {device}")
+        return dict(self.devices[device])
+
+    def query_hostapis(self):
+        inputs = [i for i, entry in enumerate(self.devices) if entry["max_input_channels"] > 0]
+        outputs = [i for i, entry in enumerate(self.devices) if entry["max_output_channels"] > 0]
+        return ({"name": "Virtual", "devices": list(range(len(self.devices))),
+                 "default_input_device": inputs[0] if inputs else -1,
+                 "default_output_device": outputs[0] if outputs else -1},)
+
+    def _check(self, device, is_input, channels=1, samplerate=None, **kwargs):
+        if device is None or not 0 <= device < len(self.devices):
+            raise ValueError(f"Invalid device {device}")
+        available = self.devices[device]["max_input_channels" if is_input else "max_output_channels"]
+        if channels > available:
+            raise ValueError(f"Invalid number of channels ({channels}) for device {device}")
+        if samplerate is not None and int(samplerate) not in self.samplerates:
+            raise ValueError(f"Invalid sample rate {samplerate}")
+
+    def check_input_settings(self, device=None, **kwargs):
+        self._check(device, True, **kwargs)
+
+    def check_output_settings(self, device=None, **kwargs):
+        self._check(device, False, **kwargs)
+
+    def stream(self, device=(None, None), callback=None, **kwargs):
+        self._check(device[0], True, **kwargs)
+        self._check(device[1], False, **kwargs)
+        return self._open(VirtualStream(self, device, callback, True, **kwargs))
+
+    def output_stream(self, device=None, callback=None, **kwargs):
+        self._check(device, False, **kwargs)
+        return self._open(VirtualStream(self, (device,), callback, False, **kwargs))
+
+    def _open(self, stream):
+        self.streams.append(stream)
+        return stream
+
+    def forget(self, stream):
+        if stream in self.streams:
+            self.streams.remove(stream)
+
+    def read_input(self, frames, channels, samplerate):
+        block = np.zeros((frames, channels), dtype=np.float32)
+        if self.source is not None:
+            block[:] = self.source(frames, samplerate)[:, np.newaxis]
+        return block
+
+    def rec(self, frames, samplerate=None, channels=1, device=None, **kwargs):
+        self._check(device, True, channels=channels, samplerate=samplerate)
+        return self.read_input(frames, channels, samplerate or self.devices[device]["default_samplerate"])
+
+    def wait(self):
+        pass
+
+    def sleep(self, msec):
+        time.sleep(msec / 1000.0)
+
+    def stop(self):
+        """Stop play()/rec() playback as sd.stop() does, leaving open streams alone
+
+        rec() here returns its recording straight away, so there is never
+        anything left to stop.
+        """
+
+    def inject(self, status, count=1):
+        """Queue a status flag ("input_overflow", "output_underflow", ... or "abort") for the next count callbacks"""
+        if status == "abort":
+            flags = CallbackAbort()
+        else:
+            flags = CallbackFlags(dict(STATUS_FLAG_BITS)[status])
+        self.injected.extend([flags] * count)
+
+    def next_status(self):
+        return self.injected.popleft() if self.injected else CallbackFlags()
+
+    def plug(self, name, inputs=0, outputs=0, **kwargs):
+        """Add a device, as if it had just been connected"""
+        self.devices.append(self.make_device(name, inputs, outputs, **kwargs))
+
+    def unplug(self, name):
+        """Remove a device, stopping any stream that was using it"""
+        self.devices = [entry for entry in self.devices if entry["name"] != name]
+        for stream in list(self.streams):
+            if name in stream.device_names:
+                stream.stop()
+
+
+def looping_source(make_audio):
+    """VirtualClockBackend input that loops make_audio(samplerate), built once per rate"""
+    cache = {}
+    position = [0]
+
+    def source(frames, samplerate):
+        audio = cache.get(samplerate)
+        if audio is None:
+            audio = cache[samplerate] = np.asarray(make_audio(samplerate), dtype=np.float32)
+        indices = (position[0] + np.arange(frames)) % len(audio)
+        position[0] += frames
+        return audio[indices]
+
+    return source
+
+
+def make_backend(spec):
+    """Backend for --audio-backend: sounddevice, null (silent input), virtual (synthetic voice) or file:PATH"""
+    if spec == "sounddevice":
+        return SoundDeviceBackend()
+    if spec == "null":
+        return VirtualClockBackend()
+    if spec == "virtual":
+        return VirtualClockBackend(source=looping_source(lambda rate: synthetic_voice(rate, 10.0)))
+    if spec.startswith("file:"):
+        audio, file_rate = read_wav_mono(spec[len("file:"):])
+        return VirtualClockBackend(source=looping_source(lambda rate: resample_linear(audio, file_rate, rate)))
+    raise ValueError(f"Unknown audio backend {spec!r}")
+
+
 class AnimatedButton(ctk.CTkButton):
     """Custom button with animation effects"""
     
@@ -147,12 +3388,17 @@ class VUMeter(ctk.CTkFrame):
         self.level = 0
         self.target_level = 0
         self.is_animating = False
+        self.animation_job = None
         
         # Draw initial meter
         self._draw_meter()
     
     def _draw_meter(self):
         """Draw the VU meter on canvas"""
+        with TIMELINE.span("vu_meter.draw"):
+            self._draw_meter_items()
+
+    def _draw_meter_items(self):
         self.canvas.delete("all")
         
         # Get dimensions
@@ -201,21 +3447,36 @@ class VUMeter(ctk.CTkFrame):
         
         # Continue animation if needed
         if abs(diff) > 0.01:
-            self.after(30, self._animate_level)
+            self.animation_job = self.after(30, self._animate_level)
         else:
             self.is_animating = False
+            self.animation_job = None
+
+    def reset(self):
+        """Stop animating and drop to zero without redrawing (the meter isn't visible)"""
+        if self.animation_job is not None:
+            self.after_cancel(self.animation_job)
+            self.animation_job = None
+        self.is_animating = False
+        self.level = self.target_level = 0
 
 
 class AudioVisualizer(ctk.CTkFrame):
-    """Audio waveform visualizer"""
+    """Scrolling waveform of the last few seconds, drawn from a WaveformHistory"""
+
+    FRAME_INTERVAL = 1 / 30  # seconds between redraws
+    MIN_SECONDS = 0.05
     
-    def __init__(self, master, **kwargs):
+    def __init__(self, master, history, seconds=5.0, **kwargs):
         super().__init__(master, **kwargs)
         
-        # Create matplotlib figure
-        self.fig, self.ax = plt.subplots(figsize=(5, 2), dpi=100)
+        # Create matplotlib figure (imported lazily, it dominates cold start)
+        Figure, FigureCanvasTkAgg = load_matplotlib()
+        self.fig = Figure(figsize=(5, 2), dpi=100)
+        self.ax = self.fig.add_subplot(111)
         self.fig.patch.set_facecolor(COLORS["background"])
         self.ax.set_facecolor(COLORS["background"])
+        self.fig.subplots_adjust(left=0, right=1, top=1, bottom=0)
         
         # Remove spines and ticks
         for spine in self.ax.spines.values():
@@ -223,32 +3484,57 @@ class AudioVisualizer(ctk.CTkFrame):
         self.ax.set_xticks([])
         self.ax.set_yticks([])
         
-        # Set up plot
-        self.line, = self.ax.plot([], [], lw=2, color=COLORS["primary"])
-        self.ax.set_xlim(0, 100)
+        # Set up plot: one zig-zag line through each pixel column's min and max
+        self.line, = self.ax.plot([], [], lw=1, color=COLORS["primary"])
+        self.span_text = self.ax.text(0.99, 0.95, "", transform=self.ax.transAxes, ha="right", va="top",
+                                      color=COLORS["text_secondary"], fontsize=8)
         self.ax.set_ylim(-1, 1)
         
         # Embed in tkinter
         self.canvas = FigureCanvasTkAgg(self.fig, master=self)
         self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill="both", expand=True)
-        
-        # Initialize data
-        self.data = np.zeros(100)
+        widget = self.canvas.get_tk_widget()
+        widget.pack(fill="both", expand=True)
+
+        # Mouse wheel zooms the time span
+        widget.bind("<MouseWheel>", lambda event: self.zoom(0.8 if event.delta > 0 else 1.25))
+        widget.bind("<Button-4>", lambda event: self.zoom(0.8))
+        widget.bind("<Button-5>", lambda event: self.zoom(1.25))
+        
+        self.history = history
+        self.seconds = seconds
+        self.last_draw = 0.0
+        self._update_span_text()
+
+    def zoom(self, factor):
+        """Scale the visible time span, the pyramid level follows automatically"""
+        self.seconds = min(self.history.seconds, max(self.MIN_SECONDS, self.seconds * factor))
+        self._update_span_text()
+        self.refresh(force=True)
+
+    def _update_span_text(self):
+        self.span_text.set_text(f"{self.seconds:.2f} s" if self.seconds < 1 else f"{self.seconds:.1f} s")
     
-    def update_data(self, new_data):
-        """Update visualizer with new audio data"""
-        # Normalize data
-        if len(new_data) > 0:
-            normalized = new_data / (np.max(np.abs(new_data)) + 1e-10)
-            
-            # Update data buffer (rolling window)
-            self.data = np.roll(self.data, -len(normalized))
-            self.data[-len(normalized):] = normalized
-            
-            # Update plot
-            self.line.set_data(range(len(self.data)), self.data)
-            self.canvas.draw_idle()
+    def refresh(self, force=False):
+        """Redraw from the history, at most FRAME_INTERVAL apart"""
+        now = time.perf_counter()
+        if not force and now - self.last_draw < self.FRAME_INTERVAL:
+            return
+        self.last_draw = now
+
+        pixels = max(1, self.canvas.get_tk_widget().winfo_width())
+        mins, maxs, filled = self.history.view(self.seconds, pixels)
+        columns = len(mins)
+
+        # Stretch the columns over the part of the span the history covers,
+        # right-aligned so the newest audio is always at the right edge
+        x = np.repeat(np.linspace(pixels * (1.0 - filled), pixels, columns), 2)
+        y = np.empty(2 * columns, dtype=np.float32)
+        y[0::2] = mins
+        y[1::2] = maxs
+        self.line.set_data(x, y)
+        self.ax.set_xlim(0, pixels)
+        self.canvas.draw_idle()
 
 
 class CustomSlider(ctk.CTkSlider):
@@ -328,11 +3614,14 @@ class EffectButton(ctk.CTkButton):
 
 
 class TabView(ctk.CTkTabview):
-    """Enhanced tab view with animations"""
-    
+    """Enhanced tab view with animations and lazily built tabs"""
+
     def __init__(self, master, **kwargs):
-        super().__init__(master, **kwargs)
-        
+        self.user_command = kwargs.pop("command", None)
+        self._builders = {}
+
+        super().__init__(master, command=self._on_tab_change, **kwargs)
+
         # Configure colors
         self.configure(
             fg_color=COLORS["background"],
@@ -341,11 +3630,41 @@ class TabView(ctk.CTkTabview):
             segmented_button_unselected_color=COLORS["card"]
         )
 
+    def add_lazy(self, name, builder):
+        """Add a tab whose content is built by builder(tab) on first selection"""
+        tab = self.add(name)
+        self._builders[name] = builder
+        return tab
+
+    def build_tab(self, name):
+        """Build a lazy tab now if it hasn't been built yet"""
+        builder = self._builders.pop(name, None)
+        if builder is not None:
+            started = time.perf_counter()
+            builder()
+            STARTUP.mark(f"tab '{name}' built (+{(time.perf_counter() - started) * 1000:.0f} ms)")
+
+    def set(self, name):
+        """Select a tab, building it first if needed"""
+        self.build_tab(name)
+        super().set(name)
+
+    def _on_tab_change(self):
+        """Handle tab selection from the segmented button"""
+        self.build_tab(self.get())
+
+        # Call user command if provided
+        if self.user_command:
+            self.user_command()
+
 
 class VoiceChangerApp(ctk.CTk):
-    def __init__(self):
+    def __init__(self, backend=None):
         super().__init__()
 
+        # Audio devices and streams (PortAudio unless a virtual backend is passed in)
+        self.backend = backend or SoundDeviceBackend()
+
         self.title("VChanger")
         self.geometry("900x650")
         self.resizable(True, True)
@@ -354,23 +3673,78 @@ class VoiceChangerApp(ctk.CTk):
         # Configure appearance
         self.configure(fg_color=COLORS["background"])
 
+        STARTUP.mark("window created")
+
         # Initialize state variables
         self.initialize_state()
         
         # Set default devices
         self.set_default_devices()
+        self.capabilities.load()
+        STARTUP.mark("devices enumerated")
+
+        # Pick up where the last session left off
+        resume = self.restore_session()
+        STARTUP.mark("session restored")
         
         # Build UI
         self.build_ui()
+        STARTUP.mark("ui built")
+        if self.theme_var.get() != "dark":
+            self.toggle_theme()
+
+        # Start audio before anything decorative is built
+        self.update_stream_options()
+        if self.adaptive_quality_var.get():
+            self.apply_quality_mode()
+        self.awaiting_first_audio = False
+        if resume and self.autostart_var.get():
+            self.awaiting_first_audio = True
+            self.start_voice_changer()
+            self.awaiting_first_audio = self.state_manager.running
+
+        # Probe devices the capability cache hasn't seen, once an auto-started stream is up
+        if not self.awaiting_first_audio:
+            self.probe_devices()
         
-        # Start animation loop
-        self.after(100, self.update_animations)
+        # Start animation loop and the worker event drain
+        self.animation_job = self.after(100, self.update_animations)
+        self.after(self.EVENT_INTERVAL_MS, self.drain_events)
         
         # Add cleanup handler for window close
         self.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+        # Nothing is drawn while the window is minimized or fully covered
+        self.window_visible = True
+        self.bind("<Map>", self._on_map, add="+")
+        self.bind("<Unmap>", self._on_unmap, add="+")
+        self.bind("<Visibility>", self._on_visibility, add="+")
         
         # Start device monitoring for hot-swap support
         self.after(5000, self.monitor_devices)
+
+        # Decorative widgets are built once the window is up and usable
+        self.after_idle(self._finish_startup)
+
+    def _finish_startup(self):
+        """Build deferred widgets after the first idle and report startup time"""
+        STARTUP.mark("first idle (usable)")
+        self.build_visualizer()
+        STARTUP.mark("visualizer built")
+        if STARTUP.enabled and not self.awaiting_first_audio:
+            print(STARTUP.report())
+
+    def _handle_first_audio(self):
+        """Report time from launch to the first processed block of an auto-started stream"""
+        if not self.awaiting_first_audio:
+            return
+        self.awaiting_first_audio = False
+        self.probe_devices()
+        STARTUP.mark("first processed audio", self.engine.first_audio)
+        elapsed = (self.engine.first_audio - STARTUP.t0) * 1000
+        self.update_status(f"Resumed last session, first audio {elapsed:.0f} ms after launch")
+        if STARTUP.enabled:
+            print(STARTUP.report())
     
     def initialize_state(self):
         """Initialize all state variables"""
@@ -379,18 +3753,156 @@ class VoiceChangerApp(ctk.CTk):
         self.volume = ctk.DoubleVar(value=1.0)
         self.monitor = ctk.BooleanVar(value=True)
         self.theme_var = ctk.StringVar(value="dark")
+        self.sample_rate_var = ctk.StringVar(value="44100 Hz")
+        self.buffer_size_var = ctk.StringVar(value="1024")
+        self.realtime_var = ctk.BooleanVar(value=False)
+        self.lock_memory_var = ctk.BooleanVar(value=False)
+        self.timeline_var = ctk.BooleanVar(value=TIMELINE.enabled)
+        self.autostart_var = ctk.BooleanVar(value=False)
         
         # Thread-safe state manager
         self.state_manager = StateManager()
         self.current_effect = "Normal"
         self.audio_data = np.zeros(1024)
+
+        # Processing engine, parameters are mirrored from the Tk variables
+        # Worker threads hand events to the Tk loop through the bus, handled in this order
+        self.events = EventBus((
+            ("stream_error", self.handle_audio_error),
+            ("stream_abort", self._handle_stream_abort),
+            ("callback_error", self._handle_callback_error),
+            ("recording_error", self._handle_recording_error),
+            ("realtime_report", self._show_realtime_report),
+            ("first_audio", self._handle_first_audio),
+            ("capabilities", self.update_stream_options),
+            ("quality_tier", self._handle_quality_tier),
+            ("source_finished", self._handle_source_finished),
+            ("preview_captured", self.render_preview),
+            ("preview_rendered", self._handle_preview_rendered),
+            ("replay_saved", self._handle_replay_saved),
+            ("visualize", self._update_visualizations),
+        ))
+        self.engine = AudioEngine(self.state_manager, post=self.events.post, registry=METRICS)
+        self.trace_path = None
+        self.correction_mode_var = ctk.StringVar(value="Off")
+        self.correction_key_var = ctk.StringVar(value="C")
+        self.correction_scale_var = ctk.StringVar(value="Major")
+        self.correction_note_var = ctk.StringVar(value="A3")
+        self.effect_var = ctk.StringVar(value="Normal")
+        self.vocoder_bands_var = ctk.StringVar(value="24")
+        self.reverb_mix = ctk.DoubleVar(value=0.0)
+        self.limiter_var = ctk.BooleanVar(value=True)
+        self.lookahead_var = ctk.StringVar(value="2 ms")
+        self.adaptive_quality_var = ctk.BooleanVar(value=False)
+        self.skip_silence_var = ctk.BooleanVar(value=False)
+        self.noise_suppression_var = ctk.BooleanVar(value=False)
+        self.noise_reduction_var = ctk.StringVar(value="12 dB")
+        self.preroll_var = ctk.StringVar(value="300 ms")
+        self.input_source_var = ctk.StringVar(value="Microphone")
+        self.replay_seconds_var = ctk.StringVar(value=f"{ReplayBuffer.SECONDS:g} s")
+        self.loop_file_var = ctk.BooleanVar(value=True)
+        self.input_file = None
+        synced_params = (
+            ("pitch", self.pitch_shift, float),
+            ("volume", self.volume, float),
+            ("monitor", self.monitor, bool),
+            ("correction_mode", self.correction_mode_var, str),
+            ("correction_key", self.correction_key_var, str),
+            ("correction_scale", self.correction_scale_var, str),
+            ("correction_note", self.correction_note_var, note_to_midi),
+            ("effect", self.effect_var, str),
+            ("vocoder_bands", self.vocoder_bands_var, int),
+            ("reverb_mix", self.reverb_mix, float),
+            ("limiter", self.limiter_var, bool),
+            ("limiter_lookahead_ms", self.lookahead_var, lambda text: float(text.split()[0])),
+            ("adaptive_quality", self.adaptive_quality_var, bool),
+            ("noise_suppression", self.noise_suppression_var, bool),
+            ("noise_reduction_db", self.noise_reduction_var, lambda text: float(text.split()[0])),
+            ("skip_silence", self.skip_silence_var, bool),
+            ("preroll_ms", self.preroll_var, lambda text: float(text.split()[0])),
+        )
+        for name, var, convert in synced_params:
+            var.trace_add("write", lambda *args, name=name, var=var, convert=convert: self._sync_param(name, var, convert))
+
+        # Everything persisted between launches besides the devices
+        self.session_vars = {name: var for name, var, convert in synced_params}
+        self.session_vars.update({
+            "sample_rate": self.sample_rate_var,
+            "buffer_size": self.buffer_size_var,
+            "realtime": self.realtime_var,
+            "lock_memory": self.lock_memory_var,
+            "theme": self.theme_var,
+            "autostart": self.autostart_var,
+            "input_source": self.input_source_var,
+            "loop_file": self.loop_file_var,
+            "replay_seconds": self.replay_seconds_var,
+        })
+        self.replay_seconds_var.trace_add("write", lambda *args: self.set_replay_length())
+        self.replay_saving = False
         
         # Devices
         self.input_device = None
         self.output_device = None
         self.input_devices = []
         self.output_devices = []
-        self.wav_file = None
+        self.device_list = []  # As last queried, see refresh_device_list()
+        self.hostapi_list = ()
+
+        # Supported rates, channels and latencies per device, cached on disk
+        self.capabilities = DeviceCapabilities(backend=self.backend)
+
+        # Extra output devices fed from the same processing pass
+        self.output_sinks = []
+        self.sink_menus = []
+
+        # Metrics written from the Tk main loop
+        self.visualize_handled = METRICS.counter(
+            "vchanger_visualize_handled_total", "Visualization blocks drawn by the GUI")
+        METRICS.gauge("vchanger_event_backlog", "Event types posted to the GUI but not yet handled",
+                      self.events.pending)
+        METRICS.gauge("vchanger_events_coalesced", "Events merged into a newer event of the same type",
+                      lambda: self.events.coalesced)
+        self.device_changes = METRICS.counter(
+            "vchanger_device_changes_total", "Device list changes seen by the hot-swap monitor")
+        self.stream_restarts = METRICS.counter(
+            "vchanger_stream_restarts_total", "Streams stopped by an audio error",
+            label="reason", values=("abort", "callback_error", "stream_error"))
+
+        # Recording browser
+        self.browser_map = None
+        self.browser_overview = None
+        self.browser_player = None
+        self.preview_player = None
+        self.preview_recording = None
+        self.preview_rendering = False
+        self.browser_selection = None
+        self.browser_drag_start = None
+        self.browser_drawn = -1
+        self.browser_polling = False
+        self.browser_export = None
+        self.pending_recording = None
+        self.recording_path = None
+
+        # Widgets built lazily
+        self.visualizer = None
+        self.browser_canvas = None
+        self.input_selector = None
+        self.output_selector = None
+
+    def _sync_param(self, name, var, convert):
+        """Publish a changed Tk variable to the audio engine"""
+        try:
+            self.engine.set_param(name, convert(var.get()))
+        except Exception:
+            pass  # Slider mid-edit or invalid value, keep the last good one
+
+    EVENT_INTERVAL_MS = 15
+
+    def drain_events(self):
+        """Handle events posted by worker threads, the only timer that does so"""
+        self.events.drain()
+        self.after(self.EVENT_INTERVAL_MS, self.drain_events)
+
     def build_ui(self):
         # Create main layout
         self.grid_columnconfigure(1, weight=1)
@@ -485,6 +3997,16 @@ class VoiceChangerApp(ctk.CTk):
             hover_color=COLORS["secondary"]
         )
         self.stop_record_button.pack(pady=5, fill="x")
+
+        self.save_replay_button = AnimatedButton(
+            record_frame,
+            text="⟲ Save Replay",
+            command=self.save_replay,
+            fg_color=COLORS["card"],
+            hover_color=COLORS["secondary"]
+        )
+        self.save_replay_button.pack(pady=5, fill="x")
+        self.create_tooltip(self.save_replay_button, "Save the last few seconds of output, no need to have been recording")
         
         # Separator
         separator3 = ctk.CTkFrame(self.sidebar, height=2, fg_color=COLORS["background"])
@@ -567,15 +4089,14 @@ class VoiceChangerApp(ctk.CTk):
         self.tab_view = TabView(self.main_frame)
         self.tab_view.pack(fill="both", expand=True)
         
-        # Add tabs
+        # Add tabs (only the visible one is built up front)
         self.main_tab = self.tab_view.add("Main")
-        self.settings_tab = self.tab_view.add("Settings")
-        self.about_tab = self.tab_view.add("About")
+        self.settings_tab = self.tab_view.add_lazy("Settings", self.configure_settings_tab)
+        self.recordings_tab = self.tab_view.add_lazy("Recordings", self.configure_recordings_tab)
+        self.about_tab = self.tab_view.add_lazy("About", self.configure_about_tab)
         
         # Configure tabs
         self.configure_main_tab()
-        self.configure_settings_tab()
-        self.configure_about_tab()
 
     def configure_main_tab(self):
         # Main tab content
@@ -592,9 +4113,9 @@ class VoiceChangerApp(ctk.CTk):
         )
         visualizer_label.pack(anchor="w", padx=15, pady=(15, 5))
         
-        # Audio waveform
-        self.visualizer = AudioVisualizer(visualizer_frame, fg_color="transparent", height=150)
-        self.visualizer.pack(fill="x", padx=15, pady=10, expand=True)
+        # Audio waveform (placeholder until build_visualizer runs)
+        self.visualizer_holder = ctk.CTkFrame(visualizer_frame, fg_color="transparent", height=150)
+        self.visualizer_holder.pack(fill="x", padx=15, pady=10, expand=True)
         
         # VU Meter
         vu_frame = ctk.CTkFrame(visualizer_frame, fg_color="transparent")
@@ -629,6 +4150,50 @@ class VoiceChangerApp(ctk.CTk):
             variable=self.pitch_shift,
             format_string="{:.2f}x"
         )
+
+        # Pitch correction
+        correction_frame = ctk.CTkFrame(pitch_frame, fg_color="transparent")
+        correction_frame.pack(fill="x", pady=(5, 0))
+
+        correction_label = ctk.CTkLabel(correction_frame, text="Correction:", anchor="w")
+        correction_label.pack(side="left", padx=(0, 10))
+
+        menu_style = dict(
+            width=90,
+            fg_color=COLORS["background"],
+            button_color=COLORS["primary"],
+            button_hover_color=COLORS["secondary"],
+            dropdown_fg_color=COLORS["background"]
+        )
+        self.correction_mode_menu = ctk.CTkOptionMenu(
+            correction_frame, values=PitchCorrector.MODES, variable=self.correction_mode_var, **menu_style
+        )
+        self.correction_mode_menu.pack(side="left", padx=(0, 5))
+        self.create_tooltip(self.correction_mode_menu, "Snap to a key/scale or pull to a fixed note")
+
+        self.correction_key_menu = ctk.CTkOptionMenu(
+            correction_frame, values=NOTE_NAMES, variable=self.correction_key_var, **menu_style
+        )
+        self.correction_key_menu.pack(side="left", padx=5)
+
+        self.correction_scale_menu = ctk.CTkOptionMenu(
+            correction_frame, values=list(SCALES), variable=self.correction_scale_var, **menu_style
+        )
+        self.correction_scale_menu.pack(side="left", padx=5)
+
+        self.correction_note_menu = ctk.CTkOptionMenu(
+            correction_frame, values=[note_name(midi) for midi in range(36, 85)],
+            variable=self.correction_note_var, **menu_style
+        )
+        self.correction_note_menu.pack(side="left", padx=5)
+
+        self.detected_pitch_label = ctk.CTkLabel(
+            correction_frame,
+            text="Detected: --",
+            text_color=COLORS["text_secondary"],
+            anchor="e"
+        )
+        self.detected_pitch_label.pack(side="right")
         
         # Voice effect presets
         effects_frame = ctk.CTkFrame(controls_frame, fg_color="transparent")
@@ -671,8 +4236,55 @@ class VoiceChangerApp(ctk.CTk):
             
             self.effect_buttons[effect] = btn
         
-        # Select default effect
-        self.effect_buttons["Normal"].select()
+        # Select the current (default or restored) effect
+        self.effect_buttons.get(self.current_effect, self.effect_buttons["Normal"]).select()
+
+        # Preset preview: capture once, render every preset, A/B on the same take
+        preview_row = ctk.CTkFrame(effects_frame, fg_color="transparent")
+        preview_row.pack(fill="x", pady=(5, 0))
+
+        self.preview_capture_btn = ctk.CTkButton(
+            preview_row,
+            text=f"Capture {PREVIEW_SECONDS:g} s",
+            width=100,
+            height=30,
+            command=self.capture_preview
+        )
+        self.preview_capture_btn.grid(row=0, column=0, padx=5, pady=5)
+        self.create_tooltip(self.preview_capture_btn, "Record a short take and hear it through every preset")
+
+        self.preview_buttons = {}
+        for i, preset in enumerate(PRESETS):
+            btn = ctk.CTkButton(
+                preview_row,
+                text=f"▶ {preset}",
+                width=80,
+                height=30,
+                state="disabled",
+                fg_color=COLORS["card"],
+                hover_color=COLORS["primary"],
+                command=lambda index=i: self.play_preview(index)
+            )
+            btn.grid(row=0, column=i + 1, padx=2, pady=5)
+            self.preview_buttons[preset] = btn
+
+        self.preview_stop_btn = ctk.CTkButton(
+            preview_row,
+            text="■",
+            width=30,
+            height=30,
+            state="disabled",
+            command=self.stop_preview
+        )
+        self.preview_stop_btn.grid(row=0, column=len(PRESETS) + 1, padx=(2, 5), pady=5)
+
+        self.preview_label = ctk.CTkLabel(
+            effects_frame,
+            text="",
+            font=ctk.CTkFont(family="Arial", size=12),
+            anchor="w"
+        )
+        self.preview_label.pack(fill="x", padx=5)
         
         # Volume control
         volume_frame = ctk.CTkFrame(controls_frame, fg_color="transparent")
@@ -694,12 +4306,61 @@ class VoiceChangerApp(ctk.CTk):
             format_string="{:.2f}x"
         )
 
+        # Reverb
+        reverb_frame = ctk.CTkFrame(controls_frame, fg_color="transparent")
+        reverb_frame.pack(fill="x", padx=15, pady=(0, 15))
+
+        reverb_header = ctk.CTkFrame(reverb_frame, fg_color="transparent")
+        reverb_header.pack(fill="x", pady=(10, 5))
+
+        reverb_label = ctk.CTkLabel(
+            reverb_header,
+            text="Reverb",
+            font=ctk.CTkFont(family="Arial", size=16, weight="bold"),
+            anchor="w"
+        )
+        reverb_label.pack(side="left")
+
+        self.load_ir_btn = AnimatedButton(
+            reverb_header,
+            text="Load IR",
+            width=90,
+            command=self.load_impulse_response,
+            fg_color=COLORS["background"],
+            hover_color=COLORS["primary"]
+        )
+        self.load_ir_btn.pack(side="right")
+
+        self.ir_label = ctk.CTkLabel(
+            reverb_header,
+            text="No impulse response",
+            text_color=COLORS["text_secondary"]
+        )
+        self.ir_label.pack(side="right", padx=10)
+
+        self.reverb_slider = CustomSlider(
+            reverb_frame,
+            from_=0.0,
+            to=1.0,
+            variable=self.reverb_mix,
+            format_string="{:.0%}"
+        )
+
+    def build_visualizer(self):
+        """Create the matplotlib waveform view (deferred to keep startup fast)"""
+        if self.visualizer is None:
+            self.visualizer = AudioVisualizer(self.visualizer_holder, self.engine.history,
+                                              fg_color="transparent", height=150)
+            self.visualizer.pack(fill="both", expand=True)
+
     def configure_settings_tab(self):
-        # Settings tab content
-        self.settings_tab.grid_columnconfigure(0, weight=1)
+        # Settings tab content (scrollable, it holds more cards than fit the window)
+        settings_body = ctk.CTkScrollableFrame(self.settings_tab, fg_color="transparent")
+        settings_body.pack(fill="both", expand=True)
+        settings_body.grid_columnconfigure(0, weight=1)
         
         # Devices section
-        device_frame = ctk.CTkFrame(self.settings_tab, fg_color=COLORS["card"], corner_radius=10)
+        device_frame = ctk.CTkFrame(settings_body, fg_color=COLORS["card"], corner_radius=10)
         device_frame.grid(row=0, column=0, padx=20, pady=20, sticky="nsew")
         
         device_label = ctk.CTkLabel(
@@ -727,6 +4388,53 @@ class VoiceChangerApp(ctk.CTk):
         )
         self.input_selector.set(self.input_device)
         self.input_selector.pack(side="left", fill="x", expand=True)
+
+        # Input source: the input device, or a WAV file played as if it were the microphone
+        source_frame = ctk.CTkFrame(device_frame, fg_color="transparent")
+        source_frame.pack(fill="x", padx=15, pady=5)
+
+        source_label = ctk.CTkLabel(source_frame, text="Input Source:", anchor="w", width=100)
+        source_label.pack(side="left", padx=(0, 10))
+
+        self.source_selector = ctk.CTkOptionMenu(
+            source_frame,
+            values=["Microphone", "File"],
+            variable=self.input_source_var,
+            width=120,
+            fg_color=COLORS["background"],
+            button_color=COLORS["primary"],
+            button_hover_color=COLORS["secondary"],
+            dropdown_fg_color=COLORS["background"]
+        )
+        self.source_selector.pack(side="left")
+
+        self.input_file_btn = AnimatedButton(
+            source_frame,
+            text="Choose WAV",
+            width=100,
+            command=self.choose_input_file,
+            fg_color=COLORS["background"],
+            hover_color=COLORS["primary"]
+        )
+        self.input_file_btn.pack(side="left", padx=10)
+
+        self.loop_switch = ctk.CTkSwitch(
+            source_frame,
+            text="Loop",
+            width=50,
+            variable=self.loop_file_var,
+            progress_color=COLORS["primary"],
+            button_color=COLORS["secondary"],
+            button_hover_color=COLORS["primary"]
+        )
+        self.loop_switch.pack(side="left")
+
+        self.input_file_label = ctk.CTkLabel(
+            source_frame,
+            text=os.path.basename(self.input_file) if self.input_file else "No file",
+            text_color=COLORS["text_secondary"]
+        )
+        self.input_file_label.pack(side="left", padx=10)
         
         # Output device
         output_frame = ctk.CTkFrame(device_frame, fg_color="transparent")
@@ -760,9 +4468,44 @@ class VoiceChangerApp(ctk.CTk):
             button_hover_color=COLORS["primary"]
         )
         self.monitor_toggle.pack(pady=10)
+
+        self.autostart_switch = ctk.CTkSwitch(
+            monitor_frame,
+            text="Start Audio on Launch",
+            variable=self.autostart_var,
+            progress_color=COLORS["primary"],
+            button_color=COLORS["secondary"],
+            button_hover_color=COLORS["primary"]
+        )
+        self.autostart_switch.pack()
+        self.create_tooltip(self.autostart_switch, "Reopen the last devices and start processing when VChanger launches")
+
+        # Additional outputs fed from the same processed signal
+        self.sinks_frame = ctk.CTkFrame(device_frame, fg_color="transparent")
+        self.sinks_frame.pack(fill="x", padx=15, pady=(0, 15))
+
+        sinks_header = ctk.CTkFrame(self.sinks_frame, fg_color="transparent")
+        sinks_header.pack(fill="x")
+
+        sinks_label = ctk.CTkLabel(sinks_header, text="Additional Outputs:", anchor="w")
+        sinks_label.pack(side="left")
+
+        self.add_sink_btn = AnimatedButton(
+            sinks_header,
+            text="Add Output",
+            width=100,
+            command=self.add_output_sink,
+            fg_color=COLORS["background"],
+            hover_color=COLORS["primary"]
+        )
+        self.add_sink_btn.pack(side="right")
+        self.create_tooltip(self.add_sink_btn, "Send the processed voice to another device too (e.g. a virtual cable)")
+
+        for sink in self.output_sinks:
+            self._build_sink_row(sink)
         
         # Advanced settings
-        advanced_frame = ctk.CTkFrame(self.settings_tab, fg_color=COLORS["card"], corner_radius=10)
+        advanced_frame = ctk.CTkFrame(settings_body, fg_color=COLORS["card"], corner_radius=10)
         advanced_frame.grid(row=1, column=0, padx=20, pady=(0, 20), sticky="nsew")
         
         advanced_label = ctk.CTkLabel(
@@ -781,33 +4524,630 @@ class VoiceChangerApp(ctk.CTk):
         
         self.sample_selector = ctk.CTkOptionMenu(
             sample_frame, 
-            values=["44100 Hz", "48000 Hz", "96000 Hz"],
+            values=[f"{rate} Hz" for rate in self.stream_rate_options()],
+            variable=self.sample_rate_var,
+            command=lambda value: self.update_latency_label(),
             fg_color=COLORS["background"],
             button_color=COLORS["primary"],
             button_hover_color=COLORS["secondary"],
             dropdown_fg_color=COLORS["background"]
         )
-        self.sample_selector.set("44100 Hz")
         self.sample_selector.pack(side="left", fill="x", expand=True)
         
         # Buffer size
         buffer_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
-        buffer_frame.pack(fill="x", padx=15, pady=(5, 15))
+        buffer_frame.pack(fill="x", padx=15, pady=5)
         
         buffer_label = ctk.CTkLabel(buffer_frame, text="Buffer Size:", anchor="w", width=100)
         buffer_label.pack(side="left", padx=(0, 10))
         
         self.buffer_selector = ctk.CTkOptionMenu(
             buffer_frame, 
-            values=["256", "512", "1024", "2048"],
+            values=[str(size) for size in BUFFER_SIZES],
+            variable=self.buffer_size_var,
+            command=lambda value: self.update_latency_label(),
             fg_color=COLORS["background"],
             button_color=COLORS["primary"],
             button_hover_color=COLORS["secondary"],
             dropdown_fg_color=COLORS["background"]
         )
-        self.buffer_selector.set("1024")
         self.buffer_selector.pack(side="left", fill="x", expand=True)
 
+        # Vocoder bands
+        bands_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
+        bands_frame.pack(fill="x", padx=15, pady=5)
+
+        bands_label = ctk.CTkLabel(bands_frame, text="Robot Bands:", anchor="w", width=100)
+        bands_label.pack(side="left", padx=(0, 10))
+
+        self.bands_selector = ctk.CTkOptionMenu(
+            bands_frame,
+            values=[str(bands) for bands in ChannelVocoder.QUALITY_BANDS],
+            variable=self.vocoder_bands_var,
+            fg_color=COLORS["background"],
+            button_color=COLORS["primary"],
+            button_hover_color=COLORS["secondary"],
+            dropdown_fg_color=COLORS["background"]
+        )
+        self.bands_selector.pack(side="left", fill="x", expand=True)
+        self.create_tooltip(self.bands_selector, "Vocoder bands for the Robot effect (more bands cost more CPU)")
+
+        # Adaptive quality
+        quality_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
+        quality_frame.pack(fill="x", padx=15, pady=5)
+
+        quality_label = ctk.CTkLabel(quality_frame, text="Quality:", anchor="w", width=100)
+        quality_label.pack(side="left", padx=(0, 10))
+
+        self.adaptive_quality_switch = ctk.CTkSwitch(
+            quality_frame,
+            text="Adaptive",
+            variable=self.adaptive_quality_var,
+            command=self.apply_quality_mode,
+            progress_color=COLORS["primary"],
+            button_color=COLORS["secondary"],
+            button_hover_color=COLORS["primary"]
+        )
+        self.adaptive_quality_switch.pack(side="left")
+        self.create_tooltip(self.adaptive_quality_switch,
+                            "Lower vocoder bands, pitch tracking rate and reverb length when the CPU can't keep up, "
+                            "raise them when it can (overrides Robot Bands)")
+
+        # Noise suppression ahead of the pitch stage
+        noise_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
+        noise_frame.pack(fill="x", padx=15, pady=5)
+
+        noise_label = ctk.CTkLabel(noise_frame, text="Noise:", anchor="w", width=100)
+        noise_label.pack(side="left", padx=(0, 10))
+
+        self.noise_switch = ctk.CTkSwitch(
+            noise_frame,
+            text="Suppress",
+            variable=self.noise_suppression_var,
+            command=self.update_latency_label,
+            progress_color=COLORS["primary"],
+            button_color=COLORS["secondary"],
+            button_hover_color=COLORS["primary"]
+        )
+        self.noise_switch.pack(side="left")
+        self.create_tooltip(self.noise_switch, "Learn the background noise while you're silent and remove it before the voice is shifted")
+
+        self.noise_reduction_selector = ctk.CTkOptionMenu(
+            noise_frame,
+            values=["6 dB", "12 dB", "20 dB"],
+            variable=self.noise_reduction_var,
+            width=100,
+            fg_color=COLORS["background"],
+            button_color=COLORS["primary"],
+            button_hover_color=COLORS["secondary"],
+            dropdown_fg_color=COLORS["background"]
+        )
+        self.noise_reduction_selector.pack(side="left", padx=10)
+        self.create_tooltip(self.noise_reduction_selector, "Maximum noise reduction (more can sound watery)")
+
+        # Voice-activity-aware recording
+        silence_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
+        silence_frame.pack(fill="x", padx=15, pady=5)
+
+        silence_label = ctk.CTkLabel(silence_frame, text="Recording:", anchor="w", width=100)
+        silence_label.pack(side="left", padx=(0, 10))
+
+        self.skip_silence_switch = ctk.CTkSwitch(
+            silence_frame,
+            text="Skip Silence",
+            variable=self.skip_silence_var,
+            progress_color=COLORS["primary"],
+            button_color=COLORS["secondary"],
+            button_hover_color=COLORS["primary"]
+        )
+        self.skip_silence_switch.pack(side="left")
+        self.create_tooltip(self.skip_silence_switch, "Leave pauses out of recordings, keeping the pre-roll before each phrase")
+
+        self.preroll_selector = ctk.CTkOptionMenu(
+            silence_frame,
+            values=["100 ms", "300 ms", "500 ms", "1000 ms"],
+            variable=self.preroll_var,
+            width=100,
+            fg_color=COLORS["background"],
+            button_color=COLORS["primary"],
+            button_hover_color=COLORS["secondary"],
+            dropdown_fg_color=COLORS["background"]
+        )
+        self.preroll_selector.pack(side="left", padx=10)
+        self.create_tooltip(self.preroll_selector, "Silence kept before speech resumes so onsets aren't cut")
+
+        # Instant replay length
+        replay_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
+        replay_frame.pack(fill="x", padx=15, pady=5)
+
+        replay_label = ctk.CTkLabel(replay_frame, text="Replay Length:", anchor="w", width=100)
+        replay_label.pack(side="left", padx=(0, 10))
+
+        self.replay_selector = ctk.CTkOptionMenu(
+            replay_frame,
+            values=["10 s", "30 s", "60 s", "120 s"],
+            variable=self.replay_seconds_var,
+            fg_color=COLORS["background"],
+            button_color=COLORS["primary"],
+            button_hover_color=COLORS["secondary"],
+            dropdown_fg_color=COLORS["background"]
+        )
+        self.replay_selector.pack(side="left", fill="x", expand=True)
+        self.create_tooltip(self.replay_selector, "Output kept in memory for Save Replay (2 bytes per sample, 11.5 MB for 60 s at 96 kHz)")
+
+        # Output limiter
+        limiter_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
+        limiter_frame.pack(fill="x", padx=15, pady=5)
+
+        limiter_label = ctk.CTkLabel(limiter_frame, text="Limiter:", anchor="w", width=100)
+        limiter_label.pack(side="left", padx=(0, 10))
+
+        self.limiter_switch = ctk.CTkSwitch(
+            limiter_frame,
+            text="",
+            width=50,
+            variable=self.limiter_var,
+            command=self.update_latency_label,
+            progress_color=COLORS["primary"],
+            button_color=COLORS["secondary"],
+            button_hover_color=COLORS["primary"]
+        )
+        self.limiter_switch.pack(side="left")
+        self.create_tooltip(self.limiter_switch, "Look-ahead peak limiter instead of hard clipping")
+
+        self.lookahead_selector = ctk.CTkOptionMenu(
+            limiter_frame,
+            values=["1 ms", "2 ms", "5 ms"],
+            variable=self.lookahead_var,
+            command=lambda value: self.update_latency_label(),
+            fg_color=COLORS["background"],
+            button_color=COLORS["primary"],
+            button_hover_color=COLORS["secondary"],
+            dropdown_fg_color=COLORS["background"]
+        )
+        self.lookahead_selector.pack(side="left", fill="x", expand=True, padx=(10, 0))
+
+        self.latency_label = ctk.CTkLabel(
+            advanced_frame,
+            text="",
+            text_color=COLORS["text_secondary"],
+            anchor="w"
+        )
+        self.latency_label.pack(fill="x", padx=15)
+        self.update_latency_label()
+
+        # Real-time mode
+        realtime_frame = ctk.CTkFrame(advanced_frame, fg_color="transparent")
+        realtime_frame.pack(fill="x", padx=15, pady=(5, 15))
+
+        self.realtime_switch = ctk.CTkSwitch(
+            realtime_frame,
+            text="Real-time Mode",
+            variable=self.realtime_var,
+            progress_color=COLORS["primary"],
+            button_color=COLORS["secondary"],
+            button_hover_color=COLORS["primary"]
+        )
+        self.realtime_switch.pack(side="left", pady=10)
+        self.create_tooltip(self.realtime_switch, "Raise audio thread priority and pause the garbage collector while streaming")
+
+        self.lock_memory_switch = ctk.CTkSwitch(
+            realtime_frame,
+            text="Lock Memory",
+            variable=self.lock_memory_var,
+            progress_color=COLORS["primary"],
+            button_color=COLORS["secondary"],
+            button_hover_color=COLORS["primary"]
+        )
+        self.lock_memory_switch.pack(side="left", padx=20, pady=10)
+        self.create_tooltip(self.lock_memory_switch, "Lock memory pages in RAM while in real-time mode")
+
+        # Diagnostics
+        diagnostics_frame = ctk.CTkFrame(settings_body, fg_color=COLORS["card"], corner_radius=10)
+        diagnostics_frame.grid(row=2, column=0, padx=20, pady=(0, 20), sticky="nsew")
+
+        diagnostics_label = ctk.CTkLabel(
+            diagnostics_frame,
+            text="Diagnostics",
+            font=ctk.CTkFont(family="Arial", size=16, weight="bold")
+        )
+        diagnostics_label.pack(anchor="w", padx=15, pady=(15, 10))
+
+        timeline_frame = ctk.CTkFrame(diagnostics_frame, fg_color="transparent")
+        timeline_frame.pack(fill="x", padx=15, pady=(5, 15))
+
+        self.timeline_switch = ctk.CTkSwitch(
+            timeline_frame,
+            text="Record Timeline",
+            variable=self.timeline_var,
+            command=self.toggle_timeline,
+            progress_color=COLORS["primary"],
+            button_color=COLORS["secondary"],
+            button_hover_color=COLORS["primary"]
+        )
+        self.timeline_switch.pack(side="left", pady=10)
+
+        self.export_timeline_btn = AnimatedButton(
+            timeline_frame,
+            text="Export Timeline",
+            command=self.export_timeline,
+            fg_color=COLORS["background"],
+            hover_color=COLORS["primary"]
+        )
+        self.export_timeline_btn.pack(side="right", pady=10)
+
+    def add_output_sink(self):
+        """Add another output device fed from the processed signal"""
+        if not self.output_devices or self.output_devices[0] == "No devices found":
+            self.update_status("No output devices available")
+            return
+
+        sink = OutputSink(self.output_devices[0], backend=self.backend)
+        self.output_sinks.append(sink)
+        self.engine.sinks = tuple(self.output_sinks)
+        self._build_sink_row(sink)
+        if self.state_manager.running:
+            self._start_sink(sink)
+        self.update_status(f"Added output: {sink.device_name}")
+
+    def _build_sink_row(self, sink):
+        """Create the controls for one additional output"""
+        row = ctk.CTkFrame(self.sinks_frame, fg_color="transparent")
+        row.pack(fill="x", pady=5)
+
+        menu = ctk.CTkOptionMenu(
+            row,
+            values=self.output_devices,
+            command=lambda name: self._set_sink_device(sink, name),
+            fg_color=COLORS["background"],
+            button_color=COLORS["primary"],
+            button_hover_color=COLORS["secondary"],
+            dropdown_fg_color=COLORS["background"]
+        )
+        menu.set(sink.device_name)
+        menu.pack(side="left", fill="x", expand=True)
+        self.sink_menus.append(menu)
+
+        gain = ctk.CTkSlider(row, from_=0.0, to=2.0, width=100,
+                             command=lambda value: setattr(sink, "gain", float(value)))
+        gain.set(sink.gain)
+        gain.pack(side="left", padx=10)
+        self.create_tooltip(gain, "Output gain")
+
+        enabled = ctk.BooleanVar(value=sink.enabled)
+        toggle = ctk.CTkSwitch(
+            row,
+            text="Monitor",
+            variable=enabled,
+            command=lambda: setattr(sink, "enabled", enabled.get()),
+            progress_color=COLORS["primary"],
+            button_color=COLORS["secondary"],
+            button_hover_color=COLORS["primary"]
+        )
+        toggle.pack(side="left")
+
+        remove = ctk.CTkButton(
+            row,
+            text="✕",
+            width=30,
+            fg_color=COLORS["background"],
+            hover_color=COLORS["error"],
+            command=lambda: self.remove_output_sink(sink, row, menu)
+        )
+        remove.pack(side="left", padx=(10, 0))
+
+    def remove_output_sink(self, sink, row, menu):
+        """Stop and remove an additional output"""
+        self.output_sinks.remove(sink)
+        self.engine.sinks = tuple(self.output_sinks)
+        sink.stop()
+        self.sink_menus.remove(menu)
+        row.destroy()
+        self.update_status(f"Removed output: {sink.device_name}")
+
+    def _set_sink_device(self, sink, device_name):
+        """Point an additional output at another device"""
+        sink.device_name = device_name
+        if self.state_manager.running:
+            self._start_sink(sink)
+        self.update_status(f"Additional output set to: {device_name}")
+
+    def _start_sink(self, sink):
+        """Open a sink's stream for the running stream format"""
+        index = self.get_device_index(sink.device_name, False)
+        if index is None:
+            sink.error = "device not found"
+            self.update_status(f"Output '{sink.device_name}' not available")
+            return
+        sink.start(index, self.engine.samplerate, self.engine.blocksize)
+        if sink.error:
+            self.update_status(f"Output '{sink.device_name}' failed: {sink.error}")
+
+    def configure_recordings_tab(self):
+        # Recording browser
+        browser_frame = ctk.CTkFrame(self.recordings_tab, fg_color=COLORS["card"], corner_radius=10)
+        browser_frame.pack(fill="both", expand=True, padx=20, pady=20)
+
+        header = ctk.CTkFrame(browser_frame, fg_color="transparent")
+        header.pack(fill="x", padx=15, pady=(15, 10))
+
+        browser_label = ctk.CTkLabel(
+            header,
+            text="Recordings",
+            font=ctk.CTkFont(family="Arial", size=16, weight="bold")
+        )
+        browser_label.pack(side="left")
+
+        self.open_recording_btn = AnimatedButton(
+            header,
+            text="Open WAV",
+            width=100,
+            command=self.open_recording_dialog,
+            fg_color=COLORS["background"],
+            hover_color=COLORS["primary"]
+        )
+        self.open_recording_btn.pack(side="right")
+
+        self.browser_file_label = ctk.CTkLabel(header, text="No file", text_color=COLORS["text_secondary"])
+        self.browser_file_label.pack(side="right", padx=10)
+
+        # Overview: click to seek, drag to select a range
+        self.browser_canvas = Canvas(browser_frame, bg=COLORS["background"], highlightthickness=0, height=160)
+        self.browser_canvas.pack(fill="both", expand=True, padx=15)
+        self.browser_canvas.bind("<Configure>", lambda event: self._draw_browser(force=True))
+        self.browser_canvas.bind("<ButtonPress-1>", self._browser_press)
+        self.browser_canvas.bind("<B1-Motion>", self._browser_drag)
+        self.browser_canvas.bind("<ButtonRelease-1>", self._browser_release)
+
+        controls = ctk.CTkFrame(browser_frame, fg_color="transparent")
+        controls.pack(fill="x", padx=15, pady=15)
+
+        self.browser_play_btn = AnimatedButton(
+            controls,
+            text="▶ Play",
+            width=90,
+            command=self.toggle_browser_playback,
+            fg_color=COLORS["primary"],
+            hover_color=COLORS["secondary"]
+        )
+        self.browser_play_btn.pack(side="left")
+
+        self.browser_stop_btn = AnimatedButton(
+            controls,
+            text="■ Stop",
+            width=90,
+            command=self.stop_browser_playback,
+            fg_color=COLORS["background"],
+            hover_color=COLORS["secondary"]
+        )
+        self.browser_stop_btn.pack(side="left", padx=10)
+
+        self.browser_export_btn = AnimatedButton(
+            controls,
+            text="Export Selection",
+            command=self.export_browser_selection,
+            fg_color=COLORS["background"],
+            hover_color=COLORS["primary"]
+        )
+        self.browser_export_btn.pack(side="left")
+        self.create_tooltip(self.browser_export_btn, "Drag across the waveform to select a range")
+
+        self.browser_position_label = ctk.CTkLabel(controls, text="", text_color=COLORS["text_secondary"])
+        self.browser_position_label.pack(side="right")
+
+        if self.pending_recording:
+            self.open_recording(self.pending_recording)
+            self.pending_recording = None
+
+    def open_recording_dialog(self):
+        """Pick a WAV file to browse"""
+        path = filedialog.askopenfilename(filetypes=[("WAV", "*.wav")], title="Open Recording")
+        if path:
+            self.open_recording(path)
+
+    def open_recording(self, path):
+        """Memory-map a WAV file into the recording browser"""
+        if self.browser_canvas is None:
+            # Browser tab not built yet, open once it is
+            self.pending_recording = path
+            return
+
+        try:
+            wav_map = WavMap(path)
+        except Exception as e:
+            self.update_status(f"Error opening recording: {e}")
+            return
+
+        self.close_recording()
+        self.browser_map = wav_map
+        self.browser_overview = PeakOverview(wav_map)
+        self.browser_overview.start()
+        self.browser_player = WavPlayer(wav_map, self.backend)
+        self.browser_selection = None
+        self.browser_drawn = -1
+        self.browser_file_label.configure(text=f"{os.path.basename(path)} ({format_duration(wav_map.duration)})")
+        self._draw_browser(force=True)
+        self._poll_browser()
+
+    def close_recording(self):
+        """Release the currently browsed file
+
+        Playback, the overview build and any export still reading the map
+        are finished first, the map must not be closed under them.
+        """
+        if self.browser_player is not None:
+            self.browser_player.stop()
+        if self.browser_overview is not None:
+            self.browser_overview.cancel()
+            self.browser_overview.join()
+        if self.browser_export is not None:
+            self.browser_export["thread"].join()
+        if self.browser_map is not None:
+            self.browser_map.close()
+        self.browser_map = self.browser_overview = self.browser_player = None
+
+    def _browser_frame_at(self, x):
+        width = max(1, self.browser_canvas.winfo_width())
+        return int(max(0.0, min(1.0, x / width)) * self.browser_map.frames)
+
+    def _browser_x_of(self, frame):
+        return frame / max(1, self.browser_map.frames) * self.browser_canvas.winfo_width()
+
+    def _browser_press(self, event):
+        if self.browser_map is not None:
+            self.browser_drag_start = event.x
+
+    def _browser_drag(self, event):
+        if self.browser_map is not None and self.browser_drag_start is not None:
+            if abs(event.x - self.browser_drag_start) > 3:
+                start, stop = sorted((self._browser_frame_at(self.browser_drag_start), self._browser_frame_at(event.x)))
+                self.browser_selection = (start, stop)
+                self._draw_browser()
+
+    def _browser_release(self, event):
+        if self.browser_map is None or self.browser_drag_start is None:
+            return
+        if abs(event.x - self.browser_drag_start) <= 3:
+            # Plain click: seek and drop the selection
+            self.browser_selection = None
+            self.browser_player.seek(self._browser_frame_at(event.x))
+        elif self.browser_selection:
+            self.browser_player.seek(self.browser_selection[0])
+        self.browser_drag_start = None
+        self._draw_browser()
+
+    def _draw_browser(self, force=False):
+        """Redraw the overview (only when it changed) plus selection and cursor"""
+        canvas = self.browser_canvas
+        if canvas is None:
+            return
+        width = canvas.winfo_width()
+        height = canvas.winfo_height()
+        overview = self.browser_overview
+
+        if overview is None:
+            canvas.delete("all")
+            return
+
+        if force or overview.done != self.browser_drawn:
+            self.browser_drawn = overview.done
+            canvas.delete("wave")
+            mins, maxs, columns = overview.columns(width)
+            middle = height / 2
+            scale = width / max(1, columns)
+            for column, (low, high) in enumerate(zip(mins, maxs)):
+                x = column * scale
+                canvas.create_line(x, middle - high * middle, x, middle - low * middle + 1,
+                                   fill=COLORS["primary"], tags="wave")
+
+        canvas.delete("marks")
+        if self.browser_selection:
+            start, stop = self.browser_selection
+            canvas.create_rectangle(self._browser_x_of(start), 0, self._browser_x_of(stop), height,
+                                    outline=COLORS["accent"], tags="marks")
+        x = self._browser_x_of(self.browser_player.position)
+        canvas.create_line(x, 0, x, height, fill=COLORS["text"], tags="marks")
+
+        position = self.browser_player.position / self.browser_map.samplerate
+        text = f"{format_duration(position)} / {format_duration(self.browser_map.duration)}"
+        if not overview.complete:
+            text += f"  (overview {overview.done * 100 // max(1, len(overview.mins))}%)"
+        self.browser_position_label.configure(text=text)
+
+    def _poll_browser(self):
+        """Refresh while the overview builds, playback runs or an export is pending"""
+        if self.browser_polling:
+            return
+        self.browser_polling = True
+        self._browser_tick()
+
+    def _browser_tick(self):
+        self._draw_browser()
+
+        if self.browser_export is not None and not self.browser_export["thread"].is_alive():
+            export, self.browser_export = self.browser_export, None
+            if export["error"]:
+                self.update_status(f"Error exporting selection: {export['error']}")
+            else:
+                self.update_status(f"Selection exported to {os.path.basename(export['path'])}")
+
+        player = self.browser_player
+        if player is not None and not player.playing:
+            self.browser_play_btn.configure(text="▶ Play")
+        busy = ((self.browser_overview is not None and not self.browser_overview.complete)
+                or (player is not None and player.playing)
+                or self.browser_export is not None)
+        if busy:
+            self.after(100, self._browser_tick)
+        else:
+            self.browser_polling = False
+
+    def toggle_browser_playback(self):
+        """Play (the selection, if any) or pause"""
+        player = self.browser_player
+        if player is None:
+            self.update_status("Open a recording first")
+            return
+        if player.playing:
+            player.stop()
+            self.browser_play_btn.configure(text="▶ Play")
+            return
+
+        output_idx = self.get_device_index(self.output_device, False)
+        if output_idx is None:
+            self.update_status("Error: Invalid output device selected")
+            return
+        try:
+            if self.browser_selection:
+                start, stop = self.browser_selection
+                if not start <= player.position < stop:
+                    player.seek(start)
+                player.play(output_idx, stop=stop)
+            else:
+                player.play(output_idx)
+        except Exception as e:
+            self.update_status(f"Playback error: {e}")
+            return
+        self.browser_play_btn.configure(text="❚❚ Pause")
+        self._poll_browser()
+
+    def stop_browser_playback(self):
+        """Stop playback and rewind to the start (of the selection)"""
+        if self.browser_player is not None:
+            self.browser_player.stop()
+            self.browser_player.seek(self.browser_selection[0] if self.browser_selection else 0)
+            self.browser_play_btn.configure(text="▶ Play")
+            self._draw_browser()
+
+    def export_browser_selection(self):
+        """Write the selected range to a new WAV file in the background"""
+        if self.browser_map is None or not self.browser_selection:
+            self.update_status("Drag across the waveform to select a range first")
+            return
+        path = filedialog.asksaveasfilename(
+            defaultextension=".wav",
+            filetypes=[("WAV", "*.wav")],
+            title="Export Selection"
+        )
+        if not path:
+            return
+
+        start, stop = self.browser_selection
+        wav_map = self.browser_map
+        export = {"path": path, "error": None}
+
+        def run():
+            try:
+                wav_map.export(path, start, stop)
+            except Exception as e:
+                export["error"] = e
+
+        export["thread"] = threading.Thread(target=run, daemon=True)
+        self.browser_export = export
+        export["thread"].start()
+        self.update_status("Exporting selection...")
+        self._poll_browser()
+
     def configure_about_tab(self):
         # About tab content
         about_frame = ctk.CTkFrame(self.about_tab, fg_color=COLORS["card"], corner_radius=10)
@@ -915,12 +5255,22 @@ class VoiceChangerApp(ctk.CTk):
         # CPU usage (placeholder)
         self.cpu_label = ctk.CTkLabel(
             self.status_bar, 
-            text="CPU: 0%", 
+            text="DSP: 0%", 
             font=ctk.CTkFont(family="Arial", size=12),
             text_color=COLORS["text_secondary"]
         )
         self.cpu_label.pack(side="right", padx=10)
 
+        # Processing quality tier
+        self.quality_label = ctk.CTkLabel(
+            self.status_bar,
+            text="",
+            font=ctk.CTkFont(family="Arial", size=12),
+            text_color=COLORS["text_secondary"]
+        )
+        self.quality_label.pack(side="right", padx=10)
+        self.update_quality_label()
+
     def create_tooltip(self, widget, text):
         """Create a tooltip for a widget"""
         tooltip_window = None
@@ -966,10 +5316,12 @@ class VoiceChangerApp(ctk.CTk):
             # Update status bar text
             self.status_bar_label.configure(text_color=COLORS["secondary"])
             self.cpu_label.configure(text_color=COLORS["secondary"])
+            self.quality_label.configure(text_color=COLORS["secondary"])
         else:
             # Update status bar text
             self.status_bar_label.configure(text_color=COLORS["text_secondary"])
             self.cpu_label.configure(text_color=COLORS["text_secondary"])
+            self.quality_label.configure(text_color=COLORS["text_secondary"])
         
         # Update status
         self.update_status(f"Theme changed to {new_theme}")
@@ -977,8 +5329,8 @@ class VoiceChangerApp(ctk.CTk):
     def update_animations(self):
         """Update all animations and visual elements"""
         if self.state_manager.running:
-            # Update CPU usage (placeholder)
-            self.cpu_label.configure(text=f"CPU: {np.random.randint(5, 15)}%")
+            # Smoothed callback load, as measured for the quality governor
+            self.cpu_label.configure(text=f"DSP: {self.engine.governor.load * 100:.0f}%")
             
             # Pulse record button if recording
             if self.state_manager.recording:
@@ -987,7 +5339,62 @@ class VoiceChangerApp(ctk.CTk):
                 self.record_button.stop_pulse()
         
         # Schedule next update
-        self.after(1000, self.update_animations)
+        self.animation_job = self.after(1000, self.update_animations)
+
+    def _on_map(self, event):
+        if event.widget is self:
+            self.set_window_visible(True)
+
+    def _on_unmap(self, event):
+        if event.widget is self:
+            self.set_window_visible(False)
+
+    def _on_visibility(self, event):
+        if event.widget is self:
+            self.set_window_visible(event.state != "VisibilityFullyObscured")
+
+    def set_window_visible(self, visible):
+        """Pause all rendering while the window can't be seen, catching up when it can
+
+        While hidden the audio thread stops posting blocks for the meters, so
+        the only work left is audio processing. The waveform history keeps
+        filling, so the first redraw after showing the window is current.
+        """
+        if visible == self.window_visible:
+            return
+        self.window_visible = visible
+        self.engine.visualize = visible
+        if visible:
+            if self.visualizer is not None:
+                self.visualizer.refresh(force=True)
+            if self.animation_job is None:
+                self.update_animations()
+        else:
+            if self.animation_job is not None:
+                self.after_cancel(self.animation_job)
+                self.animation_job = None
+            self.vu_meter.reset()
+            self.record_button.stop_pulse()
+
+    def toggle_timeline(self):
+        """Start or stop recording spans into the timeline buffer"""
+        TIMELINE.enabled = self.timeline_var.get()
+        self.update_status("Timeline recording " + ("on" if TIMELINE.enabled else "off"))
+
+    def export_timeline(self):
+        """Save the timeline buffer as a Chrome trace file"""
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("Chrome trace", "*.json")],
+            title="Export Timeline"
+        )
+
+        if path:
+            try:
+                count = TIMELINE.export(path)
+                self.update_status(f"Exported {count} spans to {os.path.basename(path)}")
+            except Exception as e:
+                self.update_status(f"Error exporting timeline: {e}")
 
     def update_status(self, message):
         """Update status bar message with animation"""
@@ -1001,6 +5408,7 @@ class VoiceChangerApp(ctk.CTk):
             
         self.input_device = device_name
         self.update_status(f"Input device set to: {device_name}")
+        self.update_stream_options()
         
         # If currently running, restart the audio stream with new device
         if self.state_manager.running:
@@ -1008,15 +5416,154 @@ class VoiceChangerApp(ctk.CTk):
             self.stop_voice_changer()
             self.after(500, self.start_voice_changer)  #
 
+    def choose_input_file(self):
+        """Pick the WAV file streamed in place of the microphone"""
+        path = filedialog.askopenfilename(filetypes=[("WAV", "*.wav")], title="Choose Input File")
+        if not path:
+            return
+        try:
+            WavMap(path).close()
+        except Exception as e:
+            self.update_status(f"Error opening input file: {e}")
+            return
+        self.input_file = path
+        self.input_source_var.set("File")
+        self.input_file_label.configure(text=os.path.basename(path))
+        self.update_status(f"Input file set to {os.path.basename(path)}, restart to apply" if self.state_manager.running
+                           else f"Input file set to {os.path.basename(path)}")
+
+    def _handle_source_finished(self):
+        """Stop once a non-looping input file has played out"""
+        if self.state_manager.running:
+            self.stop_voice_changer()
+            self.update_status("Input file finished")
+
+    def capture_preview(self):
+        """Grab a few seconds of input to render through every preset"""
+        self.stop_preview()
+        if self.state_manager.running:
+            # Tap the live input, the engine posts the clip once it is full
+            self.engine.capture_preview(PREVIEW_SECONDS)
+        elif self.input_source_var.get() == "File":
+            if not self.input_file:
+                self.update_status("Choose an input file first")
+                return
+            samplerate = self.get_stream_settings()[0]
+            try:
+                wav_map = WavMap(self.input_file)
+            except Exception as e:
+                self.update_status(f"Error reading input file: {e}")
+                return
+            clip = FileSource(wav_map, samplerate).block(int(PREVIEW_SECONDS * samplerate))[:, 0]
+            wav_map.close()
+            self.render_preview(clip, samplerate)
+            return
+        else:
+            input_idx = self.get_device_index(self.input_device, True)
+            if input_idx is None:
+                self.update_status("Error: Invalid input device selected")
+                return
+            samplerate = self.get_stream_settings()[0]
+            try:
+                self.preview_recording = (self.backend.rec(int(PREVIEW_SECONDS * samplerate), samplerate=samplerate,
+                                                 channels=1, dtype='float32', device=input_idx), samplerate)
+            except Exception as e:
+                self.update_status(f"Error capturing preview: {e}")
+                return
+            self.after(int(PREVIEW_SECONDS * 1000) + 100, self._finish_preview_recording)
+
+        self.preview_capture_btn.configure(state="disabled")
+        self.preview_label.configure(text=f"Capturing {PREVIEW_SECONDS:g} s, keep talking...")
+
+    def _finish_preview_recording(self):
+        recording, self.preview_recording = self.preview_recording, None
+        if recording is None:
+            return
+        try:
+            self.backend.wait()
+        except Exception as e:
+            self.preview_capture_btn.configure(state="normal")
+            self.update_status(f"Error capturing preview: {e}")
+            return
+        audio, samplerate = recording
+        self.render_preview(audio[:, 0], samplerate)
+
+    def render_preview(self, clip, samplerate=None):
+        """Render a captured clip through all presets in the background"""
+        if self.preview_rendering:
+            return
+        samplerate = samplerate or self.engine.samplerate
+        params, reverb = self.engine.params, self.engine.reverb
+
+        def run():
+            start = time.perf_counter()
+            try:
+                names, rendered = render_presets(clip, samplerate, params, reverb)
+            except Exception as e:
+                self.events.post("preview_rendered", None, None, samplerate, 0.0, str(e))
+            else:
+                self.events.post("preview_rendered", names, rendered, samplerate,
+                                 time.perf_counter() - start, None)
+
+        self.preview_rendering = True
+        self.preview_capture_btn.configure(state="disabled")
+        self.preview_label.configure(text="Rendering presets...")
+        threading.Thread(target=run, name="preview-renderer", daemon=True).start()
+
+    def _handle_preview_rendered(self, names, rendered, samplerate, elapsed, error):
+        """Enable the A/B buttons once the presets are rendered"""
+        self.preview_rendering = False
+        self.preview_capture_btn.configure(state="normal")
+        if error:
+            self.preview_label.configure(text="")
+            self.update_status(f"Error rendering preview: {error}")
+            return
+
+        self.preview_player = ClipPlayer(rendered, samplerate, self.backend)
+        for btn in self.preview_buttons.values():
+            btn.configure(state="normal")
+        self.preview_stop_btn.configure(state="normal")
+        self.preview_label.configure(
+            text=f"{len(names)} presets rendered in {elapsed * 1000:.0f} ms "
+                 f"({rendered.shape[1] / samplerate:.1f} s take)")
+
+    def play_preview(self, index):
+        """Play one preset's render, switching in place if a preview is already playing"""
+        player = self.preview_player
+        if player is None:
+            return
+        if not player.playing:
+            output_idx = self.get_device_index(self.output_device, False)
+            if output_idx is None:
+                self.update_status("Error: Invalid output device selected")
+                return
+            try:
+                player.play(output_idx, index)
+            except Exception as e:
+                self.update_status(f"Preview playback error: {e}")
+                return
+        player.select(index)
+        for i, btn in enumerate(self.preview_buttons.values()):
+            btn.configure(fg_color=COLORS["primary"] if i == index else COLORS["card"])
+
+    def stop_preview(self):
+        """Stop preview playback"""
+        if self.preview_player is not None:
+            self.preview_player.stop()
+        for btn in self.preview_buttons.values():
+            btn.configure(fg_color=COLORS["card"])
+
     def set_output_device(self, device_name):
         """Set the output audio device"""
         self.output_device = device_name
         self.update_status(f"Output device set to: {device_name}")
+        self.update_stream_options()
 
     def apply_preset(self, preset):
         """Apply a voice effect preset"""
         # Update current effect
         self.current_effect = preset
+        self.effect_var.set(preset)
         
         # Update UI
         for effect, button in self.effect_buttons.items():
@@ -1026,30 +5573,105 @@ class VoiceChangerApp(ctk.CTk):
                 button.deselect()
         
         # Set pitch based on preset
-        presets = {
-            "Normal": 1.0,
-            "Alien": 1.6,
-            "Robot": 0.9,
-            "Deep": 0.6,
-            "Chipmunk": 1.8,
-        }
-        self.pitch_shift.set(presets.get(preset, 1.0))
+        self.pitch_shift.set(PRESETS.get(preset, 1.0))
         
         # Update status
         self.update_status(f"Applied {preset} voice effect")
 
+    def apply_quality_mode(self):
+        """Switch the stages between the governor's tier and the manual settings"""
+        adaptive = self.adaptive_quality_var.get()
+        try:
+            self.engine.apply_quality_tier(self.engine.governor.tier if adaptive else None)
+        except Exception as e:
+            self.update_status(f"Error changing quality: {e}")
+            return
+        self.update_quality_label()
+
+    def _handle_quality_tier(self, tier):
+        """Apply a tier chosen by the governor"""
+        if not self.adaptive_quality_var.get():
+            return
+        previous = self.engine.quality_tier
+        try:
+            self.engine.apply_quality_tier(tier)
+        except Exception as e:
+            self.update_status(f"Error changing quality: {e}")
+            return
+        self.update_quality_label()
+        direction = "lowered" if previous is not None and tier < previous else "raised"
+        self.update_status(f"Processing quality {direction} to {QUALITY_TIERS[tier]['name']}")
+
+    def update_quality_label(self):
+        """Show the active quality tier in the status bar"""
+        tier = self.engine.quality_tier
+        text = "Quality: Manual" if tier is None else f"Quality: {QUALITY_TIERS[tier]['name']} (auto)"
+        if getattr(self, "quality_label", None) is not None:
+            self.quality_label.configure(text=text)
+
+    def processing_latency_ms(self):
+        """Latency added by the processing chain, in milliseconds"""
+        samplerate, blocksize = self.get_stream_settings()
+        return sum(self.engine.added_latency(samplerate, blocksize).values()) * 1000.0 / samplerate
+
+    def update_latency_label(self):
+        """Show the latency added on top of the device buffers"""
+        if getattr(self, "latency_label", None) is not None:
+            text = f"Added processing latency: {self.processing_latency_ms():.1f} ms"
+            _, blocksize = self.get_stream_settings()
+            device_latency = self.capabilities.device_latency(
+                self.get_device_fingerprint(self.input_device, True),
+                self.get_device_fingerprint(self.output_device, False),
+                "high" if blocksize > 512 else "low")
+            if device_latency is not None:
+                text += f", devices {device_latency * 1000:.1f} ms"
+            self.latency_label.configure(text=text)
+
+    def load_impulse_response(self):
+        """Load an impulse response WAV for the reverb"""
+        path = filedialog.askopenfilename(
+            filetypes=[("WAV", "*.wav")],
+            title="Load Impulse Response"
+        )
+
+        if path:
+            try:
+                self.engine.load_impulse_response(path)
+                name = os.path.basename(path)
+                self.ir_label.configure(text=name)
+                if self.reverb_mix.get() == 0.0:
+                    self.reverb_mix.set(0.3)
+                self.update_status(f"Impulse response loaded from {name}")
+            except Exception as e:
+                self.update_status(f"Error loading impulse response: {e}")
+
     def start_voice_changer(self):
         """Start the voice changer processing"""
         if not self.state_manager.running:
             # Validate devices before starting
-            input_idx = self.get_device_index(self.input_device, True)
+            use_file = self.input_source_var.get() == "File"
+            input_idx = None if use_file else self.get_device_index(self.input_device, True)
             output_idx = self.get_device_index(self.output_device, False)
             
-            if input_idx is None or output_idx is None:
+            if (input_idx is None and not use_file) or output_idx is None:
                 self.status_indicator.configure(fg_color=COLORS["error"])
                 self.status_label.configure(text="Status: Error")
                 self.update_status("Error: Invalid audio devices selected")
                 return
+
+            # Map the input file now so a bad file is reported before the stream opens
+            source = None
+            if use_file:
+                try:
+                    if not self.input_file:
+                        raise ValueError("choose an input WAV file first")
+                    source = FileSource(WavMap(self.input_file), self.get_stream_settings()[0],
+                                        loop=self.loop_file_var.get())
+                except Exception as e:
+                    self.status_indicator.configure(fg_color=COLORS["error"])
+                    self.status_label.configure(text="Status: Error")
+                    self.update_status(f"Error opening input file: {e}")
+                    return
                 
             # Update UI state before starting processing
             self.start_button.configure(state="disabled")
@@ -1058,16 +5680,31 @@ class VoiceChangerApp(ctk.CTk):
             # Update status indicator
             self.status_indicator.configure(fg_color=COLORS["success"])
             self.status_label.configure(text="Status: Running")
-            self.update_status("Voice changer started")
+            self.update_status(f"Voice changer started (processing latency {self.processing_latency_ms():.1f} ms)")
             
             # Set state after UI is updated but before thread starts
             self.state_manager.running = True
             
+            # Read stream settings on the main thread, Tk variables aren't thread-safe
+            samplerate, blocksize = self.get_stream_settings()
+            realtime = None
+            if self.realtime_var.get():
+                realtime = RealtimeMode(lock_memory=self.lock_memory_var.get())
+
             # Start audio processing thread and store reference
-            audio_thread = threading.Thread(target=self.audio_loop, daemon=True)
+            audio_thread = threading.Thread(target=self.audio_loop, args=(samplerate, blocksize, realtime, source),
+                                            daemon=True)
             self.state_manager.set_audio_thread(audio_thread)
             audio_thread.start()
 
+            # Open additional outputs; a failing one doesn't affect the rest
+            self.engine.samplerate, self.engine.blocksize = samplerate, blocksize
+            for sink in self.output_sinks:
+                self._start_sink(sink)
+
+            # A working configuration is worth keeping even if the app doesn't exit cleanly
+            self.save_session()
+
     def stop_voice_changer(self):
         """Stop the voice changer processing"""
         if self.state_manager.running:
@@ -1086,9 +5723,11 @@ class VoiceChangerApp(ctk.CTk):
                 
                 # Always clean up stream
                 try:
-                    sd.stop()
+                    self.backend.stop()
                 except Exception as stream_error:
                     print(f"Error stopping stream: {stream_error}")
+                for sink in self.output_sinks:
+                    sink.stop()
                 
                 # Update UI state after processing has stopped
                 self.start_button.configure(state="normal")
@@ -1108,13 +5747,72 @@ class VoiceChangerApp(ctk.CTk):
                 self.status_label.configure(text="Status: Error")
                 self.update_status(f"Error stopping voice changer: {e}")
 
+    def set_replay_length(self):
+        """Swap in a replay ring of the selected length (the audio thread picks it up on its next hop)"""
+        seconds = float(self.replay_seconds_var.get().split()[0])
+        if seconds != self.engine.replay.seconds:
+            replay = ReplayBuffer(seconds)
+            replay.prepare(self.engine.samplerate)
+            self.engine.replay = replay
+
+    def save_replay(self):
+        """Write the replay ring to a new WAV file in the background"""
+        if self.replay_saving:
+            return
+        replay = self.engine.replay
+        samples = replay.snapshot()
+        if not len(samples):
+            self.update_status("Nothing to replay yet, start processing first")
+            return
+        path = f"replay_{time.strftime('%Y%m%d_%H%M%S')}.wav"
+        samplerate = replay.samplerate
+
+        def run():
+            try:
+                with wave.open(path, "wb") as wav_file:
+                    wav_file.setnchannels(1)
+                    wav_file.setsampwidth(2)
+                    wav_file.setframerate(samplerate)
+                    wav_file.writeframes(samples.tobytes())
+            except Exception as e:
+                self.events.post("replay_saved", path, len(samples) / samplerate, str(e))
+            else:
+                self.events.post("replay_saved", path, len(samples) / samplerate, None)
+
+        self.replay_saving = True
+        self.save_replay_button.configure(state="disabled")
+        threading.Thread(target=run, name="replay-writer", daemon=True).start()
+
+    def _handle_replay_saved(self, path, seconds, error):
+        self.replay_saving = False
+        self.save_replay_button.configure(state="normal")
+        if error:
+            self.update_status(f"Error saving replay: {error}")
+            return
+        self.update_status(f"Saved the last {format_duration(seconds)} to {path}")
+        self.open_recording(path)
+
     def start_recording(self):
-        """Start recording the processed audio"""
+        """Start recording the processed audio to a new file"""
+        # Every take gets its own file, the browser may still have an earlier one mapped
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        path = f"recorded_voice_{stamp}.wav"
+        suffix = 1
+        while os.path.exists(path):
+            suffix += 1
+            path = f"recorded_voice_{stamp}_{suffix}.wav"
+        try:
+            wav_file = wave.open(path, 'wb')
+        except OSError as e:
+            self.update_status(f"Error starting recording: {e}")
+            return
+        self.recording_path = path
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        samplerate = self.engine.samplerate if self.state_manager.running else self.get_stream_settings()[0]
+        wav_file.setframerate(samplerate)
+        self.engine.begin_recording(wav_file, samplerate)
         self.state_manager.recording = True
-        self.wav_file = wave.open("recorded_voice.wav", 'wb')
-        self.wav_file.setnchannels(1)
-        self.wav_file.setsampwidth(2)
-        self.wav_file.setframerate(44100)
         
         # Update UI
         self.record_button.configure(state="disabled")
@@ -1128,9 +5826,9 @@ class VoiceChangerApp(ctk.CTk):
     def stop_recording(self):
         """Stop recording and save the audio file"""
         self.state_manager.recording = False
-        if self.wav_file:
-            self.wav_file.close()
-            self.wav_file = None
+        wav_file, self.engine.wav_file = self.engine.wav_file, None
+        if wav_file:
+            wav_file.close()
         
         # Update UI
         self.record_button.configure(state="normal")
@@ -1144,90 +5842,125 @@ class VoiceChangerApp(ctk.CTk):
             self.status_indicator.configure(fg_color=COLORS["text_secondary"])
             self.status_label.configure(text="Status: Idle")
         
-        self.update_status("Recording saved to recorded_voice.wav")
+        path = self.recording_path
+        if self.engine.silence_skipped:
+            self.update_status(f"Recording saved to {path} "
+                               f"({self.engine.silence_skipped / 1e6:.1f} MB of silence skipped)")
+        else:
+            self.update_status(f"Recording saved to {path}")
+        if path is not None:
+            self.open_recording(path)
 
-    def audio_loop(self):
-        """Main audio processing loop"""
+    def get_stream_settings(self):
+        """Return the selected (samplerate, blocksize), falling back to defaults"""
         samplerate = 44100
         blocksize = 1024
         
         # Get selected buffer size if specified
         try:
-            blocksize = int(self.buffer_selector.get())
-        except:
+            blocksize = int(self.buffer_size_var.get())
+        except ValueError:
             pass
             
         # Get selected sample rate if specified
         try:
-            sample_text = self.sample_selector.get().split()[0]
+            sample_text = self.sample_rate_var.get().split()[0]
             samplerate = int(sample_text)
-        except:
+        except (ValueError, IndexError):
             pass
-            
-        try:
-            # Set up stream with proper error handling
-            with sd.Stream(device=(self.get_device_index(self.input_device, True),
-                               self.get_device_index(self.output_device, False)),
-                           channels=1,
-                           dtype='float32',
-                           callback=self.audio_callback,
-                           samplerate=samplerate,
-                           blocksize=blocksize,
-                           latency='high' if blocksize > 512 else 'low'):  # Set latency based on buffer size
-                while self.state_manager.running:
-                    sd.sleep(100)
-        except Exception as e:
-            # Ensure error handling runs on main thread to avoid thread safety issues
-            self.after(0, lambda: self.handle_audio_error(e))
-    def audio_callback(self, indata, outdata, frames, time, status):
-        """Process audio data in real-time with improved reliability"""
-        if status:
-            print(f'Audio callback status: {status}')
-            # Handle xrun errors gracefully
-            if isinstance(status, sd.CallbackAbort):
-                self.after(0, self._handle_stream_abort)
-                outdata[:] = np.zeros_like(indata)
-                return
-            
-        # Get the running state in a thread-safe way
-        is_running = self.state_manager.running
-        if not is_running:
-            outdata[:] = np.zeros_like(indata)
-            return
 
+        return samplerate, blocksize
+
+    def audio_loop(self, samplerate=44100, blocksize=1024, realtime=None, source=None):
+        """Main audio processing loop (source: a FileSource standing in for the input device)"""
+        self.engine.prepare(samplerate, blocksize)
+        recorder = None
+        started = time.perf_counter()
         try:
-            # Get current settings (these are tkinter vars which are thread-safe)
-            pitch = self.pitch_shift.get()
-            vol = self.volume.get()
-            audio = indata[:, 0].copy()  # Make a copy to prevent buffer issues
-            
-            # Clip input to prevent overflow
-            audio = np.clip(audio, -1.0, 1.0)
-            
-            # Update visualizations on main thread
-            self.after(0, self._update_visualizations, audio.copy())
-            
-            # Process audio
-            shifted_audio = self._process_audio(audio, pitch)
-            output_audio = np.clip(shifted_audio * vol, -1.0, 1.0)
+            if realtime is not None:
+                realtime.enter_stream()
+                self.engine.callback_done = threading.Event()
+                self.engine.realtime = realtime
 
-            # Output audio if monitoring is enabled (monitor is a tkinter var, thread-safe)
-            if self.monitor.get():
-                outdata[:, 0] = output_audio
+            # Capture every callback when started with --capture-trace
+            if self.trace_path:
+                recorder = TraceRecorder(self.trace_path, samplerate, blocksize)
+                self.engine.trace_recorder = recorder
+
+            # Set up stream with proper error handling
+            latency = 'high' if blocksize > 512 else 'low'  # Set latency based on buffer size
+            if source is None:
+                stream = self.backend.stream(device=(self.get_device_index(self.input_device, True),
+                                                     self.get_device_index(self.output_device, False)),
+                                             channels=1,
+                                             dtype='float32',
+                                             callback=self.engine.audio_callback,
+                                             samplerate=samplerate,
+                                             blocksize=blocksize,
+                                             latency=latency)
             else:
-                outdata[:, 0] = np.zeros_like(audio)
-                
-            # Handle recording
-            self._handle_recording(output_audio)
+                # Same callback path as the microphone, the file just fills indata
+                remaining = [None]  # Frames left to play once the file has ended
+
+                def file_callback(outdata, frames, time_info, status):
+                    self.engine.audio_callback(source.block(frames), outdata, frames, time_info, status)
+                    if not source.finished or remaining[0] == 0:
+                        return
+                    if remaining[0] is None:
+                        # Play out the hop FIFO, the limiter look-ahead and the reverb tail first
+                        remaining[0] = self.engine.tail_samples()
+                    remaining[0] = max(0, remaining[0] - frames)
+                    if remaining[0] == 0:
+                        self.events.post("source_finished")
 
+                stream = self.backend.output_stream(device=self.get_device_index(self.output_device, False),
+                                                    channels=1,
+                                                    dtype='float32',
+                                                    callback=file_callback,
+                                                    samplerate=samplerate,
+                                                    blocksize=blocksize,
+                                                    latency=latency)
+            with stream:
+                while self.state_manager.running:
+                    if realtime is None:
+                        self.backend.sleep(100)
+                    elif self.engine.callback_done.wait(0.1):
+                        # A callback just returned, collect before the next one is due
+                        self.engine.callback_done.clear()
+                        realtime.safe_point()
         except Exception as e:
-            print(f"Callback error: {e}")
-            outdata[:] = np.zeros_like(indata)
-            # Schedule UI update and cleanup on main thread
-            self.after(0, self._handle_callback_error, str(e))
-            
+            # Ensure error handling runs on main thread to avoid thread safety issues
+            self.events.post("stream_error", e)
+        finally:
+            if realtime is not None:
+                self.engine.realtime = None
+                self.engine.callback_done = None
+                realtime.exit_stream()
+            minutes = (time.perf_counter() - started) / 60
+            if minutes > 0:
+                print(f"Stream stopped: {self.engine.xruns} xruns ({self.engine.xruns / minutes:.1f}/min)")
+            self.engine.trace_recorder = None
+            if source is not None:
+                source.wav_map.close()
+            if recorder is not None:
+                recorder.close()
+                print(f"Trace saved to {recorder.path} ({recorder.blocks} blocks)")
     def _update_visualizations(self, audio):
         """Update visualizations on main thread"""
+        self.visualize_handled.inc()
+        with TIMELINE.span("_update_visualizations"):
+            self._apply_visualizations(audio)
+
+    def _apply_visualizations(self, audio):
+        # Show the tracked input pitch
+        detected = self.engine.detected_pitch
+        if detected > 0.0:
+            text = f"Detected: {detected:.1f} Hz ({note_name(freq_to_midi(detected))})"
+        else:
+            text = "Detected: --"
+        if self.detected_pitch_label.cget("text") != text:
+            self.detected_pitch_label.configure(text=text)
+
         # Store audio data for visualization
         self.audio_data = audio
         
@@ -1236,38 +5969,23 @@ class VoiceChangerApp(ctk.CTk):
         self.vu_meter.set_level(min(level, 1.0))
         
         # Update waveform
-        self.visualizer.update_data(audio)
+        if self.visualizer is not None:
+            self.visualizer.refresh()
 
-    def _process_audio(self, audio, pitch):
-        """Process audio with pitch shifting"""
-        if pitch != 1.0:
-            indices = np.linspace(0, len(audio)-1, int(len(audio)/pitch))
-            shifted_audio = np.interp(indices, np.arange(len(audio)), audio)
-            
-            # Apply smoothing to reduce artifacts
-            if len(shifted_audio) < len(audio):
-                shifted_audio = np.pad(shifted_audio, (0, len(audio) - len(shifted_audio)), mode='linear_ramp')
-            elif len(shifted_audio) > len(audio):
-                shifted_audio = shifted_audio[:len(audio)]
-            return shifted_audio
-        return audio
+    def refresh_device_list(self, devices=None):
+        """Query the device and host API lists once for every lookup until the next refresh
 
-    def _handle_recording(self, audio):
-        """Handle recording of processed audio"""
-        # Check recording state in thread-safe way
-        is_recording = self.state_manager.recording
-        if is_recording and self.wav_file:
-            try:
-                data_to_write = (audio * 32767).astype(np.int16).tobytes()
-                self.wav_file.writeframes(data_to_write)
-            except Exception as e:
-                print(f"Recording error: {e}")
-                self.after(0, self.stop_recording)  # Safely stop recording on error
+        devices is passed in when the caller has just queried it anyway.
+        """
+        self.device_list = self.backend.query_devices() if devices is None else devices
+        self.hostapi_list = self.backend.query_hostapis()
 
-    def set_default_devices(self):
+    def set_default_devices(self, devices=None):
         """Set default audio devices with improved error handling and hot-swap support"""
         try:
-            devices = sd.query_devices()
+            with TIMELINE.span("set_default_devices"):
+                self.refresh_device_list(devices)
+            devices = self.device_list
             input_devices = [d for d in devices if d['max_input_channels'] > 0]
             output_devices = [d for d in devices if d['max_output_channels'] > 0]
 
@@ -1293,16 +6011,19 @@ class VoiceChangerApp(ctk.CTk):
                 self.output_device = self.output_devices[0]
 
             # Update UI if it exists
-            if hasattr(self, 'input_selector') and self.input_selector is not None:
+            if getattr(self, 'input_selector', None) is not None:
                 self.input_selector.configure(values=self.input_devices)
                 self.input_selector.set(self.input_device)
-            if hasattr(self, 'output_selector') and self.output_selector is not None:
+            if getattr(self, 'output_selector', None) is not None:
                 self.output_selector.configure(values=self.output_devices)
                 self.output_selector.set(self.output_device)
+            for menu in getattr(self, 'sink_menus', []):
+                menu.configure(values=self.output_devices)
 
         except Exception as e:
             print(f"Error setting up audio devices: {e}")
             # Set placeholders to prevent UI errors
+            self.device_list, self.hostapi_list = [], ()
             self.input_devices = ["No devices found"]
             self.output_devices = ["No devices found"]
             self.input_device = self.input_devices[0]
@@ -1311,10 +6032,117 @@ class VoiceChangerApp(ctk.CTk):
             if hasattr(self, 'update_status'):
                 self.update_status(f"Audio device error: {e}")
 
+    def restore_session(self):
+        """Apply the saved session, returning True if its devices passed validation
+
+        Devices are matched by fingerprint against the list set_default_devices
+        already queried (see refresh_device_list), then checked with
+        PortAudio's settings check, which doesn't open a stream, so this stays
+        cheap enough to run on every launch.
+        """
+        session = load_session()
+        if not session:
+            return False
+
+        for name, value in session.get("settings", {}).items():
+            var = self.session_vars.get(name)
+            if var is None:
+                continue
+            try:
+                var.set(value)
+            except (TclError, ValueError):
+                print(f"Ignoring saved setting {name}={value!r}")
+        self.current_effect = self.effect_var.get()
+        ctk.set_appearance_mode(self.theme_var.get())
+        input_file = session.get("input_file")
+        if input_file and os.path.exists(input_file):
+            self.input_file = input_file
+        elif self.input_source_var.get() == "File":
+            self.input_source_var.set("Microphone")
+
+        try:
+            devices, hostapis = self.device_list, self.hostapi_list
+            input_idx = match_fingerprint(session.get("input_device"), devices, hostapis, True)
+            output_idx = match_fingerprint(session.get("output_device"), devices, hostapis, False)
+            if (input_idx is None or output_idx is None
+                    or devices[input_idx]["name"] not in self.input_devices
+                    or devices[output_idx]["name"] not in self.output_devices):
+                print("Saved audio devices are not available, using defaults")
+                return False
+            self.input_device = devices[input_idx]["name"]
+            self.output_device = devices[output_idx]["name"]
+
+            samplerate, _ = self.get_stream_settings()
+            self.backend.check_input_settings(device=input_idx, channels=1, dtype='float32', samplerate=samplerate)
+            self.backend.check_output_settings(device=output_idx, channels=1, dtype='float32', samplerate=samplerate)
+        except Exception as e:
+            print(f"Saved session could not be validated: {e}")
+            return False
+        return True
+
+    def save_session(self):
+        """Persist devices and settings for the next launch"""
+        if self.backend.virtual:
+            return  # Simulated devices would overwrite the real ones saved last time
+        session = {"settings": {name: var.get() for name, var in self.session_vars.items()},
+                   "input_file": self.input_file}
+        try:
+            for key, name, is_input in (("input_device", self.input_device, True),
+                                        ("output_device", self.output_device, False)):
+                fingerprint = self.get_device_fingerprint(name, is_input)
+                if fingerprint is not None:
+                    session[key] = fingerprint
+            save_session(session)
+        except Exception as e:
+            print(f"Error saving session: {e}")
+
+    def get_device_fingerprint(self, name, is_input=True):
+        """Fingerprint of the named device, None if it isn't connected"""
+        index = self.get_device_index(name, is_input)
+        if index is None:
+            return None
+        try:
+            return device_fingerprint(self.device_list[index], self.hostapi_list)
+        except Exception as e:
+            print(f"Error reading device info: {e}")
+            return None
+
+    def probe_devices(self):
+        """Probe capabilities of devices the cache doesn't know yet, in the background"""
+        self.capabilities.probe_missing(self.device_list, self.hostapi_list,
+                                        lambda: self.events.post("capabilities"))
+
+    def stream_rate_options(self):
+        """Sample rates valid for the selected device pair (all of them if none are)"""
+        return self.capabilities.stream_rates(
+            self.get_device_fingerprint(self.input_device, True),
+            self.get_device_fingerprint(self.output_device, False)) or list(SAMPLE_RATES)
+
+    def update_stream_options(self):
+        """Offer only the sample rates the selected devices support"""
+        input_fingerprint = self.get_device_fingerprint(self.input_device, True)
+        output_fingerprint = self.get_device_fingerprint(self.output_device, False)
+        rates = self.capabilities.stream_rates(input_fingerprint, output_fingerprint)
+        if not rates:
+            self.update_status("The selected devices share no supported sample rate")
+            return
+        if getattr(self, "sample_selector", None) is not None:
+            self.sample_selector.configure(values=[f"{rate} Hz" for rate in rates])
+
+        samplerate, _ = self.get_stream_settings()
+        if samplerate not in rates:
+            fallback = next((rate for rate in (48000, 44100) if rate in rates), rates[0])
+            self.sample_rate_var.set(f"{fallback} Hz")
+            self.update_status(f"{samplerate} Hz isn't supported by the selected devices, using {fallback} Hz")
+        for fingerprint, side in ((input_fingerprint, "input"), (output_fingerprint, "output")):
+            if not self.capabilities.supports_mono(fingerprint, side):
+                self.update_status(f"Warning: the {side} device doesn't accept a mono stream")
+        self.update_latency_label()
+
     def get_device_index(self, name, is_input=True):
-        """Get the index of an audio device by name"""
+        """Get the index of an audio device by name, in the device list as last queried"""
         try:
-            for i, d in enumerate(sd.query_devices()):
+            for i, d in enumerate(self.device_list):
                 if d['name'] == name and ((is_input and d['max_input_channels'] > 0) or
                                         (not is_input and d['max_output_channels'] > 0)):
                     return i
@@ -1385,18 +6213,18 @@ class VoiceChangerApp(ctk.CTk):
             # Stop recording if active
             if self.state_manager.recording:
                 self.stop_recording()
-            elif self.wav_file:
+            elif self.engine.wav_file:
                 try:
-                    self.wav_file.close()
-                    self.wav_file = None
+                    wav_file, self.engine.wav_file = self.engine.wav_file, None
+                    wav_file.close()
                     print("Closed WAV file")
                 except Exception as e:
                     print(f"Error closing WAV file: {e}")
             
             # Ensure sounddevice is properly stopped
             try:
-                sd.stop()
-                sd.sleep(100)  # Give time for cleanup
+                self.backend.stop()
+                self.backend.sleep(100)  # Give time for cleanup
             except Exception as e:
                 print(f"Error stopping sounddevice: {e}")
                 
@@ -1410,20 +6238,27 @@ class VoiceChangerApp(ctk.CTk):
     def on_closing(self):
         """Handle window closing event"""
         print("Cleaning up resources...")
+        self.save_session()
         self.cleanup_audio()
+        self.close_recording()
+        self.stop_preview()
         self.quit()
 
     def monitor_devices(self):
         """Monitor for device changes and update accordingly"""
         try:
-            devices = sd.query_devices()
+            with TIMELINE.span("monitor_devices"):
+                devices = self.backend.query_devices()
             current_inputs = [d['name'] for d in devices if d['max_input_channels'] > 0]
             current_outputs = [d['name'] for d in devices if d['max_output_channels'] > 0]
             
             # Check for changes
             if set(current_inputs) != set(self.input_devices) or set(current_outputs) != set(self.output_devices):
                 print("Device configuration changed, updating device list...")
-                self.set_default_devices()
+                self.device_changes.inc()
+                self.set_default_devices(devices)
+                self.update_stream_options()
+                self.probe_devices()
                 
         except Exception as e:
             print(f"Device monitoring error: {e}")
@@ -1433,12 +6268,19 @@ class VoiceChangerApp(ctk.CTk):
 
     def handle_audio_error(self, error):
         """Handle audio stream errors on the main thread"""
+        if self.awaiting_first_audio:
+            # The auto-started stream failed, nothing left to wait for before probing
+            self.awaiting_first_audio = False
+            self.probe_devices()
         self.status_label.configure(text=f"Stream error: {error}")
         self.update_status(f"Audio stream error: {error}")
         print("Audio stream error:", error)
+        self.stream_restarts.inc(label_value="stream_error")
         
         # Reset UI and state
         self.state_manager.running = False
+        for sink in self.output_sinks:
+            sink.stop()
         self.start_button.configure(state="normal")
         self.stop_button.configure(state="disabled")
         self.status_indicator.configure(fg_color=COLORS["error"])
@@ -1446,19 +6288,519 @@ class VoiceChangerApp(ctk.CTk):
     def _handle_stream_abort(self):
         """Handle stream abort errors"""
         print("Audio stream aborted")
+        self.stream_restarts.inc(label_value="abort")
         self.stop_voice_changer()  # This will handle cleanup and UI updates
         self.update_status("Audio stream aborted - try changing buffer size or sample rate")
 
     def _handle_callback_error(self, error_msg):
         """Handle audio callback errors"""
         print(f"Audio callback error: {error_msg}")
+        self.stream_restarts.inc(label_value="callback_error")
         self.stop_voice_changer()  # This will handle cleanup and UI updates
         self.update_status(f"Audio processing error: {error_msg}")
 
+    def _show_realtime_report(self, results):
+        """Show which real-time measures took effect"""
+        summary = ", ".join(f"{name}: {result}" for name, result in results.items())
+        print(f"Real-time mode: {summary}")
+        self.update_status(f"Real-time mode - {summary}")
+
+    def _handle_recording_error(self, error_msg):
+        """Handle recording errors raised in the audio thread"""
+        self.stop_recording()
+        self.update_status(f"Recording error: {error_msg}")
+
+
+def time_blocks(process, blocks):
+    """Call process(block) for every block, returning the per-block times in seconds"""
+    times = np.empty(len(blocks))
+    for i, block in enumerate(blocks):
+        started = time.perf_counter()
+        process(block)
+        times[i] = time.perf_counter() - started
+    return times
+
+
+def report_benchmark(name, times, frames, samplerate):
+    """Print per-block cost against the real-time budget of one block"""
+    budget = frames / samplerate
+    mean, p99 = float(np.mean(times)), float(np.percentile(times, 99))
+    print(f"{name}: {frames} frames @ {samplerate} Hz, mean {mean * 1e6:.0f} us, "
+          f"p99 {p99 * 1e6:.0f} us, budget {budget * 1e6:.0f} us ({p99 / budget * 100:.1f}% at p99)")
+    return {"mean": mean, "p99": p99, "budget": budget}
+
+
+def synthetic_voice(samplerate, seconds, f0=160.0, seed=0):
+    """Synthetic voiced signal (gliding harmonics plus a little noise)"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(samplerate * seconds)) / samplerate
+    phase = 2 * np.pi * np.cumsum(f0 * (1 + 0.1 * np.sin(2 * np.pi * 0.5 * t))) / samplerate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    return (0.3 * voice / np.max(np.abs(voice)) + 0.005 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def benchmark_pitch(samplerate=48000, frames=512):
+    detector = PitchDetector()
+    detector.prepare(samplerate)
+    audio = synthetic_voice(samplerate, 5.0)
+    blocks = [audio[i:i + frames].astype(np.float64) for i in range(0, len(audio) - frames, frames)]
+    return report_benchmark("pitch detection", time_blocks(detector.process, blocks), frames, samplerate)
+
+
+def benchmark_vocoder(samplerate=48000, frames=256):
+    audio = synthetic_voice(samplerate, 5.0).astype(np.float64)
+    blocks = [audio[i:i + frames] for i in range(0, len(audio) - frames, frames)]
+    results = {}
+    for bands in ChannelVocoder.QUALITY_BANDS:
+        vocoder = ChannelVocoder(bands=bands)
+        vocoder.prepare(samplerate)
+        results[bands] = report_benchmark(f"vocoder ({bands} bands)", time_blocks(vocoder.process, blocks),
+                                          frames, samplerate)
+    return results
+
+
+def benchmark_reverb(samplerate=48000, frames=256, ir_seconds=3.0):
+    rng = np.random.default_rng(0)
+    length = int(samplerate * ir_seconds)
+    ir = rng.standard_normal(length) * np.exp(-6.9 * np.arange(length) / length)
+    audio = synthetic_voice(samplerate, 5.0).astype(np.float64)
+    blocks = [audio[i:i + frames] for i in range(0, len(audio) - frames, frames)]
+
+    convolver = PartitionedConvolver(ir, frames)
+    results = {"partitioned": report_benchmark(
+        f"partitioned convolution ({ir_seconds:.0f} s IR)", time_blocks(convolver.process, blocks),
+        frames, samplerate)}
+
+    # Direct convolution of each block with overlap-add of the tail
+    tail = np.zeros(length + frames - 1)
+
+    def direct(block):
+        tail[:-frames] = tail[frames:]
+        tail[-frames:] = 0.0
+        tail[:length + frames - 1] += np.convolve(block, ir)
+        return tail[:frames]
+
+    results["direct"] = report_benchmark(
+        f"direct convolution ({ir_seconds:.0f} s IR)", time_blocks(direct, blocks[:50]), frames, samplerate)
+    return results
+
+
+def benchmark_limiter(samplerate=96000, frames=256):
+    limiter = LookaheadLimiter()
+    limiter.prepare(samplerate)
+    audio = 4.0 * synthetic_voice(samplerate, 5.0).astype(np.float64)
+    blocks = [audio[i:i + frames] for i in range(0, len(audio) - frames, frames)]
+    return report_benchmark(f"limiter ({limiter.lookahead_ms:.0f} ms look-ahead)",
+                            time_blocks(limiter.process, blocks), frames, samplerate)
+
+
+def benchmark_noise(samplerate=48000, frames=256):
+    suppressor = NoiseSuppressor()
+    suppressor.prepare(samplerate, frames)
+    rng = np.random.default_rng(0)
+    audio = synthetic_voice(samplerate, 5.0) + 0.01 * rng.standard_normal(samplerate * 5)
+    blocks = [audio[i:i + frames] for i in range(0, len(audio) - frames, frames)]
+    return report_benchmark(f"noise suppression ({suppressor.reduction_db:.0f} dB)",
+                            time_blocks(lambda block: suppressor.process(block, learn=True), blocks),
+                            frames, samplerate)
+
+
+def benchmark_virtual(samplerate=48000, blocksize=256, seconds=10.0, frames=(256, 192, 320)):
+    """End-to-end latency and throughput of the engine on a virtual-clock stream
+
+    The host hands out variable frame counts and a few injected xruns. An
+    impulse every half second on the input has to come out exactly
+    added_latency() samples later. Every number except the throughput is
+    identical from run to run.
+    """
+    period = samplerate // 2
+    impulses = np.zeros(period, dtype=np.float32)
+    impulses[0] = 0.5
+    outputs = []
+    backend = VirtualClockBackend(frames=frames, speed=None, source=looping_source(lambda rate: impulses),
+                                  sink=lambda outdata: outputs.append(outdata[:, 0].copy()))
+    engine = AudioEngine(StateManager())
+    engine.state_manager.running = True
+    engine.prepare(samplerate, blocksize)
+    for status in ("input_overflow", "output_underflow", "input_overflow"):
+        backend.inject(status)
+
+    callbacks = int(seconds * samplerate / np.mean(frames))
+    stream = backend.stream(device=(0, 1), channels=1, dtype='float32', callback=engine.audio_callback,
+                            samplerate=samplerate, blocksize=blocksize)
+    with stream:
+        started = time.perf_counter()
+        stream.advance(callbacks)
+        elapsed = time.perf_counter() - started
+
+    output = np.concatenate(outputs)
+    expected = sum(engine.added_latency().values())
+    measured = [int(np.argmax(np.abs(output[start:start + period]))) for start in range(0, len(output) - period, period)]
+    print(f"virtual stream: {callbacks} callbacks of {'/'.join(map(str, frames))} frames @ {samplerate} Hz, "
+          f"{stream.time / elapsed:.0f}x real time, {engine.xruns} xruns injected and counted")
+    print(f"  latency {sorted(set(measured))} samples measured, {expected} expected from added_latency()")
+    return {"speed": stream.time / elapsed, "latency": measured, "expected": expected, "xruns": engine.xruns}
+
+
+def benchmark_preview(samplerate=48000, seconds=PREVIEW_SECONDS, ir_seconds=2.0):
+    rng = np.random.default_rng(0)
+    length = int(samplerate * ir_seconds)
+    reverb = ConvolutionReverb()
+    reverb.ir = rng.standard_normal(length) * np.exp(-6.9 * np.arange(length) / length)
+    reverb.ir_rate = samplerate
+    params = dict(AudioEngine(StateManager()).params, reverb_mix=0.3)
+    clip = synthetic_voice(samplerate, seconds)
+
+    # The whole take is one "block", so the budget is the take's duration
+    def render(audio):
+        render_presets(audio, samplerate, params, reverb)
+
+    render(clip)  # Warm up the scipy imports and FFT plans
+    return report_benchmark(f"preset preview ({len(PRESETS)} presets, {ir_seconds:.0f} s IR)",
+                            time_blocks(render, [clip] * 5), len(clip), samplerate)
+
+
+BENCHMARKS = {
+    "pitch": benchmark_pitch,
+    "vocoder": benchmark_vocoder,
+    "reverb": benchmark_reverb,
+    "limiter": benchmark_limiter,
+    "noise": benchmark_noise,
+    "virtual": benchmark_virtual,
+    "preview": benchmark_preview,
+}
+
+
+def run_benchmarks(name):
+    """Run one benchmark by name, or all of them"""
+    names = list(BENCHMARKS) if name == "all" else [name]
+    for benchmark_name in names:
+        BENCHMARKS[benchmark_name]()
+    return 0
+
+
+SOAK_LIMITS = {
+    "rss_mb": 64.0,        # RSS growth between the first and last sample
+    "p99_drift": 1.5,      # last window's callback p99 over the first window's
+    "backlog": 100,        # events pending on the bus (or Tk after callbacks) at the end
+}
+
+
+class SimulatedStream:
+    """Drives AudioEngine.audio_callback from a thread at the stream's real-time pace
+
+    speed scales the pace (2.0 runs twice as fast as real time, 0 as fast
+    as possible). Callback durations are kept per sampling window.
+    """
+
+    def __init__(self, engine, samplerate, blocksize, speed=1.0):
+        self.engine = engine
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.speed = speed
+        self.source = synthetic_voice(samplerate, 10.0).reshape(-1, 1)
+        self.times = []
+        self.blocks = 0
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="simulated-stream", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+
+    def take_times(self):
+        """Callback durations since the previous call"""
+        times, self.times = self.times, []
+        return times
+
+    def _run(self):
+        blocksize = self.blocksize
+        period = blocksize / self.samplerate / self.speed if self.speed > 0 else 0.0
+        outdata = np.zeros((blocksize, 1), dtype=np.float32)
+        status = CallbackFlags()
+        position = 0
+        deadline = time.perf_counter()
+        while not self.stopped.is_set():
+            if position + blocksize > len(self.source):
+                position = 0
+            indata = self.source[position:position + blocksize]
+            position += blocksize
+
+            now = time.perf_counter()
+            started = now
+            self.engine.audio_callback(indata, outdata, blocksize, CallbackTime(now, now, now), status)
+            self.times.append(time.perf_counter() - started)
+            self.blocks += 1
+
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -0.5:
+                deadline = time.perf_counter()  # fell far behind, don't try to catch up
+
+
+def current_rss():
+    """Resident set size in bytes (peak RSS where /proc isn't available)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return 0
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def soak_sample(elapsed, stream, backlog, baseline, top):
+    """One soak measurement: RSS, callback p99, backlog and top allocation growth"""
+    times = stream.take_times()
+    sample = {
+        "elapsed": round(elapsed, 1),
+        "blocks": stream.blocks,
+        "rss_mb": current_rss() / (1024 * 1024),
+        "p99_ms": float(np.percentile(times, 99)) * 1000 if times else 0.0,
+        "backlog": backlog,
+        "growth": [],
+    }
+    if baseline is not None:
+        stats = tracemalloc.take_snapshot().compare_to(baseline, "lineno")
+        sample["growth"] = [str(stat) for stat in stats[:top] if stat.size_diff > 0]
+    return sample
+
+
+def evaluate_soak(samples, limits):
+    """Failure messages for growth or drift beyond limits (empty list = pass)"""
+    if len(samples) < 2:
+        return ["Soak too short, need at least two samples"]
+    first, last = samples[0], samples[-1]
+    failures = []
+    rss_growth = last["rss_mb"] - first["rss_mb"]
+    if rss_growth > limits["rss_mb"]:
+        failures.append(f"RSS grew {rss_growth:.1f} MB (limit {limits['rss_mb']:.0f} MB)")
+    if first["p99_ms"] > 0 and last["p99_ms"] / first["p99_ms"] > limits["p99_drift"]:
+        failures.append(f"Callback p99 drifted {first['p99_ms']:.2f} -> {last['p99_ms']:.2f} ms "
+                        f"(limit {limits['p99_drift']}x)")
+    if last["backlog"] > limits["backlog"]:
+        failures.append(f"{last['backlog']} events still pending (limit {limits['backlog']})")
+    return failures
+
+
+def configure_soak_engine(engine, samplerate, blocksize, wav_path):
+    """Put an engine in its most expensive configuration, recording to wav_path"""
+    for name, value in (("effect", "Robot"), ("vocoder_bands", max(ChannelVocoder.QUALITY_BANDS)),
+                        ("correction_mode", "Scale"), ("reverb_mix", 0.3),
+                        ("limiter", True), ("limiter_lookahead_ms", 5.0), ("noise_suppression", True)):
+        engine.set_param(name, value)
+    rng = np.random.default_rng(0)
+    length = samplerate * 2
+    ir = rng.standard_normal(length) * np.exp(-6.9 * np.arange(length) / length)
+    engine.reverb.ir, engine.reverb.ir_rate = ir / np.sqrt(np.sum(ir * ir)), samplerate
+    engine.prepare(samplerate, blocksize)
+
+    wav_file = wave.open(wav_path, "wb")
+    wav_file.setnchannels(1)
+    wav_file.setsampwidth(2)
+    wav_file.setframerate(samplerate)
+    engine.wav_file = wav_file
+    engine.state_manager.running = True
+    engine.state_manager.recording = True
+
+
+def run_soak(seconds, with_app=False, speed=1.0, interval=10.0, limits=None, top=10,
+             samplerate=96000, blocksize=256, report_path=None):
+    """Run the engine (or the whole app) against a simulated stream and check for drift
+
+    Samples are taken every interval seconds of wall time. The first one,
+    taken after one interval so startup allocations settle, is the baseline
+    the rest are compared against; top > 0 also traces allocations and
+    lists the top growing sites per sample. Returns an exit code.
+    """
+    limits = dict(SOAK_LIMITS, **(limits or {}))
+    samples = []
+    errors = []
+    temp_dir = tempfile.mkdtemp(prefix="vchanger-soak-")
+    wav_path = os.path.join(temp_dir, "soak.wav")
+    print(f"Soaking for {seconds:.0f} s at {samplerate} Hz / {blocksize} frames "
+          f"({'full app' if with_app else 'engine only'}, recording on)")
+
+    error_events = ("callback_error", "recording_error", "stream_abort")
+    if with_app:
+        # Simulated devices, so a saved session can't auto-start real ones
+        app = VoiceChangerApp(backend=VirtualClockBackend())
+        engine = app.engine
+
+        def watch(event, handler):
+            def on_error(*args):
+                errors.append((event, args))
+                handler(*args)
+            return on_error
+
+        for event in error_events:
+            app.events.handlers[event] = watch(event, app.events.handlers[event])
+    else:
+        def post(event, *args):
+            if event in error_events:
+                errors.append((event, args))
+
+        engine = AudioEngine(StateManager(), post=post)
+    configure_soak_engine(engine, samplerate, blocksize, wav_path)
+    stream = SimulatedStream(engine, samplerate, blocksize, speed)
+
+    baseline = [None]
+
+    def record_sample(elapsed, backlog):
+        sample = soak_sample(elapsed, stream, backlog, baseline[0], top)
+        if top and baseline[0] is None:
+            baseline[0] = tracemalloc.take_snapshot()
+        samples.append(sample)
+        print(f"  {sample['elapsed']:8.0f} s  {sample['blocks']:9d} blocks  RSS {sample['rss_mb']:7.1f} MB  "
+              f"p99 {sample['p99_ms']:6.2f} ms  backlog {sample['backlog']}")
+        for line in sample["growth"]:
+            print(f"      {line}")
+
+    # Setup allocations are not what we're looking for
+    if top:
+        tracemalloc.start()
+    started = time.perf_counter()
+    stream.start()
+    if with_app:
+        def tick():
+            elapsed = time.perf_counter() - started
+            pending = len(app.tk.splitlist(app.tk.call("after", "info")))
+            record_sample(elapsed, max(app.events.pending(), pending))
+            if elapsed >= seconds:
+                app.quit()
+            else:
+                app.after(int(interval * 1000), tick)
+
+        app.after(int(interval * 1000), tick)
+        app.mainloop()
+    else:
+        while True:
+            time.sleep(interval)
+            elapsed = time.perf_counter() - started
+            record_sample(elapsed, 0)
+            if elapsed >= seconds:
+                break
+
+    stream.stop()
+    tracemalloc.stop()
+    engine.state_manager.running = False
+    engine.state_manager.recording = False
+    wav_file, engine.wav_file = engine.wav_file, None
+    wav_file.close()
+    recorded = os.path.getsize(wav_path)
+    os.remove(wav_path)
+    os.rmdir(temp_dir)
+    if with_app:
+        app.destroy()
+
+    failures = evaluate_soak(samples, limits)
+    failures += [f"{event}: {args[0] if args else ''}" for event, args in errors[:5]]
+    print(f"Recorded {recorded / (1024 * 1024):.1f} MB in {stream.blocks} blocks "
+          f"({stream.blocks * blocksize / samplerate:.0f} s of audio)")
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump({"limits": limits, "samples": samples, "failures": failures}, f, indent=2)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("Soak passed")
+    return 1 if failures else 0
+
+
+def parse_soak_limit(text):
+    """Parse NAME=VALUE for --soak-limit"""
+    name, _, value = text.partition("=")
+    if name not in SOAK_LIMITS or not value:
+        raise argparse.ArgumentTypeError(f"expected one of {', '.join(SOAK_LIMITS)} as NAME=VALUE")
+    return name, float(value)
+
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="VChanger - Simple Real-Time VoiceChanger")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print startup timings once the window is usable")
+    parser.add_argument("--timeline", action="store_true",
+                        help="record the span timeline from launch (export it from Settings)")
+    parser.add_argument("--benchmark", metavar="NAME", choices=["all"] + list(BENCHMARKS),
+                        help="time a processing stage against its real-time budget and exit")
+    parser.add_argument("--audio-backend", metavar="NAME", default="sounddevice",
+                        help="sounddevice (default), null, virtual or file:PATH to run without audio hardware")
+    parser.add_argument("--capture-trace", metavar="PATH",
+                        help="record every audio callback to a binary trace while streaming")
+    parser.add_argument("--replay-trace", metavar="PATH",
+                        help="replay a captured trace headless and compare against its golden output")
+    parser.add_argument("--golden", metavar="PATH",
+                        help="compare a replay against this trace's output instead of the captured one")
+    parser.add_argument("--write-golden", metavar="PATH",
+                        help="save the replayed output as a new golden trace")
+    parser.add_argument("--soak", metavar="SECONDS", type=float,
+                        help="run a simulated 96 kHz / 256 frame stream with recording on and check for drift")
+    parser.add_argument("--soak-app", action="store_true",
+                        help="soak the whole app (Tk loop and visualizers), not just the engine")
+    parser.add_argument("--soak-speed", metavar="FACTOR", type=float, default=1.0,
+                        help="pace of the simulated stream relative to real time (0 = unpaced)")
+    parser.add_argument("--soak-interval", metavar="SECONDS", type=float, default=10.0,
+                        help="seconds between soak samples")
+    parser.add_argument("--soak-limit", metavar="NAME=VALUE", type=parse_soak_limit, action="append", default=[],
+                        help="override a soak threshold (rss_mb, p99_drift, backlog)")
+    parser.add_argument("--soak-top", metavar="N", type=int, default=10,
+                        help="list the N fastest-growing allocation sites per sample (0 disables tracemalloc)")
+    parser.add_argument("--soak-report", metavar="PATH",
+                        help="write the soak samples and verdict as JSON")
+    parser.add_argument("--metrics-port", metavar="PORT", type=int,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-log", metavar="PATH",
+                        help="append a metrics snapshot every 10 s to a rotating JSON-lines file")
+    return parser.parse_args(argv)
+
+
+def run_replay(args):
+    """Run --replay-trace and report the comparison, returning an exit code"""
+    result = replay_trace(args.replay_trace, golden_path=args.golden)
+    print(f"Replayed {result['blocks']} blocks ({result['audio_seconds']:.1f} s of audio) "
+          f"in {result['elapsed'] * 1000:.0f} ms, {result['realtime_factor']:.0f}x real time")
+    print(f"Max output error {result['max_error']:.2e}, {result['mismatched']} mismatched blocks")
+    if args.write_golden:
+        write_golden(result, args.write_golden)
+        print(f"Golden output written to {args.write_golden}")
+    return 1 if result["mismatched"] else 0
+
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.replay_trace:
+        sys.exit(run_replay(args))
+    if args.benchmark:
+        sys.exit(run_benchmarks(args.benchmark))
+    if args.soak:
+        sys.exit(run_soak(args.soak, with_app=args.soak_app, speed=args.soak_speed,
+                          interval=args.soak_interval, limits=dict(args.soak_limit),
+                          top=args.soak_top, report_path=args.soak_report))
+
+    STARTUP.enabled = args.startup_report
+    TIMELINE.enabled = args.timeline
+
+    metrics_server = metrics_log = None
+    if args.metrics_port is not None:
+        metrics_server = MetricsServer(METRICS, args.metrics_port)
+        metrics_server.start()
+        print(f"Metrics at http://127.0.0.1:{metrics_server.port}/metrics")
+    if args.metrics_log:
+        metrics_log = MetricsLog(METRICS, args.metrics_log)
+        metrics_log.start()
+
     try:
-        app = VoiceChangerApp()
+        app = VoiceChangerApp(backend=make_backend(args.audio_backend))
+        app.trace_path = args.capture_trace
         app.mainloop()
     except Exception as e:
         print(f"Error starting VChanger: {e}")
@@ -1469,3 +6811,8 @@ if __name__ == "__main__":
         except:
             pass
         raise  # Re-raise the exception for proper error reporting
+    finally:
+        if metrics_log is not None:
+            metrics_log.stop()
+        if metrics_server is not None:
+            metrics_server.stop()